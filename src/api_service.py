@@ -5,18 +5,26 @@ FastAPI service otimizado para Railway
 """
 
 from fastapi import FastAPI, HTTPException, BackgroundTasks
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel, Field
-from typing import List, Optional, Dict, Any
+from typing import AsyncIterator, List, Optional, Dict, Any
 import asyncio
+import json
 from datetime import datetime
 import logging
 import os
 
 from src.wipo_crawler import WIPOCrawler
 from src.crawler_pool import WIPOCrawlerPool
+from src.retry_policy import RetryBudget
+from src.wipo_service import wipo_service
+from src.http_session import http_session
+from src.rate_limiter import rate_limiter
 from src.pipeline_service import pipeline_service
+from src.query_cache import serpapi_cache
+from src.layer_cache import layer_cache
+from src.pipeline_cache import pipeline_cache
 
 # Configuração de logging
 logging.basicConfig(
@@ -43,12 +51,8 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Cache simples (em produção use Redis)
-_cache: Dict[str, Dict[str, Any]] = {}
-_cache_ttl = int(os.getenv('CACHE_TTL', '3600'))
-
-# Pool global
-_pool: Optional[WIPOCrawlerPool] = None
+# Cache e pool global vivem no wipo_service (compartilhados com o pipeline)
+_cache_ttl = wipo_service.cache_ttl
 
 
 # Models
@@ -61,7 +65,7 @@ class BatchRequest(BaseModel):
     wo_numbers: List[str] = Field(..., description="Lista de números WO")
     use_cache: bool = Field(True, description="Usar cache")
     use_pool: bool = Field(True, description="Usar pooling")
-    pool_size: int = Field(3, ge=1, le=5, description="Tamanho do pool")
+    pool_size: Optional[int] = Field(None, ge=1, le=20, description="Paralelismo do lote (padrão: máximo do pool global)")
 
 
 class SearchRequest(BaseModel):
@@ -72,26 +76,19 @@ class SearchRequest(BaseModel):
 
 # Helper functions
 def _get_cache_key(wo: str) -> str:
-    return f"wipo_{wo.replace('WO', '').replace(' ', '')}"
+    return wipo_service.cache_key(wo)
 
 
 def _get_from_cache(wo: str) -> Optional[Dict]:
-    key = _get_cache_key(wo)
-    if key in _cache:
-        data = _cache[key]
-        if (datetime.now().timestamp() - data.get('cached_at', 0)) < _cache_ttl:
-            logger.info(f"✅ Cache HIT: {wo}")
-            return data['result']
-        del _cache[key]
-    return None
+    return wipo_service.get_cached(wo)
 
 
 def _set_cache(wo: str, result: Dict):
-    key = _get_cache_key(wo)
-    _cache[key] = {
-        'result': result,
-        'cached_at': datetime.now().timestamp()
-    }
+    wipo_service.set_cached(wo, result)
+
+
+async def _fetch_patent(wo: str) -> Dict:
+    return await wipo_service.fetch_patent(wo)
 
 
 # Endpoints
@@ -168,6 +165,7 @@ async def root():
             "🔍 WIPO Direct Search": {
                 "test_simple": "/test/{wo_number}",
                 "wipo_detailed": "/api/v1/wipo/{wo_number}",
+                "batch_stream": "POST /api/wipo/patents/batch/stream?format=ndjson|sse",
                 "examples": [
                     "/test/WO2018162793",
                     "/api/v1/wipo/WO2018162793",
@@ -177,6 +175,9 @@ async def root():
             },
             "💾 Cache Management": {
                 "cache_stats": "/api/cache/stats",
+                "serpapi_cache_stats": "/api/cache/serpapi/stats",
+                "layer_cache_stats": "/api/cache/layers/stats",
+                "pipeline_cache_stats": "/api/cache/pipeline/stats",
                 "clear_cache": "DELETE /api/cache/clear?wo_number=WO..."
             },
             "📚 Documentation": {
@@ -262,8 +263,12 @@ async def health():
         "status": "healthy",
         "version": "2.0.0",
         "timestamp": datetime.now().isoformat(),
-        "cache_size": len(_cache),
-        "pool_active": _pool is not None,
+        "cache_size": len(wipo_service.cache),
+        "pool_active": wipo_service.pool is not None,
+        "pool": wipo_service.pool.get_stats() if wipo_service.pool else None,
+        "http_session": http_session.get_stats(),
+        "rate_limits": rate_limiter.get_stats(),
+        "http_fast_path": wipo_service.http_fetcher.get_stats() if wipo_service.http_fetcher else None,
         "features": {
             "browser_get": True,
             "post_api": True,
@@ -280,19 +285,8 @@ async def fetch_single_patent(request: PatentRequest):
     
     logger.info(f"🔍 Request: {wo}")
     
-    # Cache
-    if request.use_cache:
-        cached = _get_from_cache(wo)
-        if cached:
-            return JSONResponse(content=cached)
-    
     try:
-        async with WIPOCrawler() as crawler:
-            result = await crawler.fetch_patent(wo)
-        
-        if request.use_cache and result.get('titulo'):
-            _set_cache(wo, result)
-        
+        result = await wipo_service.get_patent(wo, use_cache=request.use_cache)
         return JSONResponse(content=result)
         
     except Exception as e:
@@ -313,7 +307,7 @@ async def fetch_batch_patents(request: BatchRequest):
     # Verifica cache
     if request.use_cache:
         for wo in wo_numbers:
-            cached = _get_from_cache(wo)
+            cached = _get_from_cache(wo) or wipo_service.negative_cache.get(wo)
             if cached:
                 results.append(cached)
             else:
@@ -326,16 +320,33 @@ async def fetch_batch_patents(request: BatchRequest):
     # Busca patentes
     if to_fetch:
         try:
-            if request.use_pool and len(to_fetch) > 2:
-                # Usa pool
-                logger.info(f"🏊 Usando pool (size={request.pool_size})")
-                async with WIPOCrawlerPool(pool_size=request.pool_size) as pool:
+            if request.use_pool and len(to_fetch) > 2 and wipo_service.pool:
+                # Pool global compartilhado (escala sob demanda, sem cold start)
+                logger.info(f"🏊 Usando pool global (paralelismo={request.pool_size or wipo_service.pool.max_size})")
+                fetched = await wipo_service.pool.process_batch(to_fetch, concurrency=request.pool_size)
+            elif request.use_pool and len(to_fetch) > 2:
+                # Pool global indisponível: pool dedicado ao lote
+                logger.info(f"🏊 Usando pool (size={request.pool_size or 3})")
+                async with WIPOCrawlerPool(
+                    pool_size=request.pool_size or 3,
+                    flight=wipo_service.fetch_flight,
+                    crawler_options=wipo_service.crawler_options,
+                    http_fetcher=wipo_service.http_fetcher,
+                    negative_cache=wipo_service.negative_cache
+                ) as pool:
                     fetched = await pool.process_batch(to_fetch)
+            elif wipo_service.pool:
+                # Sequencial no pool global (sem cold start)
+                logger.info("📝 Processamento sequencial (pool global)")
+                budget = RetryBudget(len(to_fetch))
+                fetched = [await wipo_service.fetch_patent(wo, budget) for wo in to_fetch]
             else:
                 # Sequencial
                 logger.info("📝 Processamento sequencial")
-                async with WIPOCrawler() as crawler:
-                    fetched = await crawler.fetch_multiple_patents(to_fetch)
+                async with WIPOCrawler(**wipo_service.crawler_options) as crawler:
+                    fetched = await crawler.fetch_multiple_patents(to_fetch, budget=RetryBudget(len(to_fetch)))
+                for result in fetched:
+                    wipo_service.negative_cache.record(result['publicacao'], result)
             
             # Adiciona aos resultados e cache
             for result in fetched:
@@ -364,45 +375,116 @@ async def fetch_batch_patents(request: BatchRequest):
     })
 
 
+@app.post("/api/wipo/patents/batch/stream")
+async def stream_batch_patents(request: BatchRequest, format: str = "ndjson"):
+    """
+    Busca lote de patentes entregando cada resultado assim que fica pronto
+    
+    format=ndjson: um objeto JSON por linha
+    format=sse: eventos `data:` + evento final `done` com o resumo
+    """
+    if format not in ("ndjson", "sse"):
+        raise HTTPException(status_code=400, detail="format deve ser 'ndjson' ou 'sse'")
+    
+    wo_numbers = [wo.strip().upper() for wo in request.wo_numbers]
+    logger.info(f"🔍 Batch stream: {len(wo_numbers)} patentes ({format})")
+    
+    async def results() -> AsyncIterator[Dict]:
+        to_fetch = []
+        for wo in wo_numbers:
+            cached = (_get_from_cache(wo) or wipo_service.negative_cache.get(wo)) if request.use_cache else None
+            if cached:
+                yield cached
+            else:
+                to_fetch.append(wo)
+        
+        if wipo_service.pool and request.use_pool:
+            async for result in wipo_service.pool.iter_batch(to_fetch, concurrency=request.pool_size):
+                if request.use_cache and result.get('titulo'):
+                    _set_cache(result['publicacao'], result)
+                yield result
+        else:
+            for wo in to_fetch:
+                yield await wipo_service.get_patent(wo, use_cache=request.use_cache)
+    
+    async def body():
+        total = success = 0
+        try:
+            async for result in results():
+                total += 1
+                success += 1 if result.get('titulo') else 0
+                line = json.dumps(result, ensure_ascii=False, default=str)
+                yield f"data: {line}\n\n" if format == "sse" else f"{line}\n"
+        except Exception as e:
+            logger.error(f"❌ Erro no batch stream: {e}")
+            error = json.dumps({"erro": str(e), "status": "FALHA"}, ensure_ascii=False)
+            yield f"event: error\ndata: {error}\n\n" if format == "sse" else f"{error}\n"
+            return
+        
+        if format == "sse":
+            summary = json.dumps({"total": total, "success": success, "failed": total - success})
+            yield f"event: done\ndata: {summary}\n\n"
+    
+    media_type = "text/event-stream" if format == "sse" else "application/x-ndjson"
+    return StreamingResponse(body(), media_type=media_type, headers={"Cache-Control": "no-cache"})
+
+
 @app.delete("/api/cache/clear")
 async def clear_cache(wo_number: Optional[str] = None):
     """Limpa cache"""
-    global _cache
+    cache = wipo_service.cache
+    
+    negative = wipo_service.negative_cache
     
     if wo_number:
-        key = _get_cache_key(wo_number)
-        if key in _cache:
-            del _cache[key]
+        deleted = cache.delete(_get_cache_key(wo_number))
+        deleted = negative.forget(wo_number) or deleted
+        if deleted:
             return {"message": f"Cache limpo: {wo_number}"}
         return {"message": f"Cache não encontrado: {wo_number}"}
     else:
-        count = len(_cache)
-        _cache = {}
+        count = cache.clear() + negative.cache.clear() + pipeline_cache.clear()
         return {"message": f"Cache completo limpo ({count} entradas)"}
 
 
 @app.get("/api/cache/stats")
-async def cache_stats():
-    """Estatísticas do cache"""
-    if not _cache:
-        return {"size": 0, "entries": []}
+async def cache_stats(limit: int = 100):
+    """Estatísticas do cache (contadores de hit/miss/eviction e entradas mais recentes)"""
+    now = datetime.now().timestamp()
     
     entries = []
-    for key, data in _cache.items():
-        age = datetime.now().timestamp() - data.get('cached_at', 0)
+    for entry in wipo_service.cache.entries(limit=limit):
         entries.append({
-            "wo_number": data['result'].get('publicacao'),
-            "age_seconds": round(age, 2),
-            "expires_in": round(_cache_ttl - age, 2)
+            "wo_number": entry['value'].get('publicacao'),
+            "age_seconds": round(now - entry['stored_at'], 2),
+            "expires_in": round(entry['expires_at'] - now, 2)
         })
     
     return {
-        "size": len(_cache),
-        "ttl_seconds": _cache_ttl,
+        **wipo_service.cache.get_stats(),
+        "negative_cache": wipo_service.negative_cache.get_stats(),
         "entries": sorted(entries, key=lambda x: x['age_seconds'])
     }
 
 
+@app.get("/api/cache/serpapi/stats")
+async def serpapi_cache_stats():
+    """Estatísticas do cache de consultas SerpAPI (hits, chamadas pagas evitadas)"""
+    return serpapi_cache.get_stats()
+
+
+@app.get("/api/cache/layers/stats")
+async def layer_cache_stats():
+    """Estatísticas do cache por camada (PubChem, FDA, ClinicalTrials): fresh/stale/miss/revalidated"""
+    return layer_cache.get_stats()
+
+
+@app.get("/api/cache/pipeline/stats")
+async def pipeline_cache_stats():
+    """Estatísticas do cache de resultados completos do pipeline (por molécula)"""
+    return pipeline_cache.get_stats()
+
+
 # ===== BROWSER-FRIENDLY GET ENDPOINTS =====
 
 @app.get("/test/{wo_number}")
@@ -414,18 +496,8 @@ async def test_wo_simple(wo_number: str):
     wo = wo_number.strip().upper()
     logger.info(f"🧪 Test endpoint: {wo}")
     
-    # Cache
-    cached = _get_from_cache(wo)
-    if cached:
-        return JSONResponse(content=cached)
-    
     try:
-        async with WIPOCrawler() as crawler:
-            result = await crawler.fetch_patent(wo)
-        
-        if result.get('titulo'):
-            _set_cache(wo, result)
-        
+        result = await wipo_service.get_patent(wo)
         return JSONResponse(content=result)
         
     except Exception as e:
@@ -450,32 +522,14 @@ async def get_wipo_patent(
     wo = wo_number.strip().upper()
     logger.info(f"🔍 WIPO GET: {wo} | countries={country}")
     
-    # Cache
-    cached = _get_from_cache(wo)
-    if cached:
-        result = cached.copy()
-    else:
-        try:
-            async with WIPOCrawler() as crawler:
-                result = await crawler.fetch_patent(wo)
-            
-            if result.get('titulo'):
-                _set_cache(wo, result)
-                
-        except Exception as e:
-            logger.error(f"❌ Erro: {e}")
-            raise HTTPException(status_code=500, detail=str(e))
+    try:
+        result = await wipo_service.get_patent(wo)
+    except Exception as e:
+        logger.error(f"❌ Erro: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
     
     # Filtrar países se solicitado
-    if country and result.get('worldwide_applications'):
-        countries = [c.strip().upper() for c in country.split('_')]
-        filtered_apps = {
-            k: v for k, v in result['worldwide_applications'].items()
-            if k.upper() in countries
-        }
-        result['worldwide_applications'] = filtered_apps
-        result['paises_familia'] = [p for p in result.get('paises_familia', []) if p.upper() in countries]
-        result['filter_applied'] = country
+    result = wipo_service.filter_countries(result, country)
     
     return JSONResponse(content=result)
 
@@ -484,7 +538,8 @@ async def get_wipo_patent(
 async def search_by_molecule(
     molecule: str,
     country: Optional[str] = None,
-    limit: int = 10
+    limit: int = 10,
+    refresh: bool = False
 ):
     """
     🚀 PIPELINE COMPLETO: Buscar patentes por nome de molécula
@@ -507,6 +562,10 @@ async def search_by_molecule(
     - molecule: Nome da molécula (ex: darolutamide, olaparib, venetoclax)
     - country: Filtrar países (BR_US_JP_EP_CN_CA_AU_KR_IN) - opcional
     - limit: Número máximo de WO patents a buscar (padrão 10)
+    - refresh: Ignorar o resultado em cache e executar o pipeline novamente
+    
+    Resultados são reaproveitados por molécula (qualquer país, limit até o
+    da execução em cache); search_strategy.cache indica a origem.
     
     Retorna JSON rico com:
     - executive_summary: Resumo executivo com totais
@@ -529,7 +588,8 @@ async def search_by_molecule(
         result = await pipeline_service.execute_full_pipeline(
             mol, 
             country_filter=country,
-            limit=limit
+            limit=limit,
+            use_cache=not refresh
         )
         
         logger.info(f"✅ Pipeline completo: {result.get('debug_info', {}).get('total_duration_seconds', 0)}s")
@@ -554,7 +614,7 @@ async def search_by_molecule(
 # BATCH PROCESSING ENDPOINTS v3.1
 # =============================================================================
 
-from src.batch_service import get_batch_service, BatchStatus
+from src.batch_service import get_batch_service, BatchStatus, BatchQueueFull
 
 # Pydantic models for batch
 class BatchSearchRequest(BaseModel):
@@ -562,6 +622,7 @@ class BatchSearchRequest(BaseModel):
     molecules: List[str] = Field(..., description="List of molecule names to search")
     country_filter: Optional[str] = Field(None, description="Country filter (e.g., BR_US_JP)")
     limit: int = Field(10, ge=1, le=20, description="Max WO patents per molecule")
+    priority: int = Field(0, ge=0, le=10, description="Scheduling priority (higher runs first)")
 
 
 @app.post("/api/v1/batch/search")
@@ -572,8 +633,10 @@ async def create_batch_search(request: BatchSearchRequest, background_tasks: Bac
     - **molecules**: List of molecule names (e.g., ["darolutamide", "olaparib", "venetoclax"])
     - **country_filter**: Optional filter BR_US_JP_EP_CN_CA_AU_KR_IN
     - **limit**: Max WO patents per molecule (1-20, default 10)
+    - **priority**: 0-10, higher-priority batches are scheduled first; equal
+      priorities share the workers round-robin
     
-    Returns batch_id for tracking progress
+    Returns batch_id for tracking progress (503 when the scheduler queue is full)
     """
     try:
         if not request.molecules:
@@ -587,7 +650,8 @@ async def create_batch_search(request: BatchSearchRequest, background_tasks: Bac
         batch_id = batch_service.create_batch(
             molecules=request.molecules,
             country_filter=request.country_filter,
-            limit=request.limit
+            limit=request.limit,
+            priority=request.priority
         )
         
         # Process in background
@@ -610,6 +674,8 @@ async def create_batch_search(request: BatchSearchRequest, background_tasks: Bac
         
     except HTTPException:
         raise
+    except BatchQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         logger.error(f"❌ Error creating batch: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Failed to create batch: {str(e)}")
@@ -703,6 +769,12 @@ async def cancel_batch(batch_id: str):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/api/v1/batch/scheduler/stats")
+async def batch_scheduler_stats():
+    """Scheduler metrics: queue depth (total and per priority), busy workers, queue wait times"""
+    return get_batch_service().get_scheduler_stats()
+
+
 @app.get("/api/v1/batch/list")
 async def list_batches(status: Optional[str] = None):
     """
@@ -783,6 +855,16 @@ async def startup_event():
     """Startup"""
     logger.info("🚀 Pharmyrus WIPO API iniciando...")
     logger.info(f"📦 Cache TTL: {_cache_ttl}s")
+    
+    await wipo_service.start()
+    await http_session.start()
+    sweep_interval = int(os.getenv('CACHE_SWEEP_INTERVAL', '300'))
+    for cache in (serpapi_cache.cache, layer_cache.cache, layer_cache.validators, pipeline_cache.cache):
+        cache.start_sweeper(sweep_interval)
+    
+    # Lotes interrompidos por restart/redeploy continuam de onde pararam
+    get_batch_service(max_concurrent=3).resume_unfinished()
+    
     logger.info("🔄 Batch processing enabled with max 3 concurrent searches")
     logger.info("✅ API pronta!")
 
@@ -790,14 +872,18 @@ async def startup_event():
 @app.on_event("shutdown")
 async def shutdown_event():
     """Shutdown"""
-    global _pool
-    
     logger.info("🔒 Pharmyrus WIPO API encerrando...")
     
-    if _pool:
-        await _pool.close()
+    await get_batch_service().close()
+    await wipo_service.close()
+    await layer_cache.close()
+    await http_session.close()
+    await serpapi_cache.cache.stop_sweeper()
+    serpapi_cache.cache.close()
+    await pipeline_cache.cache.stop_sweeper()
+    pipeline_cache.cache.close()
     
-    logger.info(f"💾 Cache final: {len(_cache)} entradas")
+    logger.info(f"💾 Cache final: {len(wipo_service.cache)} entradas")
     logger.info("✅ Encerrado")
 
 
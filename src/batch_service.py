@@ -1,19 +1,39 @@
 """
 Batch Processing Service for Pharmyrus Patent Search
 Version: 3.1.0
-Handles multiple molecule searches with job tracking and rate limiting
+Handles multiple molecule searches with job tracking and rate limiting;
+batches and per-molecule results are persisted so they survive restarts
 """
 
 import asyncio
+import logging
+import os
 import time
 import uuid
 from datetime import datetime
-from typing import Dict, List, Optional, Any
+from collections import deque
+from typing import Deque, Dict, List, Optional, Any, Tuple
 from dataclasses import dataclass, field, asdict
 from enum import Enum
 import json
 
-from .pipeline_service import PipelineService
+from .batch_store import BatchStore, create_batch_store
+from .pipeline_cache import pipeline_cache
+from .pipeline_service import pipeline_service
+from .single_flight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+
+class BatchQueueFull(Exception):
+    """The scheduler queue can't take another batch right now"""
+
+
+class Provenance(str, Enum):
+    """Where a molecule job's result came from"""
+    EXECUTED = "executed"   # this job ran the pipeline
+    JOINED = "joined"       # shared an identical run already in progress
+    REUSED = "reused"       # copied from an identical run that just finished
 
 
 class BatchStatus(str, Enum):
@@ -25,6 +45,14 @@ class BatchStatus(str, Enum):
     CANCELLED = "cancelled"
 
 
+def _to_timestamp(value: Optional[datetime]) -> Optional[float]:
+    return value.timestamp() if value else None
+
+
+def _from_timestamp(value: Optional[float]) -> Optional[datetime]:
+    return datetime.fromtimestamp(value) if value is not None else None
+
+
 @dataclass
 class MoleculeJob:
     """Individual molecule search job within a batch"""
@@ -35,6 +63,9 @@ class MoleculeJob:
     started_at: Optional[datetime] = None
     completed_at: Optional[datetime] = None
     duration_seconds: float = 0.0
+    has_result: bool = False  # result persisted in the batch store
+    provenance: Optional[Provenance] = None
+    shared_from: Optional[str] = None  # batch that ran the pipeline, when joined/reused
     
     def to_dict(self) -> Dict:
         """Convert to dictionary for JSON serialization"""
@@ -42,6 +73,19 @@ class MoleculeJob:
         data['started_at'] = self.started_at.isoformat() if self.started_at else None
         data['completed_at'] = self.completed_at.isoformat() if self.completed_at else None
         return data
+    
+    def to_record(self) -> Dict:
+        """Row for the batch store"""
+        return {
+            'molecule': self.molecule_name,
+            'status': self.status.value,
+            'error': self.error,
+            'started_at': _to_timestamp(self.started_at),
+            'completed_at': _to_timestamp(self.completed_at),
+            'duration_seconds': self.duration_seconds,
+            'provenance': self.provenance.value if self.provenance else None,
+            'shared_from': self.shared_from
+        }
 
 
 @dataclass
@@ -51,6 +95,7 @@ class BatchJob:
     molecules: List[str]
     country_filter: Optional[str] = None
     limit: int = 10
+    priority: int = 0  # higher runs first; equal priorities share workers round-robin
     status: BatchStatus = BatchStatus.PENDING
     created_at: datetime = field(default_factory=datetime.now)
     started_at: Optional[datetime] = None
@@ -59,73 +104,280 @@ class BatchJob:
     total_molecules: int = 0
     completed_count: int = 0
     failed_count: int = 0
+    cancelled_count: int = 0
+    shared_count: int = 0  # jobs that joined or reused another batch's run
     progress_percentage: float = 0.0
     estimated_time_remaining_seconds: float = 0.0
     
+    # Incremental accounting: status counters kept on transitions, cached job views
+    status_counts: Dict[BatchStatus, int] = field(default_factory=dict, init=False, repr=False)
+    _finish_interval: Optional[float] = field(default=None, init=False, repr=False)
+    _last_finish: Optional[float] = field(default=None, init=False, repr=False)
+    _job_views: Dict[str, Dict] = field(default_factory=dict, init=False, repr=False)
+    _dirty_jobs: set = field(default_factory=set, init=False, repr=False)
+    
+    # Weight of the newest inter-completion interval in the ETA average
+    ETA_SMOOTHING = 0.3
+    
     def __post_init__(self):
         """Initialize jobs for each molecule"""
-        self.total_molecules = len(self.molecules)
         for mol in self.molecules:
             self.jobs[mol] = MoleculeJob(molecule_name=mol)
+        # Repeated molecules share one job
+        self.total_molecules = len(self.jobs)
+        self.status_counts = {status: 0 for status in BatchStatus}
+        self.status_counts[BatchStatus.PENDING] = len(self.jobs)
+        # Seeded in submission order; refreshed views are updated in place
+        self._job_views = dict.fromkeys(self.jobs)
+        self._dirty_jobs = set(self.jobs)
+    
+    def transition(self, job: MoleculeJob, status: BatchStatus):
+        """Move a molecule job to a new status, keeping the counters in sync"""
+        if job.status != status:
+            self.status_counts[job.status] -= 1
+            self.status_counts[status] += 1
+            job.status = status
+            if status in [BatchStatus.COMPLETED, BatchStatus.FAILED]:
+                self._record_finish(job)
+        self.touch(job)
+        self.update_progress()
+    
+    def set_provenance(self, job: MoleculeJob, provenance: Provenance, shared_from: Optional[str] = None):
+        """Record where a job's result comes from, keeping shared_count in sync"""
+        shared = [Provenance.JOINED, Provenance.REUSED]
+        self.shared_count += (provenance in shared) - (job.provenance in shared)
+        job.provenance = provenance
+        job.shared_from = shared_from
+        self.touch(job)
+    
+    def touch(self, job: MoleculeJob):
+        """Mark a molecule job's cached view as stale"""
+        self._dirty_jobs.add(job.molecule_name)
+    
+    def _record_finish(self, job: MoleculeJob):
+        """Smoothed (EWMA) interval between completions, used for the ETA"""
+        now = time.monotonic()
+        interval = now - self._last_finish if self._last_finish is not None else job.duration_seconds
+        if self._finish_interval is None:
+            self._finish_interval = interval
+        else:
+            self._finish_interval = self.ETA_SMOOTHING * interval + (1 - self.ETA_SMOOTHING) * self._finish_interval
+        self._last_finish = now
     
     def update_progress(self):
-        """Update progress metrics"""
-        completed = sum(1 for j in self.jobs.values() 
-                       if j.status in [BatchStatus.COMPLETED, BatchStatus.FAILED])
-        self.completed_count = sum(1 for j in self.jobs.values() 
-                                  if j.status == BatchStatus.COMPLETED)
-        self.failed_count = sum(1 for j in self.jobs.values() 
-                               if j.status == BatchStatus.FAILED)
-        
-        if self.total_molecules > 0:
-            self.progress_percentage = (completed / self.total_molecules) * 100
-            
-        # Estimate time remaining
-        if completed > 0 and self.started_at:
-            elapsed = (datetime.now() - self.started_at).total_seconds()
-            avg_time_per_job = elapsed / completed
-            remaining_jobs = self.total_molecules - completed
-            self.estimated_time_remaining_seconds = avg_time_per_job * remaining_jobs
+        """Update progress metrics from the status counters (O(1))"""
+        self.completed_count = self.status_counts[BatchStatus.COMPLETED]
+        self.failed_count = self.status_counts[BatchStatus.FAILED]
+        self.cancelled_count = self.status_counts[BatchStatus.CANCELLED]
+        completed = self.completed_count + self.failed_count
+        
+        if self.jobs:
+            self.progress_percentage = (completed / len(self.jobs)) * 100
+        
+        # Estimate time remaining: smoothed completion interval, counting
+        # down from the last completion
+        remaining_jobs = len(self.jobs) - completed - self.cancelled_count
+        if remaining_jobs <= 0:
+            self.estimated_time_remaining_seconds = 0.0
+        elif self._finish_interval is not None:
+            since_last = time.monotonic() - self._last_finish
+            self.estimated_time_remaining_seconds = max(0.0, self._finish_interval * remaining_jobs - since_last)
     
-    def to_dict(self) -> Dict:
-        """Convert to dictionary for JSON serialization"""
+    def to_record(self) -> Dict:
+        """Row for the batch store"""
         return {
             'batch_id': self.batch_id,
             'molecules': self.molecules,
             'country_filter': self.country_filter,
             'limit': self.limit,
+            'priority': self.priority,
+            'status': self.status.value,
+            'created_at': self.created_at.timestamp(),
+            'started_at': _to_timestamp(self.started_at),
+            'completed_at': _to_timestamp(self.completed_at)
+        }
+    
+    @classmethod
+    def from_record(cls, record: Dict) -> 'BatchJob':
+        """Rebuild a batch from the store (results stay on disk)"""
+        batch = cls(
+            batch_id=record['batch_id'],
+            molecules=record['molecules'],
+            country_filter=record['country_filter'],
+            limit=record['limit'],
+            priority=record['priority'],
+            status=BatchStatus(record['status']),
+            created_at=datetime.fromtimestamp(record['created_at']),
+            started_at=_from_timestamp(record['started_at']),
+            completed_at=_from_timestamp(record['completed_at'])
+        )
+        for row in record['jobs']:
+            job = batch.jobs.get(row['molecule'])
+            if job is None:
+                continue
+            batch.transition(job, BatchStatus(row['status']))
+            job.error = row['error']
+            job.started_at = _from_timestamp(row['started_at'])
+            job.completed_at = _from_timestamp(row['completed_at'])
+            job.duration_seconds = row['duration_seconds']
+            job.has_result = row['has_result']
+            batch.touch(job)
+            if row['provenance']:
+                batch.set_provenance(job, Provenance(row['provenance']), row['shared_from'])
+        
+        # Completions from before a restart don't say anything about the current pace
+        batch._finish_interval = None
+        batch._last_finish = None
+        batch.update_progress()
+        return batch
+    
+    def summary(self) -> Dict:
+        """Progress summary built from the counters (O(1))"""
+        self.update_progress()
+        return {
+            'batch_id': self.batch_id,
             'status': self.status,
-            'created_at': self.created_at.isoformat(),
-            'started_at': self.started_at.isoformat() if self.started_at else None,
-            'completed_at': self.completed_at.isoformat() if self.completed_at else None,
+            'priority': self.priority,
             'total_molecules': self.total_molecules,
             'completed_count': self.completed_count,
             'failed_count': self.failed_count,
+            'cancelled_count': self.cancelled_count,
             'progress_percentage': round(self.progress_percentage, 2),
-            'estimated_time_remaining_seconds': round(self.estimated_time_remaining_seconds, 1),
-            'jobs': {mol: job.to_dict() for mol, job in self.jobs.items()}
+            'created_at': self.created_at.isoformat(),
+            'estimated_time_remaining_seconds': round(self.estimated_time_remaining_seconds, 1)
+        }
+    
+    def job_views(self) -> Dict[str, Dict]:
+        """Per-molecule dicts, re-serialized only for jobs changed since the last call"""
+        for mol in self._dirty_jobs:
+            self._job_views[mol] = self.jobs[mol].to_dict()
+        self._dirty_jobs.clear()
+        return self._job_views
+    
+    def to_dict(self) -> Dict:
+        """Convert to dictionary for JSON serialization"""
+        return {
+            **self.summary(),
+            'molecules': self.molecules,
+            'country_filter': self.country_filter,
+            'limit': self.limit,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'completed_at': self.completed_at.isoformat() if self.completed_at else None,
+            'shared_count': self.shared_count,
+            'jobs': self.job_views()
         }
 
 
+class _SharedWork:
+    """A pipeline run shared by every job with the same work key"""
+    __slots__ = ('owner', 'subscribers', 'started')
+    
+    def __init__(self, owner: str):
+        self.owner = owner
+        self.subscribers: List[Tuple[BatchJob, MoleculeJob]] = []
+        self.started = False
+
+
 class BatchService:
     """Service for managing batch patent searches"""
     
-    def __init__(self, max_concurrent: int = 3, batch_size: int = 5):
+    def __init__(
+        self,
+        max_concurrent: int = 3,
+        batch_size: int = 5,
+        store: Optional[BatchStore] = None,
+        reuse_window: int = 900,
+        max_queued: int = 1000
+    ):
         """
         Initialize batch service
         
         Args:
-            max_concurrent: Maximum concurrent molecule searches
+            max_concurrent: Maximum concurrent molecule searches (= scheduler workers)
             batch_size: Number of WO patents to process per batch
+            store: Durable job store (defaults to BATCH_DB_PATH)
+            reuse_window: Seconds a finished run's result is reused by other batches
+            max_queued: Bound on molecules waiting in the scheduler queue
         """
         self.max_concurrent = max_concurrent
         self.batch_size = batch_size
         self.semaphore = asyncio.Semaphore(max_concurrent)
         self.jobs: Dict[str, BatchJob] = {}
-        self.pipeline = PipelineService()
+        self.pipeline = pipeline_service  # shared HTTP session, WIPO pool and caches
+        self.store = store or create_batch_store()
+        self._resumed: Dict[str, asyncio.Task] = {}
+        self._molecule_tasks: Dict[str, Dict[str, asyncio.Task]] = {}  # batch_id -> molecule -> task
+        
+        # Molecule work registry: identical (molecule, country, limit) work runs once
+        self.reuse_window = reuse_window
+        self.flight = SingleFlight()
+        self._work: Dict[str, _SharedWork] = {}
+        self._recent: Dict[str, Tuple[str, str, float]] = {}  # key -> (batch_id, molecule, finished_at)
+        
+        # Scheduler: fixed workers pull from per-batch queues (priority, then round-robin)
+        self.max_queued = max_queued
+        self._queues: Dict[str, Deque[Tuple[str, float]]] = {}  # batch_id -> (molecule, enqueued_at)
+        self._rotation: Deque[str] = deque()  # batch ids with queued molecules
+        self._queued_count = 0
+        self._queue_ready = asyncio.Event()
+        self._workers: List[asyncio.Task] = []
+        self._busy_workers = 0
+        self._batch_done: Dict[str, asyncio.Event] = {}
+        self._wait_times: Deque[float] = deque(maxlen=500)
+        self.total_dispatched = 0
+        self._closing = False
+        
+        self._restore()
+    
+    def _restore(self):
+        """Load persisted batches; molecules interrupted mid-run go back to pending"""
+        for record in self.store.load_batches():
+            batch = BatchJob.from_record(record)
+            if batch.status in [BatchStatus.PENDING, BatchStatus.PROCESSING]:
+                for job in batch.jobs.values():
+                    if job.status == BatchStatus.PROCESSING:
+                        job.started_at = None
+                        batch.transition(job, BatchStatus.PENDING)
+            self.jobs[batch.batch_id] = batch
+        
+        if self.jobs:
+            logger.info(f"📂 Restored {len(self.jobs)} batches from {self.store.path}")
+    
+    def resume_unfinished(self) -> List[str]:
+        """
+        Restart processing of batches interrupted by a restart
+        
+        Only molecules without a persisted outcome are run again.
+        
+        Returns:
+            IDs of the resumed batches
+        """
+        resumed = []
+        for batch_id, batch in self.jobs.items():
+            if batch.status not in [BatchStatus.PENDING, BatchStatus.PROCESSING]:
+                continue
+            if batch_id in self._resumed:
+                continue
+            task = asyncio.create_task(self.process_batch(batch_id))
+            self._resumed[batch_id] = task
+            task.add_done_callback(lambda _, b=batch_id: self._resumed.pop(b, None))
+            resumed.append(batch_id)
+        
+        if resumed:
+            logger.info(f"🔄 Resuming {len(resumed)} unfinished batches")
+        return resumed
+    
+    def _persist_batch(self, batch: BatchJob):
+        self.store.update_batch(
+            batch.batch_id, batch.status.value,
+            _to_timestamp(batch.started_at), _to_timestamp(batch.completed_at)
+        )
+    
+    def _persist_job(self, batch: BatchJob, job: MoleculeJob, result: Optional[Dict] = None):
+        self.store.update_job(batch.batch_id, job.to_record(), result)
         
     def create_batch(self, molecules: List[str], country_filter: Optional[str] = None, 
-                    limit: int = 10) -> str:
+                    limit: int = 10, priority: int = 0) -> str:
         """
         Create a new batch job
         
@@ -133,20 +385,32 @@ class BatchService:
             molecules: List of molecule names to search
             country_filter: Optional country filter (BR_US_JP)
             limit: Max WO patents per molecule
+            priority: Scheduling priority (higher runs first)
             
         Returns:
             batch_id: Unique identifier for the batch
+            
+        Raises:
+            BatchQueueFull: The batch would exceed max_queued waiting molecules
         """
+        waiting = self.waiting()
+        if waiting + len(molecules) > self.max_queued:
+            raise BatchQueueFull(
+                f"Scheduler queue full ({waiting}/{self.max_queued} molecules waiting)"
+            )
+        
         batch_id = f"batch_{uuid.uuid4().hex[:12]}_{int(time.time())}"
         
         batch = BatchJob(
             batch_id=batch_id,
             molecules=molecules,
             country_filter=country_filter,
-            limit=limit
+            limit=limit,
+            priority=priority
         )
         
         self.jobs[batch_id] = batch
+        self.store.save_batch(batch.to_record(), [job.to_record() for job in batch.jobs.values()])
         
         return batch_id
     
@@ -164,13 +428,16 @@ class BatchService:
         if not batch:
             return None
         
-        batch.update_progress()
-        return batch.to_dict()
+        status = batch.to_dict()
+        status['queued_count'] = len(self._queues.get(batch_id, ()))
+        return status
     
     def get_batch_results(self, batch_id: str) -> Optional[Dict]:
         """
         Get results of a completed batch job
         
+        Results are read from the batch store on demand.
+        
         Args:
             batch_id: Batch identifier
             
@@ -186,57 +453,253 @@ class BatchService:
             'status': batch.status,
             'completed_count': batch.completed_count,
             'failed_count': batch.failed_count,
-            'results': {
-                mol: job.result for mol, job in batch.jobs.items() 
-                if job.result is not None
-            },
+            'results': self.store.load_results(batch_id),
             'errors': {
                 mol: job.error for mol, job in batch.jobs.items() 
                 if job.error is not None
             }
         }
     
+    @staticmethod
+    def _work_key(molecule: str, country_filter: Optional[str], limit: int) -> str:
+        countries = "_".join(sorted(c.strip().upper() for c in country_filter.split("_"))) if country_filter else "ALL"
+        return f"{pipeline_cache.key(molecule)}|{countries}|{limit}"
+    
+    def _recent_run(self, key: str) -> Optional[Tuple[str, str]]:
+        """(batch_id, molecule) of an identical run finished within the reuse window"""
+        cutoff = time.time() - self.reuse_window
+        for stale in [k for k, (_, _, finished_at) in self._recent.items() if finished_at < cutoff]:
+            del self._recent[stale]
+        
+        recent = self._recent.get(key)
+        return (recent[0], recent[1]) if recent else None
+    
+    def _start_job(self, batch: BatchJob, job: MoleculeJob):
+        job.started_at = datetime.now()
+        batch.transition(job, BatchStatus.PROCESSING)
+        self._persist_job(batch, job)
+    
+    async def _run_shared(self, work: _SharedWork, molecule: str, country_filter: Optional[str], limit: int) -> Dict:
+        """Run the pipeline once for every subscriber of the work key"""
+        async with self.semaphore:
+            work.started = True
+            for batch, job in list(work.subscribers):
+                self._start_job(batch, job)
+            
+            return await self.pipeline.execute_full_pipeline(
+                molecule,
+                country_filter=country_filter,
+                limit=limit
+            )
+    
+    def _forget_work(self, key: str, work: _SharedWork):
+        """Unregister finished work, in the same step its flight releases the key"""
+        if self._work.get(key) is work:
+            del self._work[key]
+    
     async def _process_single_molecule(self, batch: BatchJob, molecule: str):
         """
         Process a single molecule search with rate limiting
         
+        Identical work (same normalized molecule, country filter and limit)
+        from any batch runs once: later jobs join the run in progress or
+        reuse a result finished within the reuse window.
+        
         Args:
             batch: Parent batch job
             molecule: Molecule name to search
         """
         job = batch.jobs[molecule]
+        key = self._work_key(molecule, batch.country_filter, batch.limit)
+        work = None
         
-        async with self.semaphore:
-            try:
-                job.status = BatchStatus.PROCESSING
+        try:
+            recent = self._recent_run(key)
+            result = self.store.load_result(*recent) if recent else None
+            
+            if result is not None:
+                batch.set_provenance(job, Provenance.REUSED, recent[0])
+                self._start_job(batch, job)
+            else:
+                work = self._work.get(key)
+                if work is None:
+                    work = self._work[key] = _SharedWork(owner=batch.batch_id)
+                    batch.set_provenance(job, Provenance.EXECUTED)
+                else:
+                    batch.set_provenance(job, Provenance.JOINED, work.owner)
+                
+                work.subscribers.append((batch, job))
                 job.started_at = datetime.now()
-                batch.update_progress()
+                batch.touch(job)
+                if work.started:
+                    self._start_job(batch, job)
                 
-                # Execute pipeline search
-                result = await self.pipeline.search_molecule(
-                    molecule_name=molecule,
-                    country_filter=batch.country_filter,
-                    limit=batch.limit
+                # _work and the flight release the key together, so a job never
+                # joins a flight whose result has already been handed out
+                result = await self.flight.do(
+                    key,
+                    lambda: self._run_shared(work, molecule, batch.country_filter, batch.limit),
+                    on_done=lambda: self._forget_work(key, work)
                 )
                 
-                job.result = result
-                job.status = BatchStatus.COMPLETED
-                job.completed_at = datetime.now()
+                if job.provenance == Provenance.EXECUTED:
+                    self._recent[key] = (batch.batch_id, molecule, time.time())
+            
+            # The result goes to the store, not the in-memory job
+            job.completed_at = datetime.now()
+            if job.started_at:
                 job.duration_seconds = (job.completed_at - job.started_at).total_seconds()
-                
-            except Exception as e:
-                job.error = str(e)
-                job.status = BatchStatus.FAILED
+            job.has_result = True
+            batch.transition(job, BatchStatus.COMPLETED)
+            self._persist_job(batch, job, result)
+            
+        except Exception as e:
+            job.error = str(e)
+            job.completed_at = datetime.now()
+            if job.started_at:
+                job.duration_seconds = (job.completed_at - job.started_at).total_seconds()
+            batch.transition(job, BatchStatus.FAILED)
+            self._persist_job(batch, job)
+        
+        except asyncio.CancelledError:
+            if batch.status == BatchStatus.CANCELLED:
                 job.completed_at = datetime.now()
                 if job.started_at:
                     job.duration_seconds = (job.completed_at - job.started_at).total_seconds()
+                batch.transition(job, BatchStatus.CANCELLED)
+            else:
+                # Shutdown: leave the molecule to be resumed on the next start
+                job.started_at = None
+                batch.transition(job, BatchStatus.PENDING)
+            self._persist_job(batch, job)
+            raise
+        
+        finally:
+            if work is not None:
+                self._leave_work(work, batch, job)
+    
+    def _leave_work(self, work: _SharedWork, batch: BatchJob, job: MoleculeJob):
+        """Unsubscribe a job; a cancelled owner hands the run to the next subscriber"""
+        if (batch, job) in work.subscribers:
+            work.subscribers.remove((batch, job))
+        
+        if job.status == BatchStatus.CANCELLED and job.provenance == Provenance.EXECUTED and work.subscribers:
+            new_batch, new_job = work.subscribers[0]
+            work.owner = new_batch.batch_id
+            new_batch.set_provenance(new_job, Provenance.EXECUTED)
+            for other_batch, other in work.subscribers[1:]:
+                other_batch.set_provenance(other, other.provenance, work.owner)
+    
+    # Scheduler
+    def queued(self) -> int:
+        """Molecules waiting for a worker, across all batches"""
+        return self._queued_count
+    
+    def waiting(self) -> int:
+        """Queued molecules plus those of created batches not yet submitted"""
+        unsubmitted = sum(
+            len(batch.jobs) for batch in self.jobs.values()
+            if batch.status == BatchStatus.PENDING
+        )
+        return self._queued_count + unsubmitted
+    
+    def _ensure_workers(self):
+        self._workers = [w for w in self._workers if not w.done()]
+        while len(self._workers) < self.max_concurrent:
+            self._workers.append(asyncio.create_task(self._worker(len(self._workers))))
+    
+    def _enqueue(self, batch: BatchJob):
+        queue = self._queues.setdefault(batch.batch_id, deque())
+        now = time.monotonic()
+        for molecule, job in batch.jobs.items():
+            if job.status == BatchStatus.PENDING:
+                queue.append((molecule, now))
+                self._queued_count += 1
+        
+        if not queue:
+            del self._queues[batch.batch_id]
+        elif batch.batch_id not in self._rotation:
+            self._rotation.append(batch.batch_id)
+            self._queue_ready.set()
+    
+    def _dequeue_batch(self, batch_id: str):
+        queue = self._queues.pop(batch_id, None)
+        if queue is not None:
+            self._queued_count -= len(queue)
+            self._rotation.remove(batch_id)
+    
+    def _pick(self) -> Optional[Tuple[BatchJob, str, float]]:
+        """Next molecule: highest-priority batches first, round-robin among equals"""
+        if not self._rotation:
+            return None
+        
+        top = max(self.jobs[batch_id].priority for batch_id in self._rotation)
+        for _ in range(len(self._rotation)):
+            batch_id = self._rotation[0]
+            self._rotation.rotate(-1)
+            if self.jobs[batch_id].priority != top:
+                continue
+            
+            queue = self._queues[batch_id]
+            molecule, enqueued_at = queue.popleft()
+            self._queued_count -= 1
+            if not queue:
+                self._dequeue_batch(batch_id)
+            return self.jobs[batch_id], molecule, enqueued_at
+        return None
+    
+    async def _next_item(self) -> Tuple[BatchJob, str, float]:
+        while True:
+            item = self._pick()
+            if item is not None:
+                return item
+            self._queue_ready.clear()
+            await self._queue_ready.wait()
+    
+    async def _worker(self, worker_id: int):
+        """Run queued molecules one at a time"""
+        while True:
+            batch, molecule, enqueued_at = await self._next_item()
+            self._wait_times.append(time.monotonic() - enqueued_at)
+            self.total_dispatched += 1
+            
+            # Joining/reusing an identical run doesn't hold a worker
+            key = self._work_key(molecule, batch.country_filter, batch.limit)
+            shared = key in self._work or self._recent_run(key) is not None
+            
+            task = asyncio.create_task(self._process_single_molecule(batch, molecule))
+            self._molecule_tasks.setdefault(batch.batch_id, {})[molecule] = task
+            task.add_done_callback(lambda _, b=batch.batch_id, m=molecule: self._molecule_done(b, m))
+            if shared:
+                continue
             
+            self._busy_workers += 1
+            try:
+                await asyncio.wait({task})
+            except asyncio.CancelledError:
+                task.cancel()
+                raise
             finally:
-                batch.update_progress()
+                self._busy_workers -= 1
+    
+    def _molecule_done(self, batch_id: str, molecule: str):
+        self._molecule_tasks.get(batch_id, {}).pop(molecule, None)
+        self._check_batch_done(batch_id)
+    
+    def _check_batch_done(self, batch_id: str):
+        if self._molecule_tasks.get(batch_id) or batch_id in self._queues:
+            return
+        self._molecule_tasks.pop(batch_id, None)
+        event = self._batch_done.get(batch_id)
+        if event is not None:
+            event.set()
     
     async def process_batch(self, batch_id: str) -> Dict:
         """
-        Process all molecules in a batch concurrently
+        Queue a batch's molecules on the shared scheduler and wait for them
+        
+        Molecules that already have an outcome (e.g. from before a restart)
+        are skipped.
         
         Args:
             batch_id: Batch identifier
@@ -248,26 +711,40 @@ class BatchService:
         if not batch:
             raise ValueError(f"Batch {batch_id} not found")
         
+        if batch.status == BatchStatus.CANCELLED:
+            return batch.to_dict()
+        
         try:
             batch.status = BatchStatus.PROCESSING
-            batch.started_at = datetime.now()
+            batch.started_at = batch.started_at or datetime.now()
+            self._persist_batch(batch)
             
-            # Process all molecules concurrently with rate limiting
-            tasks = [
-                self._process_single_molecule(batch, molecule)
-                for molecule in batch.molecules
-            ]
+            self._ensure_workers()
+            done = self._batch_done[batch_id] = asyncio.Event()
+            self._enqueue(batch)
+            self._check_batch_done(batch_id)
+            try:
+                await done.wait()
+            finally:
+                self._batch_done.pop(batch_id, None)
             
-            await asyncio.gather(*tasks, return_exceptions=True)
+            # Shutdown: molecules went back to pending, the batch stays
+            # processing so it's resumed on the next start
+            if self._closing:
+                return batch.to_dict()
             
-            # Mark batch as completed
-            batch.status = BatchStatus.COMPLETED
-            batch.completed_at = datetime.now()
-            batch.update_progress()
+            # Mark batch as completed (unless it was cancelled meanwhile or
+            # still has molecules without an outcome)
+            unfinished = batch.status_counts[BatchStatus.PENDING] + batch.status_counts[BatchStatus.PROCESSING]
+            if batch.status != BatchStatus.CANCELLED and not unfinished:
+                batch.status = BatchStatus.COMPLETED
+                batch.completed_at = datetime.now()
+            self._persist_batch(batch)
             
         except Exception as e:
             batch.status = BatchStatus.FAILED
             batch.completed_at = datetime.now()
+            self._persist_batch(batch)
             raise
         
         return batch.to_dict()
@@ -276,6 +753,9 @@ class BatchService:
         """
         Cancel a pending or processing batch
         
+        Queued molecules are released at once and running pipelines are
+        cancelled (a run shared with another batch keeps going for it).
+        
         Args:
             batch_id: Batch identifier
             
@@ -291,6 +771,19 @@ class BatchService:
         
         batch.status = BatchStatus.CANCELLED
         batch.completed_at = datetime.now()
+        self._persist_batch(batch)
+        self._dequeue_batch(batch_id)
+        
+        for job in batch.jobs.values():
+            if job.status == BatchStatus.PENDING:
+                job.completed_at = batch.completed_at
+                batch.transition(job, BatchStatus.CANCELLED)
+                self._persist_job(batch, job)
+        
+        for task in list(self._molecule_tasks.get(batch_id, {}).values()):
+            task.cancel()
+        
+        self._check_batch_done(batch_id)
         return True
     
     def list_batches(self, status_filter: Optional[BatchStatus] = None) -> List[Dict]:
@@ -303,26 +796,56 @@ class BatchService:
         Returns:
             List of batch summaries
         """
-        batches = []
-        
-        for batch_id, batch in self.jobs.items():
-            if status_filter and batch.status != status_filter:
-                continue
-            
-            batch.update_progress()
-            batches.append({
-                'batch_id': batch_id,
-                'status': batch.status,
-                'total_molecules': batch.total_molecules,
-                'completed_count': batch.completed_count,
-                'failed_count': batch.failed_count,
-                'progress_percentage': round(batch.progress_percentage, 2),
-                'created_at': batch.created_at.isoformat(),
-                'estimated_time_remaining_seconds': round(batch.estimated_time_remaining_seconds, 1)
-            })
+        batches = [
+            batch.summary() for batch in self.jobs.values()
+            if not status_filter or batch.status == status_filter
+        ]
         
         return sorted(batches, key=lambda x: x['created_at'], reverse=True)
     
+    def get_scheduler_stats(self) -> Dict[str, Any]:
+        """Queue depth, worker usage and queue wait times (last 500 dispatches)"""
+        depth_by_priority: Dict[str, int] = {}
+        for batch_id, queue in self._queues.items():
+            priority = str(self.jobs[batch_id].priority)
+            depth_by_priority[priority] = depth_by_priority.get(priority, 0) + len(queue)
+        
+        waits = sorted(self._wait_times)
+        return {
+            'workers': len(self._workers),
+            'busy_workers': self._busy_workers,
+            'running_molecules': sum(len(tasks) for tasks in self._molecule_tasks.values()),
+            'queue_depth': self._queued_count,
+            'max_queued': self.max_queued,
+            'queued_batches': len(self._queues),
+            'queue_depth_by_priority': depth_by_priority,
+            'dispatched': self.total_dispatched,
+            'wait_seconds': {
+                'avg': round(sum(waits) / len(waits), 3) if waits else 0.0,
+                'p50': round(waits[len(waits) // 2], 3) if waits else 0.0,
+                'p95': round(waits[int(len(waits) * 0.95)], 3) if waits else 0.0,
+                'max': round(waits[-1], 3) if waits else 0.0
+            }
+        }
+    
+    async def close(self):
+        """Stop the scheduler; running molecules go back to pending for the next start"""
+        self._closing = True
+        
+        # Queued molecules stay pending in the store; wake every batch waiter
+        self._queues.clear()
+        self._rotation.clear()
+        self._queued_count = 0
+        for event in self._batch_done.values():
+            event.set()
+        
+        tasks = self._workers + [t for tasks in self._molecule_tasks.values() for t in tasks.values()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._workers = []
+        self.store.close()
+    
     def cleanup_old_jobs(self, max_age_hours: int = 24):
         """
         Remove old completed/failed jobs
@@ -340,6 +863,7 @@ class BatchService:
         
         for batch_id in to_delete:
             del self.jobs[batch_id]
+            self.store.delete_batch(batch_id)
         
         return len(to_delete)
 
@@ -352,5 +876,10 @@ def get_batch_service(max_concurrent: int = 3, batch_size: int = 5) -> BatchServ
     """Get or create global batch service instance"""
     global _batch_service
     if _batch_service is None:
-        _batch_service = BatchService(max_concurrent=max_concurrent, batch_size=batch_size)
+        _batch_service = BatchService(
+            max_concurrent=max_concurrent,
+            batch_size=batch_size,
+            reuse_window=int(os.getenv('BATCH_REUSE_WINDOW', '900')),
+            max_queued=int(os.getenv('BATCH_MAX_QUEUED', '1000'))
+        )
     return _batch_service
@@ -0,0 +1,187 @@
+"""
+Batch Job Store
+SQLite (WAL) persistence for batch jobs: batch metadata, per-molecule
+status and per-molecule pipeline results, written as each molecule
+completes so batches survive restarts
+"""
+
+import json
+import logging
+import os
+import sqlite3
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class BatchStore:
+    """Durable batch job store; results are kept on disk and loaded on demand"""
+
+    def __init__(self, path: str):
+        self.path = path
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS batches (
+                batch_id TEXT PRIMARY KEY,
+                molecules TEXT NOT NULL,
+                country_filter TEXT,
+                result_limit INTEGER NOT NULL,
+                priority INTEGER NOT NULL DEFAULT 0,
+                status TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                started_at REAL,
+                completed_at REAL
+            )
+        """)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS molecule_jobs (
+                batch_id TEXT NOT NULL,
+                molecule TEXT NOT NULL,
+                position INTEGER NOT NULL,
+                status TEXT NOT NULL,
+                error TEXT,
+                started_at REAL,
+                completed_at REAL,
+                duration_seconds REAL NOT NULL DEFAULT 0,
+                provenance TEXT,
+                shared_from TEXT,
+                result TEXT,
+                PRIMARY KEY (batch_id, molecule)
+            )
+        """)
+
+    def save_batch(self, batch: Dict[str, Any], jobs: List[Dict[str, Any]]):
+        """Insert a new batch and its molecule jobs"""
+        with self._conn:
+            self._conn.execute('BEGIN')
+            self._conn.execute(
+                'INSERT OR REPLACE INTO batches VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (
+                    batch['batch_id'], json.dumps(batch['molecules']), batch['country_filter'],
+                    batch['limit'], batch['priority'], batch['status'], batch['created_at'],
+                    batch['started_at'], batch['completed_at']
+                )
+            )
+            self._conn.executemany(
+                'INSERT OR REPLACE INTO molecule_jobs '
+                '(batch_id, molecule, position, status) VALUES (?, ?, ?, ?)',
+                [(batch['batch_id'], job['molecule'], i, job['status']) for i, job in enumerate(jobs)]
+            )
+
+    def update_batch(self, batch_id: str, status: str, started_at: Optional[float], completed_at: Optional[float]):
+        self._conn.execute(
+            'UPDATE batches SET status = ?, started_at = ?, completed_at = ? WHERE batch_id = ?',
+            (status, started_at, completed_at, batch_id)
+        )
+
+    def update_job(self, batch_id: str, job: Dict[str, Any], result: Optional[Dict] = None):
+        """Persist a molecule's status (and its result, once available)"""
+        self._conn.execute(
+            'UPDATE molecule_jobs SET status = ?, error = ?, started_at = ?, completed_at = ?, '
+            'duration_seconds = ?, provenance = ?, shared_from = ?, result = COALESCE(?, result) '
+            'WHERE batch_id = ? AND molecule = ?',
+            (
+                job['status'], job['error'], job['started_at'], job['completed_at'],
+                job['duration_seconds'], job['provenance'], job['shared_from'],
+                json.dumps(result, default=str) if result is not None else None,
+                batch_id, job['molecule']
+            )
+        )
+
+    def load_batches(self) -> List[Dict[str, Any]]:
+        """All batches with their molecule jobs (without results)"""
+        batches = {}
+        for row in self._conn.execute(
+            'SELECT batch_id, molecules, country_filter, result_limit, priority, status, '
+            'created_at, started_at, completed_at FROM batches ORDER BY created_at'
+        ):
+            batches[row[0]] = {
+                'batch_id': row[0],
+                'molecules': json.loads(row[1]),
+                'country_filter': row[2],
+                'limit': row[3],
+                'priority': row[4],
+                'status': row[5],
+                'created_at': row[6],
+                'started_at': row[7],
+                'completed_at': row[8],
+                'jobs': []
+            }
+
+        for row in self._conn.execute(
+            'SELECT batch_id, molecule, status, error, started_at, completed_at, duration_seconds, '
+            'provenance, shared_from, result IS NOT NULL FROM molecule_jobs ORDER BY batch_id, position'
+        ):
+            if row[0] in batches:
+                batches[row[0]]['jobs'].append({
+                    'molecule': row[1],
+                    'status': row[2],
+                    'error': row[3],
+                    'started_at': row[4],
+                    'completed_at': row[5],
+                    'duration_seconds': row[6],
+                    'provenance': row[7],
+                    'shared_from': row[8],
+                    'has_result': bool(row[9])
+                })
+
+        return list(batches.values())
+
+    def load_result(self, batch_id: str, molecule: str) -> Optional[Dict]:
+        row = self._conn.execute(
+            'SELECT result FROM molecule_jobs WHERE batch_id = ? AND molecule = ? AND result IS NOT NULL',
+            (batch_id, molecule)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def load_results(self, batch_id: str) -> Dict[str, Dict]:
+        rows = self._conn.execute(
+            'SELECT molecule, result FROM molecule_jobs WHERE batch_id = ? AND result IS NOT NULL '
+            'ORDER BY position',
+            (batch_id,)
+        ).fetchall()
+        return {molecule: json.loads(result) for molecule, result in rows}
+
+    def delete_batch(self, batch_id: str) -> bool:
+        with self._conn:
+            self._conn.execute('BEGIN')
+            self._conn.execute('DELETE FROM molecule_jobs WHERE batch_id = ?', (batch_id,))
+            cursor = self._conn.execute('DELETE FROM batches WHERE batch_id = ?', (batch_id,))
+        return cursor.rowcount > 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        batches, = self._conn.execute('SELECT COUNT(*) FROM batches').fetchone()
+        results, size = self._conn.execute(
+            'SELECT COUNT(*), COALESCE(SUM(LENGTH(result)), 0) FROM molecule_jobs WHERE result IS NOT NULL'
+        ).fetchone()
+        return {
+            'path': self.path,
+            'batches': batches,
+            'stored_results': results,
+            'results_bytes': size
+        }
+
+    def close(self):
+        self._conn.close()
+
+
+def create_batch_store() -> BatchStore:
+    """
+    Opens the batch store configured by BATCH_DB_PATH
+
+    Falls back to an in-memory database (no crash recovery) when the file
+    can't be opened.
+    """
+    path = os.getenv('BATCH_DB_PATH', 'data/pharmyrus_batches.db')
+    try:
+        return BatchStore(path)
+    except Exception as e:
+        logger.error(f"❌ Batch store unavailable ({path}), batches will not survive restarts: {e}")
+        return BatchStore(':memory:')
@@ -5,38 +5,207 @@ Gerencia múltiplos crawlers para paralelização eficiente
 """
 
 import asyncio
-from typing import List, Dict, Any, Optional
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Callable, Deque, List, Dict, Any, Optional, Tuple
 from datetime import datetime
 import logging
+import time
+import uuid
 
 from .wipo_crawler import WIPOCrawler
+from .negative_cache import NegativeCache
+from .retry_policy import RetryBudget
+from .single_flight import SingleFlight
+from .wipo_http import WIPOHttpFetcher
 
 logger = logging.getLogger(__name__)
 
 
-class WIPOCrawlerPool:
-    """Pool de crawlers WIPO para processamento paralelo"""
+class BatchHandle:
+    """
+    Lote submetido ao pool: resultados, progresso e cancelamento próprios
+    
+    Itere com `async for` para receber os resultados em ordem de conclusão,
+    ou use `await handle.results()` para coletar tudo.
+    """
     
+    def __init__(
+        self,
+        batch_id: str,
+        total: int,
+        budget: RetryBudget,
+        max_in_flight: int,
+        wake: Callable[[], None]
+    ):
+        self.batch_id = batch_id
+        self.total = total
+        self.pending: Deque[str] = deque()
+        self.budget = budget
+        self.max_in_flight = max_in_flight
+        
+        self.status = 'running'
+        self.in_flight = 0
+        self.processed = 0
+        self.success = 0
+        self.failed = 0
+        self.created_at = time.time()
+        self.finished_at: Optional[float] = None
+        
+        self._sink: asyncio.Queue = asyncio.Queue()
+        self._exhausted = False
+        self._wake = wake
+        self._monitor: Optional[asyncio.Task] = None
+        
+    @property
+    def done(self) -> bool:
+        return self.status != 'running'
+        
+    def ready(self) -> bool:
+        """Pode receber mais um worker (respeita o paralelismo e o consumidor)"""
+        return (
+            self.status == 'running'
+            and bool(self.pending)
+            and self.in_flight < self.max_in_flight
+            and self.in_flight + self._sink.qsize() < self.max_in_flight * 2
+        )
+        
+    def _deliver(self, result: Dict[str, Any]):
+        self.processed += 1
+        if result.get('titulo'):
+            self.success += 1
+        else:
+            self.failed += 1
+        self._sink.put_nowait(result)
+        
+        if self.processed == self.total:
+            self._finish('completed')
+            
+    def _complete(self, result: Dict[str, Any]):
+        """Chamado pelo worker ao terminar um WO deste lote"""
+        self.in_flight -= 1
+        if self.status == 'running':
+            self._deliver(result)
+            
+    def _finish(self, status: str):
+        self.status = status
+        self.finished_at = time.time()
+        self._sink.put_nowait(None)
+        if self._monitor and not self._monitor.done():
+            self._monitor.cancel()
+            
+    def cancel(self) -> bool:
+        """Descarta os WOs pendentes; resultados em andamento são ignorados"""
+        if self.done:
+            return False
+        logger.info(f"🛑 Lote {self.batch_id} cancelado ({len(self.pending)} WOs pendentes descartados)")
+        self.pending.clear()
+        self._finish('cancelled')
+        self._wake()
+        return True
+        
+    def progress(self) -> Dict[str, Any]:
+        return {
+            'batch_id': self.batch_id,
+            'status': self.status,
+            'total': self.total,
+            'processed': self.processed,
+            'success': self.success,
+            'failed': self.failed,
+            'active': self.in_flight,
+            'pending': len(self.pending),
+            'percentage': (self.processed / self.total * 100) if self.total > 0 else 100.0,
+            'retry_budget': self.budget.to_dict()
+        }
+        
+    def __aiter__(self):
+        return self
+        
+    async def __anext__(self) -> Dict[str, Any]:
+        if self._exhausted:
+            raise StopAsyncIteration
+        result = await self._sink.get()
+        if result is None:
+            self._exhausted = True
+            raise StopAsyncIteration
+        # Espaço liberado no buffer do lote
+        self._wake()
+        return result
+        
+    async def results(self) -> List[Dict[str, Any]]:
+        return [result async for result in self]
+        
+
+
+class WIPOCrawlerPool:
+    """
+    Pool de crawlers WIPO para processamento paralelo
+        
+    Começa com min_size browsers (lançados em paralelo) e escala até
+    max_size conforme a demanda (leases aguardando + itens na fila),
+    desde que o host tenha memória livre. Browsers ociosos além de
+    min_size são fechados após idle_timeout segundos.
+    """
+        
     def __init__(
         self,
         pool_size: int = 3,
         max_retries: int = 5,
         timeout: int = 60000,
-        max_queue_size: int = 100
+        max_queue_size: int = 100,
+        max_uses_per_crawler: int = 50,
+        flight: Optional[SingleFlight] = None,
+        crawler_options: Optional[Dict[str, Any]] = None,
+        http_fetcher: Optional[WIPOHttpFetcher] = None,
+        retry_budget_per_item: float = 1.0,
+        negative_cache: Optional[NegativeCache] = None,
+        max_size: Optional[int] = None,
+        memory_per_crawler_mb: int = 300,
+        min_free_memory_mb: int = 512,
+        idle_timeout: float = 120.0,
+        scale_interval: float = 5.0
     ):
         self.pool_size = pool_size
+        self.min_size = pool_size
+        self.max_size = max(pool_size, max_size or pool_size)
         self.max_retries = max_retries
         self.timeout = timeout
         self.max_queue_size = max_queue_size
+        self.max_uses_per_crawler = max_uses_per_crawler
+        self.crawler_options = crawler_options or {}
+        self.http_fetcher = http_fetcher
+        self.retry_budget_per_item = retry_budget_per_item
+        self.negative_cache = negative_cache
+        self.memory_per_crawler_mb = memory_per_crawler_mb
+        self.min_free_memory_mb = min_free_memory_mb
+        self.idle_timeout = idle_timeout
+        self.scale_interval = scale_interval
         
         self.crawlers: List[WIPOCrawler] = []
         self.active_tasks = 0
         self.total_processed = 0
         self.total_success = 0
         self.total_failed = 0
+        self.total_leases = 0
+        self.total_recycled = 0
+        self.total_scaled_up = 0
+        self.total_scaled_down = 0
+        self.failures_by_class: Dict[str, int] = {}
+        self.retry_budget: Optional[RetryBudget] = None
         
-        self._queue: asyncio.Queue = None
-        self._results: List[Dict[str, Any]] = []
+        self._idle: asyncio.Queue = None
+        self._idle_since: Dict[int, float] = {}
+        self._lease_waiters = 0
+        self._batches: Deque[BatchHandle] = deque()
+        self._work = asyncio.Event()
+        self._workers: List[asyncio.Task] = []
+        self._launching = 0
+        self._scaler: Optional[asyncio.Task] = None
+        self._grow_task: Optional[asyncio.Task] = None
+        
+        # Coalesce buscas concorrentes do mesmo WO (requests avulsos e lotes);
+        # pode ser compartilhado entre pools
+        self.flight = flight or SingleFlight()
         self._lock = asyncio.Lock()
         
     async def __aenter__(self):
@@ -47,156 +216,459 @@ class WIPOCrawlerPool:
         await self.close()
         
     async def initialize(self):
-        """Inicializa o pool de crawlers"""
-        logger.info(f"🚀 Inicializando pool com {self.pool_size} crawlers...")
+        """Inicializa o pool de crawlers (browsers lançados em paralelo)"""
+        logger.info(f"🚀 Inicializando pool com {self.min_size} crawlers (máx {self.max_size})...")
         
-        self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+        self._idle = asyncio.Queue()
+        
+        launched = await self._launch_many(self.min_size)
+        if not launched:
+            raise RuntimeError("Nenhum crawler pôde ser inicializado")
+        
+        # Workers compartilhados por todos os lotes
+        self._workers = [
+            asyncio.create_task(self._worker(i))
+            for i in range(1, self.max_size + 1)
+        ]
+        
+        if self.max_size > self.min_size:
+            self._scaler = asyncio.create_task(self._autoscale_loop())
         
-        # Inicializa crawlers
-        for i in range(self.pool_size):
-            crawler = WIPOCrawler(
-                max_retries=self.max_retries,
-                timeout=self.timeout,
-                headless=True
-            )
-            await crawler.initialize()
-            self.crawlers.append(crawler)
-            logger.info(f"✅ Crawler {i+1}/{self.pool_size} pronto")
-            
         logger.info(f"✅ Pool inicializado com {len(self.crawlers)} crawlers")
         
     async def close(self):
         """Fecha todos os crawlers"""
         logger.info("🔒 Fechando pool...")
         
+        for handle in list(self._batches):
+            handle.cancel()
+        self._batches.clear()
+        
+        for task in (self._scaler, self._grow_task, *self._workers):
+            if task and not task.done():
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._scaler = None
+        self._grow_task = None
+        self._workers = []
+        
         for crawler in self.crawlers:
             try:
                 await crawler.close()
             except Exception as e:
                 logger.error(f"Erro ao fechar crawler: {e}")
-                
+        
+        self.crawlers = []
+        self._idle_since = {}
         logger.info("✅ Pool fechado")
         
-    async def _worker(self, worker_id: int, crawler: WIPOCrawler):
-        """Worker que processa itens da fila"""
-        logger.info(f"👷 Worker {worker_id} iniciado")
+    async def _launch_crawler(self) -> WIPOCrawler:
+        """Cria e inicializa um novo crawler"""
+        crawler = WIPOCrawler(
+            max_retries=self.max_retries,
+            timeout=self.timeout,
+            headless=True,
+            **self.crawler_options
+        )
+        await crawler.initialize()
+        return crawler
+        
+    async def _launch_many(self, count: int) -> int:
+        """Lança `count` crawlers em paralelo e os disponibiliza; retorna quantos subiram"""
+        self._launching += count
+        try:
+            results = await asyncio.gather(
+                *(self._launch_crawler() for _ in range(count)),
+                return_exceptions=True
+            )
+        finally:
+            self._launching -= count
+        
+        launched = 0
+        for result in results:
+            if isinstance(result, BaseException):
+                logger.error(f"❌ Falha ao lançar crawler: {result}")
+                continue
+            self.crawlers.append(result)
+            self._release(result)
+            launched += 1
+            logger.info(f"✅ Crawler {len(self.crawlers)}/{self.max_size} pronto")
+        return launched
+        
+    async def _recycle(self, crawler: WIPOCrawler) -> WIPOCrawler:
+        """Substitui um crawler desgastado ou desconectado por um novo"""
+        reason = "desconectado" if not crawler.is_healthy() else f"{crawler.uses} usos"
+        logger.info(f"♻️ Reciclando crawler ({reason})")
+        
+        try:
+            await crawler.close()
+        except Exception as e:
+            logger.error(f"Erro ao fechar crawler: {e}")
+        
+        fresh = await self._launch_crawler()
+        self.crawlers = [fresh if c is crawler else c for c in self.crawlers]
+        self.total_recycled += 1
+        return fresh
+        
+    def _release(self, crawler: WIPOCrawler):
+        self._idle_since[id(crawler)] = time.monotonic()
+        self._idle.put_nowait(crawler)
+        
+    # Escala dinâmica
+    @staticmethod
+    def available_memory_mb() -> Optional[int]:
+        """MemAvailable do host (Linux); None quando não dá para medir"""
+        try:
+            with open('/proc/meminfo') as f:
+                for line in f:
+                    if line.startswith('MemAvailable:'):
+                        return int(line.split()[1]) // 1024
+        except (OSError, ValueError):
+            pass
+        return None
+        
+    def queued(self) -> int:
+        """WOs pendentes em todos os lotes ativos"""
+        return sum(len(h.pending) for h in self._batches if not h.done)
+        
+    def demand(self) -> int:
+        """
+        Trabalho esperando por um browser: leases bloqueados + itens que os
+        workers podem despachar agora (respeita o paralelismo de cada lote e
+        o backpressure do consumidor, como _pick)
+        """
+        dispatchable = sum(
+            min(len(h.pending), h.max_in_flight - h.in_flight)
+            for h in self._batches if h.ready()
+        )
+        return self._lease_waiters + dispatchable
+        
+    def _growth_allowed(self) -> int:
+        """Quantos crawlers ainda cabem (limite do pool e memória livre)"""
+        room = self.max_size - len(self.crawlers) - self._launching
+        if room <= 0:
+            return 0
+        
+        free_mb = self.available_memory_mb()
+        if free_mb is not None:
+            room = min(room, (free_mb - self.min_free_memory_mb) // self.memory_per_crawler_mb)
+        return max(0, room)
         
+    def _maybe_grow(self):
+        """Dispara o crescimento em background quando há demanda sem crawler ocioso"""
+        if self._grow_task and not self._grow_task.done():
+            return
+        if self._idle.qsize() > 0:
+            return
+        
+        count = min(self.demand(), self._growth_allowed())
+        if count > 0:
+            logger.info(f"📈 Escalando pool: +{count} crawlers (demanda {self.demand()})")
+            self.total_scaled_up += count
+            self._grow_task = asyncio.create_task(self._launch_many(count))
+        
+    async def _shrink(self):
+        """Fecha crawlers ociosos além de min_size (idle_timeout ou pouca memória)"""
+        free_mb = self.available_memory_mb()
+        low_memory = free_mb is not None and free_mb < self.min_free_memory_mb
+        now = time.monotonic()
+        
+        keep = []
+        while len(self.crawlers) > self.min_size and not self._idle.empty():
+            crawler = self._idle.get_nowait()
+            idle_for = now - self._idle_since.get(id(crawler), now)
+            
+            if not low_memory and idle_for < self.idle_timeout:
+                keep.append(crawler)
+                continue
+            
+            self.crawlers = [c for c in self.crawlers if c is not crawler]
+            self._idle_since.pop(id(crawler), None)
+            self.total_scaled_down += 1
+            logger.info(f"📉 Reduzindo pool: {len(self.crawlers)} crawlers ({'memória baixa' if low_memory else 'ocioso'})")
+            try:
+                await crawler.close()
+            except Exception as e:
+                logger.error(f"Erro ao fechar crawler: {e}")
+        
+        for crawler in keep:
+            self._idle.put_nowait(crawler)
+        
+    async def _autoscale_loop(self):
+        """Reavalia o tamanho do pool periodicamente"""
         while True:
+            await asyncio.sleep(self.scale_interval)
             try:
-                # Pega item da fila
-                wo_number = await self._queue.get()
-                
-                if wo_number is None:  # Sinal de parada
-                    self._queue.task_done()
-                    break
-                    
-                async with self._lock:
-                    self.active_tasks += 1
-                    
-                logger.info(f"👷 Worker {worker_id} processando: {wo_number}")
+                if self.demand():
+                    self._maybe_grow()
+                elif self._lease_waiters == 0:
+                    await self._shrink()
+            except Exception as e:
+                logger.error(f"❌ Erro no autoscale do pool: {e}")
+        
+    @asynccontextmanager
+    async def lease(self):
+        """
+        Empresta um crawler do pool com exclusividade
+        
+        O crawler é verificado (health check) e reciclado após
+        max_uses_per_crawler usos antes de ser entregue. Sem crawler
+        ocioso, o pool tenta crescer até max_size.
+        """
+        self._lease_waiters += 1
+        try:
+            self._maybe_grow()
+            crawler = await self._idle.get()
+        finally:
+            self._lease_waiters -= 1
+        
+        try:
+            if not crawler.is_healthy() or crawler.uses >= self.max_uses_per_crawler:
+                crawler = await self._recycle(crawler)
+            
+            crawler.uses += 1
+            self.total_leases += 1
+            yield crawler
+        finally:
+            self._release(crawler)
+        
+    async def fetch_patent(self, wo_number: str, budget: Optional[RetryBudget] = None) -> Dict[str, Any]:
+        """
+        Busca uma patente usando um crawler emprestado do pool
+        
+        Chamadas concorrentes para o mesmo WO compartilham uma única busca;
+        cada chamador recebe sua própria cópia do resultado.
+        """
+        key = WIPOCrawler.normalize_wo(wo_number)
+        result = await self.flight.do(key, lambda: self._fetch(wo_number, budget))
+        return dict(result)
+        
+    async def _fetch(self, wo_number: str, budget: Optional[RetryBudget] = None) -> Dict[str, Any]:
+        """Fast path HTTP primeiro; só empresta um browser quando necessário"""
+        if self.http_fetcher:
+            data = await self.http_fetcher.fetch_patent(wo_number)
+            if data and data.get('erro_classe') and self.negative_cache:
+                self.negative_cache.record(wo_number, data)
+            if data:
+                return data
+        
+        async with self.lease() as crawler:
+            result = await crawler.fetch_patent(wo_number, budget=budget)
+        
+        if self.negative_cache:
+            self.negative_cache.record(wo_number, result)
+        return result
+        
+    # Lotes
+    def _wake(self):
+        self._work.set()
+        
+    def _pick(self) -> Optional[Tuple[BatchHandle, str]]:
+        """Próximo WO em round-robin entre os lotes ativos"""
+        for _ in range(len(self._batches)):
+            handle = self._batches[0]
+            self._batches.rotate(-1)
+            
+            if handle.done and handle.in_flight == 0:
+                self._batches.remove(handle)
+                continue
+            if handle.ready():
+                handle.in_flight += 1
+                return handle, handle.pending.popleft()
+        return None
+        
+    async def _next_item(self) -> Tuple[BatchHandle, str]:
+        while True:
+            item = self._pick()
+            if item:
+                return item
+            self._work.clear()
+            await self._work.wait()
+            
+    async def _worker(self, worker_id: int):
+        """Worker compartilhado: atende os lotes ativos de forma justa"""
+        logger.info(f"👷 Worker {worker_id} iniciado")
+        
+        while True:
+            handle, wo_number = await self._next_item()
+            
+            async with self._lock:
+                self.active_tasks += 1
                 
+            logger.info(f"👷 Worker {worker_id} processando: {wo_number} (lote {handle.batch_id})")
+            
+            start_time = datetime.now()
+            try:
                 # Processa patente
-                start_time = datetime.now()
-                result = await crawler.fetch_patent(wo_number)
-                duration = (datetime.now() - start_time).total_seconds()
-                
-                # Adiciona metadados
-                result['worker_id'] = worker_id
-                result['processed_at'] = datetime.now().isoformat()
-                
-                # Salva resultado
-                async with self._lock:
-                    self._results.append(result)
-                    self.total_processed += 1
-                    
-                    if result.get('titulo'):
-                        self.total_success += 1
-                        logger.info(f"✅ Worker {worker_id} sucesso: {wo_number} ({duration:.1f}s)")
-                    else:
-                        self.total_failed += 1
-                        logger.warning(f"⚠️ Worker {worker_id} falha: {wo_number}")
-                        
-                    self.active_tasks -= 1
-                    
-                self._queue.task_done()
-                
+                result = await self.fetch_patent(wo_number, handle.budget)
+            except asyncio.CancelledError:
+                handle.in_flight -= 1
+                raise
             except Exception as e:
                 logger.error(f"❌ Worker {worker_id} erro: {e}")
-                async with self._lock:
-                    self.active_tasks -= 1
-                self._queue.task_done()
+                result = {
+                    'fonte': 'WIPO',
+                    'pais': 'WO',
+                    'publicacao': wo_number,
+                    'erro': str(e),
+                    'status': 'FALHA',
+                    'worldwide_applications': {}
+                }
+            duration = (datetime.now() - start_time).total_seconds()
+            
+            # Adiciona metadados
+            result['worker_id'] = worker_id
+            result['batch_id'] = handle.batch_id
+            result['processed_at'] = datetime.now().isoformat()
+            
+            async with self._lock:
+                self.total_processed += 1
                 
-        logger.info(f"👷 Worker {worker_id} finalizado")
-        
-    async def process_batch(
+                if result.get('titulo'):
+                    self.total_success += 1
+                    logger.info(f"✅ Worker {worker_id} sucesso: {wo_number} ({duration:.1f}s)")
+                else:
+                    self.total_failed += 1
+                    error_class = result.get('erro_classe', 'unknown')
+                    self.failures_by_class[error_class] = self.failures_by_class.get(error_class, 0) + 1
+                    logger.warning(f"⚠️ Worker {worker_id} falha ({error_class}): {wo_number}")
+                    
+                self.active_tasks -= 1
+                
+            handle._complete(result)
+            self._wake()
+            
+    def submit(
         self,
         wo_numbers: List[str],
-        progress_callback: Optional[callable] = None
-    ) -> List[Dict[str, Any]]:
+        retry_budget: Optional[int] = None,
+        concurrency: Optional[int] = None,
+        progress_callback: Optional[callable] = None,
+        batch_id: Optional[str] = None
+    ) -> BatchHandle:
         """
-        Processa lote de patentes em paralelo
+        Submete um lote aos workers compartilhados do pool
         
         Args:
             wo_numbers: Lista de números WO
-            progress_callback: Função callback para progresso (opcional)
+            retry_budget: Total de retries do lote (padrão: retry_budget_per_item por WO)
+            concurrency: Máximo de WOs do lote em paralelo (padrão: max_size do pool)
+            progress_callback: Função async chamada com o progresso a cada 2s (opcional)
+            batch_id: Identificador do lote (padrão: gerado)
             
         Returns:
-            Lista de resultados
+            BatchHandle com resultados, progresso e cancelamento do lote
         """
         logger.info(f"🎯 Processando lote de {len(wo_numbers)} patentes")
         
-        # Reseta estado
-        self._results = []
-        self.total_processed = 0
-        self.total_success = 0
-        self.total_failed = 0
+        if retry_budget is None:
+            retry_budget = int(len(wo_numbers) * self.retry_budget_per_item)
+        budget = RetryBudget(retry_budget)
+        self.retry_budget = budget
+        
+        handle = BatchHandle(
+            batch_id=batch_id or uuid.uuid4().hex[:8],
+            total=len(wo_numbers),
+            budget=budget,
+            max_in_flight=max(1, concurrency or self.max_size),
+            wake=self._wake
+        )
         
-        # Adiciona itens na fila
+        # Falhas conhecidas não entram na fila
+        skipped = 0
         for wo in wo_numbers:
-            await self._queue.put(wo)
+            known_failure = self.negative_cache.get(wo) if self.negative_cache else None
+            if known_failure:
+                handle._deliver(known_failure)
+                skipped += 1
+            else:
+                handle.pending.append(wo)
+        if skipped:
+            logger.info(f"🚫 {skipped} WOs ignorados (cache negativo)")
+        if handle.total == 0:
+            handle._finish('completed')
             
-        # Inicia workers
-        workers = [
-            asyncio.create_task(self._worker(i, crawler))
-            for i, crawler in enumerate(self.crawlers, 1)
-        ]
-        
-        # Monitora progresso
-        if progress_callback:
-            asyncio.create_task(self._monitor_progress(progress_callback, len(wo_numbers)))
+        if not handle.done:
+            if progress_callback:
+                handle._monitor = asyncio.create_task(self._monitor_progress(progress_callback, handle))
+            self._batches.append(handle)
+            self._wake()
             
-        # Aguarda conclusão
-        await self._queue.join()
+        return handle
         
-        # Envia sinal de parada para workers
-        for _ in self.crawlers:
-            await self._queue.put(None)
+    async def iter_batch(
+        self,
+        wo_numbers: List[str],
+        retry_budget: Optional[int] = None,
+        concurrency: Optional[int] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Processa lote de patentes, entregando cada resultado assim que um
+        worker o conclui (ordem de conclusão)
+        
+        Interromper a iteração cancela o lote e descarta os WOs pendentes.
+        """
+        handle = self.submit(wo_numbers, retry_budget=retry_budget, concurrency=concurrency)
+        try:
+            async for result in handle:
+                yield result
+        finally:
+            handle.cancel()
+            logger.info(f"📊 Lote {handle.batch_id} finalizado - retries usados: {handle.budget.used}/{handle.budget.limit}")
+        
+    async def process_batch(
+        self,
+        wo_numbers: List[str],
+        progress_callback: Optional[callable] = None,
+        retry_budget: Optional[int] = None,
+        concurrency: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Processa lote de patentes em paralelo
+        
+        Seguro para lotes concorrentes no mesmo pool: cada chamada recebe
+        seu próprio BatchHandle sobre os workers compartilhados.
+        
+        Args:
+            wo_numbers: Lista de números WO
+            progress_callback: Função callback para progresso (opcional)
+            retry_budget: Total de retries do lote (padrão: retry_budget_per_item por WO)
+            concurrency: Máximo de WOs do lote em paralelo (padrão: max_size do pool)
             
-        # Aguarda workers finalizarem
-        await asyncio.gather(*workers)
+        Returns:
+            Lista de resultados
+        """
+        handle = self.submit(
+            wo_numbers,
+            retry_budget=retry_budget,
+            concurrency=concurrency,
+            progress_callback=progress_callback
+        )
+        try:
+            results = await handle.results()
+        finally:
+            handle.cancel()
         
         # Estatísticas finais
         logger.info(f"\n{'='*60}")
-        logger.info(f"📊 ESTATÍSTICAS FINAIS")
+        logger.info(f"📊 ESTATÍSTICAS FINAIS (lote {handle.batch_id})")
         logger.info(f"{'='*60}")
-        logger.info(f"Total processado: {self.total_processed}")
-        logger.info(f"Sucesso: {self.total_success} ({self.total_success/max(1, self.total_processed)*100:.1f}%)")
-        logger.info(f"Falhas: {self.total_failed} ({self.total_failed/max(1, self.total_processed)*100:.1f}%)")
+        logger.info(f"Total processado: {handle.processed}")
+        logger.info(f"Sucesso: {handle.success} ({handle.success/max(1, handle.processed)*100:.1f}%)")
+        logger.info(f"Falhas: {handle.failed} ({handle.failed/max(1, handle.processed)*100:.1f}%)")
+        logger.info(f"Retries usados: {handle.budget.used}/{handle.budget.limit}")
+        logger.info(f"Crawlers: {len(self.crawlers)} (máx {self.max_size})")
         logger.info(f"{'='*60}\n")
         
-        return self._results
+        return results
         
-    async def _monitor_progress(self, callback: callable, total: int):
-        """Monitora e reporta progresso"""
-        while self.total_processed < total:
-            progress = {
-                'total': total,
-                'processed': self.total_processed,
-                'success': self.total_success,
-                'failed': self.total_failed,
-                'active': self.active_tasks,
-                'percentage': (self.total_processed / total * 100) if total > 0 else 0
-            }
+    async def _monitor_progress(self, callback: callable, handle: BatchHandle):
+        """Monitora e reporta progresso do lote (cancelado quando o lote termina)"""
+        while not handle.done:
+            progress = handle.progress()
             
             await callback(progress)
             await asyncio.sleep(2)
@@ -204,20 +676,39 @@ class WIPOCrawlerPool:
     def get_stats(self) -> Dict[str, Any]:
         """Retorna estatísticas do pool"""
         return {
-            'pool_size': self.pool_size,
+            'pool_size': len(self.crawlers),
+            'min_size': self.min_size,
+            'max_size': self.max_size,
+            'launching': self._launching,
+            'demand': self.demand(),
+            'available_memory_mb': self.available_memory_mb(),
+            'total_scaled_up': self.total_scaled_up,
+            'total_scaled_down': self.total_scaled_down,
+            'healthy_crawlers': sum(1 for c in self.crawlers if c.is_healthy()),
+            'idle_crawlers': self._idle.qsize() if self._idle else 0,
+            'total_leases': self.total_leases,
+            'total_recycled': self.total_recycled,
+            'blocked_requests': sum(c.blocked_requests for c in self.crawlers),
+            'crawlers': [c.get_stats() for c in self.crawlers],
+            'single_flight': self.flight.get_stats(),
+            'http_fast_path': self.http_fetcher.get_stats() if self.http_fetcher else None,
             'active_tasks': self.active_tasks,
             'total_processed': self.total_processed,
             'total_success': self.total_success,
             'total_failed': self.total_failed,
             'success_rate': (self.total_success / max(1, self.total_processed) * 100),
-            'queue_size': self._queue.qsize() if self._queue else 0
+            'failures_by_class': dict(self.failures_by_class),
+            'retry_budget': self.retry_budget.to_dict() if self.retry_budget else None,
+            'workers': len(self._workers),
+            'active_batches': [h.progress() for h in self._batches if not h.done],
+            'queue_size': self.queued()
         }
 
 
 # Exemplo de uso
 async def example_usage():
     """Exemplo de como usar o pool"""
-    
+        
     wo_numbers = [
         'WO2018162793',
         'WO2016168716',
@@ -225,13 +716,13 @@ async def example_usage():
         'WO2011092143',
         'WO2007129058'
     ]
-    
+        
     async def progress_callback(progress):
         print(f"Progresso: {progress['percentage']:.1f}% "
               f"({progress['processed']}/{progress['total']}) - "
               f"Ativos: {progress['active']}")
-    
-    async with WIPOCrawlerPool(pool_size=3) as pool:
+        
+    async with WIPOCrawlerPool(pool_size=2, max_size=4) as pool:
         results = await pool.process_batch(wo_numbers, progress_callback)
         
         print(f"\n✅ Processamento concluído!")
@@ -0,0 +1,65 @@
+"""
+Shared HTTP Session
+Single lifecycle-managed aiohttp ClientSession with connection pooling,
+DNS caching and per-host connection caps for all upstream APIs
+"""
+import os
+from typing import Any, Dict, Optional
+
+import aiohttp
+
+
+class HTTPSessionManager:
+    """Owns the process-wide aiohttp session used by the pipeline layers"""
+
+    def __init__(
+        self,
+        limit: int = 100,
+        limit_per_host: int = 10,
+        dns_cache_ttl: int = 300,
+        keepalive_timeout: int = 60
+    ):
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.dns_cache_ttl = dns_cache_ttl
+        self.keepalive_timeout = keepalive_timeout
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    async def start(self) -> aiohttp.ClientSession:
+        """Create the session (called at app startup)"""
+        return self.get()
+
+    def get(self) -> aiohttp.ClientSession:
+        """Return the shared session, creating it lazily inside the running loop"""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.limit,
+                limit_per_host=self.limit_per_host,
+                ttl_dns_cache=self.dns_cache_ttl,
+                keepalive_timeout=self.keepalive_timeout
+            )
+            self._session = aiohttp.ClientSession(connector=connector)
+        return self._session
+
+    async def close(self):
+        """Close the session and its pooled connections (called at shutdown)"""
+        if self._session and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Connection pool statistics"""
+        return {
+            "active": self._session is not None and not self._session.closed,
+            "limit": self.limit,
+            "limit_per_host": self.limit_per_host,
+            "dns_cache_ttl": self.dns_cache_ttl
+        }
+
+
+# Singleton instance
+http_session = HTTPSessionManager(
+    limit=int(os.getenv("HTTP_POOL_LIMIT", "100")),
+    limit_per_host=int(os.getenv("HTTP_POOL_LIMIT_PER_HOST", "10")),
+    dns_cache_ttl=int(os.getenv("HTTP_DNS_CACHE_TTL", "300"))
+)
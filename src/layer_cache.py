@@ -0,0 +1,149 @@
+"""
+Layer Cache
+Per-source cache for pipeline layers that change rarely (PubChem, FDA,
+ClinicalTrials), with stale-while-revalidate and HTTP validator storage
+for conditional (ETag / Last-Modified) refetches
+"""
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Set
+
+from .single_flight import SingleFlight
+from .tiered_cache import TieredCache, create_cache
+
+logger = logging.getLogger(__name__)
+
+
+class LayerCache:
+    """
+    Caches layer results per (source, molecule)
+
+    - age < ttl: served from cache
+    - ttl <= age < ttl + stale_ttl: served stale, refreshed in the background
+    - older / missing: loaded synchronously
+    """
+
+    def __init__(
+        self,
+        ttls: Dict[str, int],
+        stale_ttls: Optional[Dict[str, int]] = None,
+        cache: Optional[TieredCache] = None,
+        validators: Optional[TieredCache] = None
+    ):
+        self.ttls = ttls
+        self.stale_ttls = stale_ttls or dict(ttls)
+        horizon = max(self.ttls[s] + self.stale_ttls.get(s, 0) for s in self.ttls)
+        self.cache = cache or create_cache("pipeline_layers", ttl=horizon)
+        self.validators = validators or create_cache("http_validators", ttl=horizon)
+        self.flight = SingleFlight()
+        self._refreshing: Set[asyncio.Task] = set()
+
+        self.stats: Dict[str, Dict[str, int]] = {
+            source: {"fresh": 0, "stale": 0, "miss": 0, "revalidated": 0}
+            for source in ttls
+        }
+
+    @staticmethod
+    def key(source: str, molecule: str) -> str:
+        return f"{source}:{molecule.strip().lower()}"
+
+    async def get_or_load(
+        self,
+        source: str,
+        molecule: str,
+        loader: Callable[[], Awaitable[Dict]],
+        cacheable: Callable[[Dict], bool] = lambda result: "error" not in result
+    ) -> Dict:
+        """Return the cached layer result for the molecule, loading it when needed"""
+        key = self.key(source, molecule)
+        ttl = self.ttls[source]
+        entry = self.cache.get(key)
+
+        async def load() -> Dict:
+            result = await loader()
+            if isinstance(result, dict) and cacheable(result):
+                self.cache.set(key, {"value": result, "fetched_at": time.time()},
+                               ttl=ttl + self.stale_ttls.get(source, 0))
+            return result
+
+        if entry is not None:
+            age = time.time() - entry["fetched_at"]
+            if age < ttl:
+                self.stats[source]["fresh"] += 1
+                return entry["value"]
+
+            # Stale: answer now, refresh once in the background
+            self.stats[source]["stale"] += 1
+            if not self.flight.in_flight(key):
+                task = asyncio.create_task(self.flight.do(key, load))
+                self._refreshing.add(task)
+                task.add_done_callback(self._refresh_done)
+            return entry["value"]
+
+        self.stats[source]["miss"] += 1
+        return await self.flight.do(key, load)
+
+    def _refresh_done(self, task: asyncio.Task):
+        self._refreshing.discard(task)
+        if not task.cancelled() and task.exception():
+            logger.warning(f"⚠️ Background layer refresh failed: {task.exception()}")
+
+    # HTTP validators (ETag / Last-Modified)
+    def conditional_headers(self, request_key: str) -> Dict[str, str]:
+        stored = self.validators.get(request_key)
+        if not stored:
+            return {}
+        headers = {}
+        if stored.get("etag"):
+            headers["If-None-Match"] = stored["etag"]
+        if stored.get("last_modified"):
+            headers["If-Modified-Since"] = stored["last_modified"]
+        return headers
+
+    def not_modified(self, request_key: str, source: Optional[str] = None) -> Optional[Any]:
+        """Body stored with the validators, for a 304 response"""
+        stored = self.validators.get(request_key)
+        if stored is None:
+            return None
+        if source in self.stats:
+            self.stats[source]["revalidated"] += 1
+        return stored["body"]
+
+    def store_validators(self, request_key: str, etag: Optional[str], last_modified: Optional[str], body: Any):
+        if etag or last_modified:
+            self.validators.set(request_key, {"etag": etag, "last_modified": last_modified, "body": body})
+
+    async def close(self):
+        for task in list(self._refreshing):
+            task.cancel()
+        await asyncio.gather(*self._refreshing, return_exceptions=True)
+        for cache in (self.cache, self.validators):
+            await cache.stop_sweeper()
+            cache.close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "size": len(self.cache),
+            "validators": len(self.validators),
+            "ttl_seconds": dict(self.ttls),
+            "stale_ttl_seconds": dict(self.stale_ttls),
+            "refreshing": len(self._refreshing),
+            "sources": {source: dict(counts) for source, counts in self.stats.items()}
+        }
+
+
+# Singleton instance
+layer_cache = LayerCache(
+    ttls={
+        "pubchem": int(os.getenv("PUBCHEM_CACHE_TTL", "604800")),
+        "fda": int(os.getenv("FDA_CACHE_TTL", "86400")),
+        "clinical_trials": int(os.getenv("CLINICAL_TRIALS_CACHE_TTL", "43200"))
+    },
+    stale_ttls={
+        "pubchem": int(os.getenv("PUBCHEM_CACHE_STALE_TTL", "604800")),
+        "fda": int(os.getenv("FDA_CACHE_STALE_TTL", "86400")),
+        "clinical_trials": int(os.getenv("CLINICAL_TRIALS_CACHE_STALE_TTL", "43200"))
+    }
+)
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Negative Cache
+Lembra WOs que falharam (ou não existem no Patentscope) por um TTL curto,
+definido por classe de falha, para que lotes e a Layer 3 não os re-busquem
+"""
+
+import time
+from typing import Any, Dict, Optional
+import logging
+
+from .retry_policy import ErrorClass
+from .tiered_cache import TieredCache, create_cache
+from .wipo_crawler import WIPOCrawler
+
+logger = logging.getLogger(__name__)
+
+
+class NegativeCache:
+    """Cache de falhas por WO com TTL por classe de erro"""
+
+    DEFAULT_TTLS = {
+        ErrorClass.PERMANENT.value: 86400,
+        ErrorClass.BLOCKED.value: 900,
+        ErrorClass.TRANSIENT.value: 300,
+    }
+
+    def __init__(self, ttls: Optional[Dict[str, int]] = None, cache: Optional[TieredCache] = None):
+        self.ttls = {**self.DEFAULT_TTLS, **(ttls or {})}
+        self.cache = cache or create_cache('wipo_negative', ttl=max(self.ttls.values()))
+
+        self.hits = 0
+        self.stored: Dict[str, int] = {}
+
+    @staticmethod
+    def key(wo: str) -> str:
+        return WIPOCrawler.normalize_wo(wo)
+
+    def get(self, wo: str) -> Optional[Dict[str, Any]]:
+        """Registro de falha conhecido para o WO (cópia), ou None"""
+        entry = self.cache.get(self.key(wo))
+        if not entry:
+            return None
+
+        self.hits += 1
+        logger.info(f"🚫 Cache negativo HIT: {wo} ({entry.get('erro_classe')})")
+        return {**entry, 'publicacao': wo, 'cache_negativo': True}
+
+    def record(self, wo: str, result: Dict[str, Any]) -> bool:
+        """Guarda o resultado se for uma falha classificada com TTL > 0"""
+        error_class = result.get('erro_classe')
+        if result.get('titulo') or not error_class:
+            return False
+
+        ttl = self.ttls.get(error_class, 0)
+        if ttl <= 0:
+            return False
+
+        self.cache.set(self.key(wo), {
+            'fonte': result.get('fonte', 'WIPO'),
+            'pais': result.get('pais', 'WO'),
+            'erro': result.get('erro'),
+            'erro_classe': error_class,
+            'status': result.get('status', 'FALHA'),
+            'documentos': result.get('documentos', {}),
+            'worldwide_applications': {},
+            'falhou_em': time.time()
+        }, ttl=ttl)
+        self.stored[error_class] = self.stored.get(error_class, 0) + 1
+        return True
+
+    def forget(self, wo: str) -> bool:
+        return self.cache.delete(self.key(wo))
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'entries': len(self.cache),
+            'hits': self.hits,
+            'stored_by_class': dict(self.stored),
+            'ttls': dict(self.ttls)
+        }
@@ -0,0 +1,90 @@
+"""
+Pipeline Result Cache
+Stores one unfiltered pipeline run per normalized molecule; country-filtered
+and smaller-limit responses are derived from that superset
+"""
+import os
+import re
+from typing import Any, Dict, Optional
+
+from .retry_policy import ErrorClass
+from .tiered_cache import TieredCache, create_cache
+
+
+class PipelineResultCache:
+    """
+    Whole-pipeline memo keyed by normalized molecule
+
+    A stored run fetched details for its first `limit` WO numbers with no
+    country filter, so it answers any request with a limit up to that
+    value (or any limit at all when discovery found fewer WOs). A run
+    whose discovery or detail fetching failed transiently covers nothing.
+    """
+
+    def __init__(self, namespace: str = "pipeline_results", ttl: int = 3600, cache: Optional[TieredCache] = None):
+        self.ttl = ttl
+        self.cache = cache or create_cache(namespace, ttl=ttl)
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+
+    @staticmethod
+    def key(molecule: str) -> str:
+        return re.sub(r"\s+", " ", molecule or "").strip().lower()
+
+    @staticmethod
+    def complete(run: Dict[str, Any]) -> bool:
+        """No failed search query and no WO missing details for a retryable reason"""
+        failures = run.get("failures") or {}
+        return not failures.get("queries") and all(
+            error_class == ErrorClass.PERMANENT.value for error_class in failures.get("wos", {}).values()
+        )
+
+    @classmethod
+    def covers(cls, run: Dict[str, Any], limit: int) -> bool:
+        """Whether the stored run contains every WO a `limit` request would fetch"""
+        if not cls.complete(run):
+            return False
+        return run["limit"] >= limit or len(run["wo_numbers_limited"]) < run["limit"]
+
+    def get(self, molecule: str, limit: int) -> Optional[Dict[str, Any]]:
+        run = self.cache.get(self.key(molecule))
+        if run is not None and self.covers(run, limit):
+            self.hits += 1
+            return run
+        self.misses += 1
+        return None
+
+    def store(self, molecule: str, run: Dict[str, Any]):
+        key = self.key(molecule)
+        current = self.cache.get(key)
+        # A fresh run for a smaller limit doesn't evict a wider superset
+        if current is not None and self.covers(current, run["limit"]) and not self.covers(run, current["limit"]):
+            return
+        self.cache.set(key, run)
+        self.stores += 1
+
+    def forget(self, molecule: str):
+        self.cache.delete(self.key(molecule))
+
+    def clear(self) -> int:
+        return self.cache.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self.cache),
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "stores": self.stores,
+            "disk": self.cache.get_stats()["disk"]
+        }
+
+
+# Singleton instance
+pipeline_cache = PipelineResultCache(
+    namespace="pipeline_results",
+    ttl=int(os.getenv("PIPELINE_CACHE_TTL", "3600"))
+)
@@ -3,11 +3,24 @@ Pipeline Service v3.0 - Complete Patent Intelligence Pipeline
 Executes parallel searches across 6 data sources with rich debug output
 """
 import asyncio
-import aiohttp
+import copy
+import logging
 import time
 import re
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Tuple, AsyncIterator
 from datetime import datetime
+from urllib.parse import urlencode
+
+from .http_session import http_session
+from .layer_cache import layer_cache
+from .pipeline_cache import pipeline_cache
+from .query_cache import serpapi_cache
+from .rate_limiter import rate_limiter
+from .retry_policy import ErrorClass
+from .single_flight import SingleFlight
+from .wipo_service import wipo_service
+
+logger = logging.getLogger(__name__)
 
 class PipelineService:
     """Orchestrates complete patent search pipeline"""
@@ -18,100 +31,199 @@ class PipelineService:
         self.fda_api = "https://api.fda.gov/drug"
         self.clinical_trials_api = "https://clinicaltrials.gov/api/v2/studies"
         self.pubchem_api = "https://pubchem.ncbi.nlm.nih.gov/rest/pug"
+        self.flight = SingleFlight()
         
     async def execute_full_pipeline(
         self,
         molecule: str,
         country_filter: Optional[str] = None,
-        limit: int = 20
+        limit: int = 20,
+        use_cache: bool = True
     ) -> Dict[str, Any]:
-        """Execute complete 6-layer pipeline with parallel processing"""
+        """
+        Execute complete 6-layer pipeline as a dataflow graph
+        
+        Each layer starts as soon as its inputs are available:
+        - PubChem, FDA, ClinicalTrials and the year-based WO queries start at t=0
+        - INPI and the dev-code WO queries start when PubChem completes
+        - Each WO number goes to detail fetching as soon as a search yields it (capped at limit)
+        
+        The unfiltered run is cached per normalized molecule; a request whose
+        limit fits in a cached run is answered from it, with the country
+        filter and limit applied to a copy. use_cache=False forces a new run.
+        """
         
         start_time = time.time()
+        
+        run = pipeline_cache.get(molecule, limit) if use_cache else None
+        cache_hit = run is not None
+        if run is None:
+            run = await self.flight.do(
+                f"{pipeline_cache.key(molecule)}:{limit}",
+                lambda: self._run_pipeline(molecule, limit)
+            )
+        
+        response = self._build_response(molecule, copy.deepcopy(run), country_filter, limit, start_time)
+        response["search_strategy"]["cache"] = {
+            "hit": cache_hit,
+            "source": "pipeline_cache" if cache_hit else "live",
+            "cached_at": datetime.utcfromtimestamp(run["completed_at"]).isoformat(),
+            "age_seconds": round(time.time() - run["completed_at"], 1),
+            "superset_limit": run["limit"],
+            "original_duration_seconds": round(run["durations"]["total"], 2)
+        }
+        return response
+    
+    async def _run_pipeline(self, molecule: str, limit: int) -> Dict[str, Any]:
+        """Run every layer with no country filter and cache the result as a superset"""
+        
+        start_time = time.time()
+        
+        # t=0: layers that only depend on the molecule name
+        pubchem_task = asyncio.create_task(self._timed(
+            layer_cache.get_or_load("pubchem", molecule, lambda: self._layer1_pubchem(molecule))
+        ))
+        fda_task = asyncio.create_task(self._timed(
+            layer_cache.get_or_load("fda", molecule, lambda: self._layer5_fda_data(molecule))
+        ))
+        clinical_task = asyncio.create_task(self._timed(
+            layer_cache.get_or_load("clinical_trials", molecule, lambda: self._layer6_clinical_trials(molecule))
+        ))
+        
+        # Depends on PubChem
+        inpi_task = asyncio.create_task(self._layer4_after_pubchem(molecule, pubchem_task))
+        
+        try:
+            # Layers 2+3 streamed: discovery feeds detail fetching
+            wo_numbers, wo_numbers_limited, patents_by_wo, failures, layer2_duration, layer3_duration = \
+                await self._layer2_3_stream(molecule, pubchem_task, limit)
+            
+            (pubchem_data, layer1_duration), (inpi_patents, layer4_duration), \
+                (fda_data, layer5_duration), (clinical_data, layer6_duration) = await asyncio.gather(
+                    pubchem_task, inpi_task, fda_task, clinical_task
+                )
+        finally:
+            # Cancelled or failed run (e.g. batch cancelled): stop every layer still in flight
+            for task in (pubchem_task, inpi_task, fda_task, clinical_task):
+                if not task.done():
+                    task.cancel()
+        
+        if isinstance(pubchem_data, Exception):
+            pubchem_data = {"error": str(pubchem_data), "synonyms": [], "dev_codes": []}
+        if isinstance(inpi_patents, Exception):
+            inpi_patents = {"br_patents": [], "errors": [str(inpi_patents)]}
+        if isinstance(fda_data, Exception):
+            fda_data = {"approval_status": "Error", "errors": [str(fda_data)]}
+        if isinstance(clinical_data, Exception):
+            clinical_data = {"total_trials": 0, "errors": [str(clinical_data)]}
+        
+        completed_at = time.time()
+        run = {
+            "limit": limit,
+            "pubchem_data": pubchem_data,
+            "wo_numbers": wo_numbers,
+            "wo_numbers_limited": wo_numbers_limited,
+            "patents_by_wo": patents_by_wo,
+            "inpi_patents": inpi_patents,
+            "fda_data": fda_data,
+            "clinical_data": clinical_data,
+            "failures": failures,
+            "durations": {
+                "pubchem": layer1_duration,
+                "wo_discovery": layer2_duration,
+                "patent_details": layer3_duration,
+                "inpi": layer4_duration,
+                "fda": layer5_duration,
+                "clinical_trials": layer6_duration,
+                "total": completed_at - start_time
+            },
+            "completed_at": completed_at
+        }
+        
+        # Runs with a failed layer, query or retryable WO fetch are not reused
+        layers = (pubchem_data, inpi_patents, fda_data, clinical_data)
+        if not any("error" in layer or "errors" in layer for layer in layers) and pipeline_cache.complete(run):
+            pipeline_cache.store(molecule, run)
+        
+        return run
+    
+    def _build_response(
+        self,
+        molecule: str,
+        run: Dict[str, Any],
+        country_filter: Optional[str],
+        limit: int,
+        start_time: float
+    ) -> Dict[str, Any]:
+        """Build the API response for a country filter and limit from a (copied) pipeline run"""
+        
+        pubchem_data = run["pubchem_data"]
+        wo_numbers = run["wo_numbers"]
+        wo_numbers_limited = run["wo_numbers_limited"][:limit]
+        inpi_patents = run["inpi_patents"]
+        fda_data = run["fda_data"]
+        clinical_data = run["clinical_data"]
+        durations = run["durations"]
+        
+        patents = [
+            wipo_service.filter_countries(run["patents_by_wo"][wo], country_filter)
+            for wo in wo_numbers_limited if wo in run["patents_by_wo"]
+        ]
+        patents.sort(key=lambda p: p["publication_number"])
+        patent_details = {"patents": patents, "total": len(patents)}
+        
         debug_layers = []
         
-        # Layer 1: PubChem - Get synonyms and chemical data
-        layer1_start = time.time()
-        pubchem_data = await self._layer1_pubchem(molecule)
-        layer1_duration = time.time() - layer1_start
+        # Debug for Layer 1
         debug_layers.append({
             "layer": "Layer 1: PubChem",
             "status": "success" if pubchem_data.get("cid") else "partial",
-            "duration_seconds": round(layer1_duration, 2),
+            "duration_seconds": round(durations["pubchem"], 2),
             "data_points": len(pubchem_data.get("synonyms", [])),
             "details": f"Found {len(pubchem_data.get('dev_codes', []))} dev codes, {len(pubchem_data.get('synonyms', []))} synonyms"
         })
         
-        # Layer 2: Google Patents WO Discovery (parallel queries)
-        layer2_start = time.time()
-        wo_numbers = await self._layer2_discover_wos(molecule, pubchem_data)
-        layer2_duration = time.time() - layer2_start
+        # Debug for Layer 2
         debug_layers.append({
             "layer": "Layer 2: WO Discovery",
-            "status": "success" if wo_numbers else "no_results",
-            "duration_seconds": round(layer2_duration, 2),
+            "status": "partial" if run["failures"]["queries"] else "success" if wo_numbers else "no_results",
+            "duration_seconds": round(durations["wo_discovery"], 2),
             "data_points": len(wo_numbers),
             "details": f"Found {len(wo_numbers)} WO patents from 13+ parallel queries"
         })
         
-        # Limit WO numbers if requested
-        wo_numbers_limited = wo_numbers[:limit]
-        
-        # Layers 3-6: Parallel execution
-        layer3_start = time.time()
-        
-        # Execute all layers in parallel
-        results = await asyncio.gather(
-            self._layer3_patent_details(wo_numbers_limited, country_filter),
-            self._layer4_inpi_brasil(molecule, pubchem_data),
-            self._layer5_fda_data(molecule),
-            self._layer6_clinical_trials(molecule),
-            return_exceptions=True
-        )
-        
-        patent_details, inpi_patents, fda_data, clinical_data = results
-        layer3_duration = time.time() - layer3_start
-        
         # Debug for Layer 3
-        if isinstance(patent_details, Exception):
-            patent_details = {"patents": [], "errors": [str(patent_details)]}
         debug_layers.append({
             "layer": "Layer 3: Patent Details",
             "status": "success" if patent_details.get("patents") else "no_results",
-            "duration_seconds": round(layer3_duration, 2),
+            "duration_seconds": round(durations["patent_details"], 2),
             "data_points": len(patent_details.get("patents", [])),
             "details": f"Processed {len(wo_numbers_limited)} WO patents"
         })
         
         # Debug for Layer 4
-        if isinstance(inpi_patents, Exception):
-            inpi_patents = {"br_patents": [], "errors": [str(inpi_patents)]}
         debug_layers.append({
             "layer": "Layer 4: INPI Brasil",
             "status": "success" if inpi_patents.get("br_patents") else "no_results",
-            "duration_seconds": round(layer3_duration, 2),  # Same parallel window
+            "duration_seconds": round(durations["inpi"], 2),
             "data_points": len(inpi_patents.get("br_patents", [])),
             "details": f"Found {len(inpi_patents.get('br_patents', []))} BR patents"
         })
         
         # Debug for Layer 5
-        if isinstance(fda_data, Exception):
-            fda_data = {"approval_status": "Error", "errors": [str(fda_data)]}
         debug_layers.append({
             "layer": "Layer 5: FDA",
             "status": "success" if fda_data.get("approval_status") != "Error" else "error",
-            "duration_seconds": round(layer3_duration, 2),
+            "duration_seconds": round(durations["fda"], 2),
             "data_points": len(fda_data.get("applications", [])),
             "details": f"FDA Status: {fda_data.get('approval_status', 'Unknown')}"
         })
         
         # Debug for Layer 6
-        if isinstance(clinical_data, Exception):
-            clinical_data = {"total_trials": 0, "errors": [str(clinical_data)]}
         debug_layers.append({
             "layer": "Layer 6: Clinical Trials",
             "status": "success" if clinical_data.get("total_trials", 0) > 0 else "no_results",
-            "duration_seconds": round(layer3_duration, 2),
+            "duration_seconds": round(durations["clinical_trials"], 2),
             "data_points": clinical_data.get("total_trials", 0),
             "details": f"Found {clinical_data.get('total_trials', 0)} clinical trials"
         })
@@ -135,7 +247,7 @@ class PipelineService:
             "pubchem_data": pubchem_data,
             "search_strategy": {
                 "pipeline_version": "3.0",
-                "execution_mode": "parallel_batch",
+                "execution_mode": "streaming_dataflow",
                 "layers_executed": ["PubChem", "Google Patents", "WIPO", "INPI", "FDA", "ClinicalTrials"],
                 "total_wo_patents": len(wo_numbers),
                 "wo_patents_processed": len(wo_numbers_limited),
@@ -159,9 +271,13 @@ class PipelineService:
                 "total_duration_seconds": round(total_duration, 2),
                 "layers": debug_layers,
                 "timings": {
-                    "pubchem": round(layer1_duration, 2),
-                    "wo_discovery": round(layer2_duration, 2),
-                    "parallel_batch": round(layer3_duration, 2),
+                    "pubchem": round(durations["pubchem"], 2),
+                    "wo_discovery": round(durations["wo_discovery"], 2),
+                    "parallel_batch": round(durations["patent_details"], 2),
+                    "patent_details": round(durations["patent_details"], 2),
+                    "inpi": round(durations["inpi"], 2),
+                    "fda": round(durations["fda"], 2),
+                    "clinical_trials": round(durations["clinical_trials"], 2),
                     "total": round(total_duration, 2)
                 },
                 "errors_count": sum(1 for layer in debug_layers if layer["status"] == "error"),
@@ -177,68 +293,145 @@ class PipelineService:
     async def _layer1_pubchem(self, molecule: str) -> Dict[str, Any]:
         """Layer 1: Fetch PubChem data"""
         try:
-            async with aiohttp.ClientSession() as session:
-                # Get synonyms
-                url = f"{self.pubchem_api}/compound/name/{molecule}/synonyms/JSON"
-                async with session.get(url, timeout=30) as resp:
-                    if resp.status != 200:
-                        return {"error": "PubChem not found"}
-                    
-                    data = await resp.json()
-                    synonyms = data.get("InformationList", {}).get("Information", [{}])[0].get("Synonym", [])
-                    
-                    # Extract dev codes and CAS
-                    dev_codes = []
-                    cas_number = None
-                    
-                    dev_pattern = re.compile(r'^[A-Z]{2,5}-?\d{3,7}[A-Z]?$', re.I)
-                    cas_pattern = re.compile(r'^\d{2,7}-\d{2}-\d$')
-                    
-                    for syn in synonyms[:100]:  # Limit to first 100
-                        if dev_pattern.match(syn) and len(dev_codes) < 20:
-                            dev_codes.append(syn)
-                        if cas_pattern.match(syn) and not cas_number:
-                            cas_number = syn
-                    
-                    # Get chemical properties
-                    cid_url = f"{self.pubchem_api}/compound/name/{molecule}/property/MolecularFormula,MolecularWeight,IUPACName,CanonicalSMILES,InChI,InChIKey/JSON"
-                    properties = {}
-                    try:
-                        async with session.get(cid_url, timeout=30) as prop_resp:
-                            if prop_resp.status == 200:
-                                prop_data = await prop_resp.json()
-                                props = prop_data.get("PropertyTable", {}).get("Properties", [{}])[0]
-                                properties = {
-                                    "cid": props.get("CID"),
-                                    "molecular_formula": props.get("MolecularFormula"),
-                                    "molecular_weight": props.get("MolecularWeight"),
-                                    "iupac_name": props.get("IUPACName"),
-                                    "canonical_smiles": props.get("CanonicalSMILES"),
-                                    "inchi": props.get("InChI"),
-                                    "inchi_key": props.get("InChIKey")
-                                }
-                    except:
-                        pass
-                    
-                    return {
-                        "cid": properties.get("cid"),
-                        "synonyms": synonyms[:50],  # Top 50 synonyms
-                        "dev_codes": dev_codes,
-                        "cas_number": cas_number,
-                        **properties
+            # Get synonyms
+            url = f"{self.pubchem_api}/compound/name/{molecule}/synonyms/JSON"
+            status, data = await self._get_json(url, revalidate_source="pubchem")
+            if status != 200:
+                return {"error": "PubChem not found"}
+                
+            synonyms = data.get("InformationList", {}).get("Information", [{}])[0].get("Synonym", [])
+                
+            # Extract dev codes and CAS
+            dev_codes = []
+            cas_number = None
+                
+            dev_pattern = re.compile(r'^[A-Z]{2,5}-?\d{3,7}[A-Z]?$', re.I)
+            cas_pattern = re.compile(r'^\d{2,7}-\d{2}-\d$')
+                
+            for syn in synonyms[:100]:  # Limit to first 100
+                if dev_pattern.match(syn) and len(dev_codes) < 20:
+                    dev_codes.append(syn)
+                if cas_pattern.match(syn) and not cas_number:
+                    cas_number = syn
+                
+            # Get chemical properties
+            cid_url = f"{self.pubchem_api}/compound/name/{molecule}/property/MolecularFormula,MolecularWeight,IUPACName,CanonicalSMILES,InChI,InChIKey/JSON"
+            properties = {}
+            try:
+                prop_status, prop_data = await self._get_json(cid_url, revalidate_source="pubchem")
+                if prop_status == 200:
+                    props = prop_data.get("PropertyTable", {}).get("Properties", [{}])[0]
+                    properties = {
+                        "cid": props.get("CID"),
+                        "molecular_formula": props.get("MolecularFormula"),
+                        "molecular_weight": props.get("MolecularWeight"),
+                        "iupac_name": props.get("IUPACName"),
+                        "canonical_smiles": props.get("CanonicalSMILES"),
+                        "inchi": props.get("InChI"),
+                        "inchi_key": props.get("InChIKey")
                     }
+            except Exception:
+                pass
+                
+            return {
+                "cid": properties.get("cid"),
+                "synonyms": synonyms[:50],  # Top 50 synonyms
+                "dev_codes": dev_codes,
+                "cas_number": cas_number,
+                **properties
+            }
         except Exception as e:
             return {"error": str(e), "synonyms": [], "dev_codes": []}
     
-    async def _layer2_discover_wos(self, molecule: str, pubchem_data: Dict) -> List[str]:
-        """Layer 2: Discover WO patent numbers via parallel Google Patents queries"""
+    async def _get_json(
+        self,
+        url: str,
+        params: Optional[Dict] = None,
+        timeout: int = 30,
+        throttle_retries: int = 2,
+        revalidate_source: Optional[str] = None
+    ) -> Tuple[int, Any]:
+        """
+        GET through the shared per-host rate limiter
+        
+        429/503 responses slow the host down (AIMD) and are retried after
+        the host's Retry-After pause; a Retry-After longer than
+        RATE_LIMIT_MAX_RETRY_AFTER raises HostThrottled instead of waiting.
+        With revalidate_source set, the request is conditional on the stored
+        ETag/Last-Modified and a 304 returns the stored body.
+        
+        Returns:
+            (HTTP status, parsed JSON body or None when status != 200)
+        """
+        session = http_session.get()
+        host = rate_limiter.host_of(url)
+        
+        request_key = f"{url}?{urlencode(sorted((params or {}).items()))}"
+        headers = layer_cache.conditional_headers(request_key) if revalidate_source else {}
+        
+        for attempt in range(throttle_retries + 1):
+            async with rate_limiter.limit(url):
+                async with session.get(url, params=params, timeout=timeout, headers=headers) as resp:
+                    status = resp.status
+                    throttled = rate_limiter.record(url, status, resp.headers.get("Retry-After"))
+                    if not throttled:
+                        if status == 304 and revalidate_source:
+                            body = layer_cache.not_modified(request_key, revalidate_source)
+                            return (200, body) if body is not None else (status, None)
+                        if status != 200:
+                            return status, None
+                        body = await resp.json()
+                        if revalidate_source:
+                            layer_cache.store_validators(
+                                request_key, resp.headers.get("ETag"), resp.headers.get("Last-Modified"), body
+                            )
+                        return status, body
+            
+            logger.warning(f"⚠️ {host} throttled (HTTP {status}), attempt {attempt + 1}/{throttle_retries + 1}")
+        
+        return status, None
+    
+    async def _fetch_search(self, url: str, params: Dict) -> Dict:
+        """Helper to fetch search results (memoized across molecules and runs)"""
+        return await serpapi_cache.get_or_fetch(params, lambda: self._search_upstream(url, params))
+    
+    async def _search_upstream(self, url: str, params: Dict) -> Dict:
+        """Paid SerpAPI call"""
+        try:
+            status, data = await self._get_json(url, params=params)
+            if status == 200:
+                return data
+            logger.warning(f"⚠️ SerpAPI returned HTTP {status} for '{params.get('q')}'")
+            return {"error": f"HTTP {status}"}
+        except Exception as e:
+            logger.warning(f"⚠️ SerpAPI request failed for '{params.get('q')}': {e}")
+            return {"error": str(e)}
+    
+    async def _timed(self, coro) -> Tuple[Any, float]:
+        """Await a layer coroutine, returning (result_or_exception, duration)"""
+        start = time.time()
+        try:
+            result = await coro
+        except Exception as e:
+            result = e
+        return result, time.time() - start
+    
+    async def _layer4_after_pubchem(self, molecule: str, pubchem_task: asyncio.Task) -> Tuple[Any, float]:
+        """Layer 4 as soon as PubChem data is available"""
+        pubchem_data, _ = await pubchem_task
+        if isinstance(pubchem_data, Exception):
+            pubchem_data = {}
+        return await self._timed(self._layer4_inpi_brasil(molecule, pubchem_data))
+    
+    def _year_queries(self, molecule: str) -> List[str]:
+        """Year-based WO queries (don't depend on PubChem)"""
+        return [f"{molecule} patent WO{year}" for year in range(2011, 2025)]
+    
+    def _build_wo_queries(self, molecule: str, pubchem_data: Dict) -> List[str]:
+        """Build the Layer 2 search queries (year queries first, max 15)"""
         
         # Build multiple search queries
-        queries = []
-        
-        # Year-based queries
-        for year in range(2011, 2025):
-            queries.append(f"{molecule} patent WO{year}")
+        queries = self._year_queries(molecule)
         
         # Dev code queries
         for dev_code in pubchem_data.get("dev_codes", [])[:3]:
@@ -248,76 +441,164 @@ class PipelineService:
         queries.append(f"{molecule} Orion Corporation patent")
         queries.append(f"{molecule} Bayer patent")
         
-        # Execute all queries in parallel
-        async with aiohttp.ClientSession() as session:
-            tasks = []
-            for query in queries[:15]:  # Limit to 15 parallel queries
-                url = f"https://serpapi.com/search.json"
-                params = {
-                    "engine": "google",
-                    "q": query,
-                    "api_key": self.serp_api_key,
-                    "num": 10
-                }
-                tasks.append(self._fetch_search(session, url, params))
-            
-            results = await asyncio.gather(*tasks, return_exceptions=True)
+        return queries[:15]  # Limit to 15 parallel queries
+    
+    def _search_task(self, query: str) -> asyncio.Task:
+        url = f"https://serpapi.com/search.json"
+        params = {
+            "engine": "google",
+            "q": query,
+            "api_key": self.serp_api_key,
+            "num": 10
+        }
+        return asyncio.create_task(self._fetch_search(url, params))
+    
+    async def _layer2_stream_wos(
+        self,
+        molecule: str,
+        pubchem_task: asyncio.Task,
+        failed_queries: List[str]
+    ) -> AsyncIterator[str]:
+        """
+        Layer 2: Yield WO patent numbers as each Google Patents query completes
+        
+        Queries whose search failed (HTTP error, throttling, quota, exception)
+        are appended to failed_queries; a search with no results is not a
+        failure.
+        """
+        
+        # Year queries don't depend on PubChem and start immediately; the
+        # rest of the capped query list is launched once PubChem resolves
+        launched = self._year_queries(molecule)
+        queries = {self._search_task(query): query for query in launched}
+        pending = set(queries)
+        pending.add(pubchem_task)
         
-        # Extract WO numbers
         wo_pattern = re.compile(r'WO[\s-]?(\d{4})[\s/]?(\d{6})', re.I)
-        wo_numbers = set()
         
-        for result in results:
-            if isinstance(result, dict):
-                for item in result.get("organic_results", []):
-                    text = f"{item.get('title', '')} {item.get('snippet', '')} {item.get('link', '')}"
-                    matches = wo_pattern.findall(text)
-                    for year, num in matches:
-                        wo_numbers.add(f"WO{year}{num}")
-        
-        return sorted(list(wo_numbers))
-    
-    async def _fetch_search(self, session: aiohttp.ClientSession, url: str, params: Dict) -> Dict:
-        """Helper to fetch search results"""
         try:
-            async with session.get(url, params=params, timeout=30) as resp:
-                if resp.status == 200:
-                    return await resp.json()
-                return {}
-        except:
-            return {}
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                
+                for task in done:
+                    if task is pubchem_task:
+                        # Dev-code (or company) queries once synonyms are known
+                        pubchem_data, _ = task.result()
+                        if isinstance(pubchem_data, Exception):
+                            pubchem_data = {}
+                        for query in self._build_wo_queries(molecule, pubchem_data):
+                            if query not in launched:
+                                launched.append(query)
+                                search = self._search_task(query)
+                                queries[search] = query
+                                pending.add(search)
+                        continue
+                    
+                    try:
+                        result = task.result()
+                    except Exception:
+                        result = None
+                    
+                    # Only real failures count; "no results" is a successful empty search
+                    if not isinstance(result, dict) or (result.get("error") and not serpapi_cache.is_no_results(result)):
+                        failed_queries.append(queries[task])
+                        continue
+                    
+                    for item in result.get("organic_results", []):
+                        text = f"{item.get('title', '')} {item.get('snippet', '')} {item.get('link', '')}"
+                        for year, num in wo_pattern.findall(text):
+                            yield f"WO{year}{num}"
+        finally:
+            for task in pending:
+                if task is not pubchem_task:
+                    task.cancel()
     
-    async def _layer3_patent_details(self, wo_numbers: List[str], country_filter: Optional[str]) -> Dict:
-        """Layer 3: Fetch detailed patent information for all WO numbers"""
-        
-        async with aiohttp.ClientSession() as session:
-            tasks = []
-            for wo in wo_numbers:
-                # Call our existing WIPO endpoint
-                url = f"https://pharmyrus-total10-production-9785.up.railway.app/api/v1/wipo/{wo}"
-                if country_filter:
-                    url += f"?country={country_filter}"
-                tasks.append(self._fetch_patent_detail(session, url, wo))
-            
-            results = await asyncio.gather(*tasks, return_exceptions=True)
+    async def _layer2_3_stream(
+        self,
+        molecule: str,
+        pubchem_task: asyncio.Task,
+        limit: int
+    ) -> Tuple[List[str], List[str], Dict[str, Dict], Dict[str, Any], float, float]:
+        """
+        Layers 2+3 pipelined: each newly discovered WO (up to limit) is
+        dispatched to detail fetching immediately
+        
+        Returns:
+            (all WO numbers, fetched WO numbers in discovery order, unfiltered
+             details by WO number, failures ({"queries": failed search
+             queries, "wos": error class by WO that has no details}),
+             layer 2 duration, layer 3 duration)
+        """
+        layer2_start = time.time()
+        layer3_start = None
         
-        patents = []
-        for result in results:
-            if isinstance(result, dict) and result.get("publication_number"):
-                patents.append(result)
+        discovered = set()
+        wo_numbers_limited = []
+        detail_tasks = []
+        failed_queries = []
+        failed_wos = {}
         
-        return {"patents": patents, "total": len(patents)}
+        try:
+            async for wo in self._layer2_stream_wos(molecule, pubchem_task, failed_queries):
+                if wo in discovered:
+                    continue
+                discovered.add(wo)
+                
+                # Known-bad WOs (negative cache) don't take one of the detail slots
+                negative = wipo_service.negative_cache.get(wo)
+                if negative:
+                    failed_wos[wo] = negative.get("erro_classe", ErrorClass.TRANSIENT.value)
+                    continue
+                
+                if len(wo_numbers_limited) < limit:
+                    if layer3_start is None:
+                        layer3_start = time.time()
+                    wo_numbers_limited.append(wo)
+                    detail_tasks.append(asyncio.create_task(self._fetch_patent_detail(wo, None)))
+            
+            layer2_duration = time.time() - layer2_start
+            
+            results = await asyncio.gather(*detail_tasks, return_exceptions=True)
+        finally:
+            for task in detail_tasks:
+                if not task.done():
+                    task.cancel()
+        layer3_duration = time.time() - layer3_start if layer3_start else 0.0
+        
+        patents_by_wo = {}
+        for wo, result in zip(wo_numbers_limited, results):
+            if isinstance(result, dict) and result.get("publication_number"):
+                patents_by_wo[wo] = result
+            elif isinstance(result, dict) and result.get("erro_classe"):
+                failed_wos[wo] = result["erro_classe"]
+            else:
+                failed_wos[wo] = ErrorClass.TRANSIENT.value
+        
+        return (
+            sorted(discovered),
+            wo_numbers_limited,
+            patents_by_wo,
+            {"queries": failed_queries, "wos": failed_wos},
+            layer2_duration,
+            layer3_duration
+        )
     
-    async def _fetch_patent_detail(self, session: aiohttp.ClientSession, url: str, wo: str) -> Dict:
-        """Fetch single patent detail"""
+    async def _fetch_patent_detail(self, wo: str, country_filter: Optional[str]) -> Dict:
+        """Fetch single patent detail (a failure returns its erro/erro_classe)"""
         try:
-            async with session.get(url, timeout=60) as resp:
-                if resp.status == 200:
-                    data = await resp.json()
-                    return data
-                return {}
-        except:
-            return {}
+            data = await wipo_service.get_patent(wo)
+            if data.get("erro"):
+                return {
+                    "erro": data["erro"],
+                    "erro_classe": data.get("erro_classe") or ErrorClass.TRANSIENT.value
+                }
+            
+            data = wipo_service.filter_countries(data, country_filter)
+            data["publication_number"] = data.get("publicacao", wo)
+            data["jurisdiction"] = data.get("pais", "WO")
+            return data
+        except Exception as e:
+            return {"erro": str(e), "erro_classe": ErrorClass.TRANSIENT.value}
     
     async def _layer4_inpi_brasil(self, molecule: str, pubchem_data: Dict) -> Dict:
         """Layer 4: Search INPI Brasil"""
@@ -327,13 +608,12 @@ class PipelineService:
         if pubchem_data.get("cas_number"):
             search_terms.append(pubchem_data["cas_number"])
         
-        async with aiohttp.ClientSession() as session:
-            tasks = []
-            for term in search_terms[:10]:  # Max 10 searches
-                url = f"{self.inpi_api}?medicine={term}"
-                tasks.append(self._fetch_inpi(session, url))
+        tasks = []
+        for term in search_terms[:10]:  # Max 10 searches
+            url = f"{self.inpi_api}?medicine={term}"
+            tasks.append(self._fetch_inpi(url))
             
-            results = await asyncio.gather(*tasks, return_exceptions=True)
+        results = await asyncio.gather(*tasks, return_exceptions=True)
         
         # Deduplicate BR patents
         br_patents = {}
@@ -353,50 +633,49 @@ class PipelineService:
         
         return {"br_patents": list(br_patents.values()), "total": len(br_patents)}
     
-    async def _fetch_inpi(self, session: aiohttp.ClientSession, url: str) -> Dict:
+    async def _fetch_inpi(self, url: str) -> Dict:
         """Fetch INPI data"""
         try:
-            async with session.get(url, timeout=40) as resp:
-                if resp.status == 200:
-                    return await resp.json()
-                return {}
-        except:
+            status, data = await self._get_json(url, timeout=40)
+            return data if status == 200 else {}
+        except Exception:
             return {}
     
     async def _layer5_fda_data(self, molecule: str) -> Dict:
         """Layer 5: Fetch FDA approval data"""
         
         try:
-            async with aiohttp.ClientSession() as session:
-                # Search NDC
-                url = f"{self.fda_api}/ndc.json"
-                params = {"search": f'generic_name:"{molecule}"', "limit": 5}
+            # Search NDC
+            url = f"{self.fda_api}/ndc.json"
+            params = {"search": f'generic_name:"{molecule}"', "limit": 5}
                 
-                async with session.get(url, params=params, timeout=30) as resp:
-                    if resp.status != 200:
-                        return {"approval_status": "Not Found", "applications": []}
-                    
-                    data = await resp.json()
-                    results = data.get("results", [])
-                    
-                    applications = []
-                    for r in results:
-                        applications.append({
-                            "product_ndc": r.get("product_ndc"),
-                            "brand_name": r.get("brand_name"),
-                            "generic_name": r.get("generic_name"),
-                            "labeler_name": r.get("labeler_name"),
-                            "dosage_form": r.get("dosage_form"),
-                            "route": r.get("route", []),
-                            "marketing_category": r.get("marketing_category"),
-                            "application_number": r.get("application_number")
-                        })
-                    
-                    return {
-                        "approval_status": "Approved" if applications else "Not Found",
-                        "applications": applications,
-                        "total_products": len(applications)
-                    }
+            status, data = await self._get_json(url, params=params, revalidate_source="fda")
+            # openFDA answers 404 when nothing matches; anything else is a failed lookup
+            if status == 404:
+                return {"approval_status": "Not Found", "applications": []}
+            if status != 200:
+                return {"approval_status": "Error", "error": f"HTTP {status}", "applications": []}
+                
+            results = data.get("results", [])
+                
+            applications = []
+            for r in results:
+                applications.append({
+                    "product_ndc": r.get("product_ndc"),
+                    "brand_name": r.get("brand_name"),
+                    "generic_name": r.get("generic_name"),
+                    "labeler_name": r.get("labeler_name"),
+                    "dosage_form": r.get("dosage_form"),
+                    "route": r.get("route", []),
+                    "marketing_category": r.get("marketing_category"),
+                    "application_number": r.get("application_number")
+                })
+                
+            return {
+                "approval_status": "Approved" if applications else "Not Found",
+                "applications": applications,
+                "total_products": len(applications)
+            }
         except Exception as e:
             return {"approval_status": "Error", "error": str(e), "applications": []}
     
@@ -404,69 +683,69 @@ class PipelineService:
         """Layer 6: Fetch clinical trials data"""
         
         try:
-            async with aiohttp.ClientSession() as session:
-                url = f"{self.clinical_trials_api}"
-                params = {
-                    "query.term": molecule,
-                    "pageSize": 20
-                }
+            url = f"{self.clinical_trials_api}"
+            params = {
+                "query.term": molecule,
+                "pageSize": 20
+            }
+                
+            status, data = await self._get_json(url, params=params, revalidate_source="clinical_trials")
+            if status == 404:
+                return {"total_trials": 0, "trials": []}
+            if status != 200:
+                return {"total_trials": 0, "trials": [], "error": f"HTTP {status}"}
+                
+            studies = data.get("studies", [])
+                
+            # Aggregate data
+            by_phase = {}
+            by_status = {}
+            sponsors = set()
+            countries = set()
                 
-                async with session.get(url, params=params, timeout=30) as resp:
-                    if resp.status != 200:
-                        return {"total_trials": 0, "trials": []}
+            trials = []
+            for study in studies:
+                protocol = study.get("protocolSection", {})
+                identification = protocol.get("identificationModule", {})
+                status_module = protocol.get("statusModule", {})
+                design_module = protocol.get("designModule", {})
                     
-                    data = await resp.json()
-                    studies = data.get("studies", [])
+                phase = design_module.get("phases", ["Unknown"])[0] if design_module.get("phases") else "Unknown"
+                status = status_module.get("overallStatus", "Unknown")
                     
-                    # Aggregate data
-                    by_phase = {}
-                    by_status = {}
-                    sponsors = set()
-                    countries = set()
+                by_phase[phase] = by_phase.get(phase, 0) + 1
+                by_status[status] = by_status.get(status, 0) + 1
                     
-                    trials = []
-                    for study in studies:
-                        protocol = study.get("protocolSection", {})
-                        identification = protocol.get("identificationModule", {})
-                        status_module = protocol.get("statusModule", {})
-                        design_module = protocol.get("designModule", {})
-                        
-                        phase = design_module.get("phases", ["Unknown"])[0] if design_module.get("phases") else "Unknown"
-                        status = status_module.get("overallStatus", "Unknown")
-                        
-                        by_phase[phase] = by_phase.get(phase, 0) + 1
-                        by_status[status] = by_status.get(status, 0) + 1
-                        
-                        # Sponsors
-                        sponsor_module = protocol.get("sponsorCollaboratorsModule", {})
-                        lead_sponsor = sponsor_module.get("leadSponsor", {}).get("name")
-                        if lead_sponsor:
-                            sponsors.add(lead_sponsor)
-                        
-                        # Countries
-                        locations = protocol.get("contactsLocationsModule", {}).get("locations", [])
-                        for loc in locations:
-                            if loc.get("country"):
-                                countries.add(loc["country"])
-                        
-                        trials.append({
-                            "nct_id": identification.get("nctId"),
-                            "title": identification.get("briefTitle"),
-                            "phase": phase,
-                            "status": status,
-                            "enrollment": status_module.get("enrollmentInfo", {}).get("count"),
-                            "start_date": status_module.get("startDateStruct", {}).get("date"),
-                            "primary_sponsor": lead_sponsor
-                        })
+                # Sponsors
+                sponsor_module = protocol.get("sponsorCollaboratorsModule", {})
+                lead_sponsor = sponsor_module.get("leadSponsor", {}).get("name")
+                if lead_sponsor:
+                    sponsors.add(lead_sponsor)
                     
-                    return {
-                        "total_trials": len(studies),
-                        "by_phase": by_phase,
-                        "by_status": by_status,
-                        "sponsors": list(sponsors)[:20],
-                        "countries": list(countries)[:50],
-                        "trial_details": trials
-                    }
+                # Countries
+                locations = protocol.get("contactsLocationsModule", {}).get("locations", [])
+                for loc in locations:
+                    if loc.get("country"):
+                        countries.add(loc["country"])
+                    
+                trials.append({
+                    "nct_id": identification.get("nctId"),
+                    "title": identification.get("briefTitle"),
+                    "phase": phase,
+                    "status": status,
+                    "enrollment": status_module.get("enrollmentInfo", {}).get("count"),
+                    "start_date": status_module.get("startDateStruct", {}).get("date"),
+                    "primary_sponsor": lead_sponsor
+                })
+                
+            return {
+                "total_trials": len(studies),
+                "by_phase": by_phase,
+                "by_status": by_status,
+                "sponsors": list(sponsors)[:20],
+                "countries": list(countries)[:50],
+                "trial_details": trials
+            }
         except Exception as e:
             return {"total_trials": 0, "error": str(e), "trials": []}
     
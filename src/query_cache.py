@@ -0,0 +1,114 @@
+"""
+SerpAPI Query Cache
+Persistent memo of search API responses keyed by (engine, normalized query,
+params), shared by every pipeline run, batch item and the legacy endpoint
+"""
+import hashlib
+import json
+import os
+import re
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from .single_flight import SingleFlight
+from .tiered_cache import TieredCache, create_cache
+
+# Params that never change the result set
+IGNORED_PARAMS = {"api_key", "output", "no_cache", "async"}
+
+# SerpAPI answers HTTP 200 with this error when the search engine found nothing
+NO_RESULTS_MARKER = "hasn't returned any results"
+
+
+class QueryCache:
+    """Memoizes search responses; concurrent identical queries share one upstream call"""
+
+    def __init__(
+        self,
+        namespace: str = "serpapi",
+        ttl: int = 604800,
+        cache: Optional[TieredCache] = None,
+        empty_ttl: Optional[int] = None
+    ):
+        self.ttl = ttl
+        self.empty_ttl = empty_ttl if empty_ttl is not None else ttl
+        self.cache = cache or create_cache(namespace, ttl=ttl)
+        self.flight = SingleFlight()
+        self.upstream_calls = 0
+        self.stores = 0
+        self.empty_stores = 0
+    
+    @staticmethod
+    def is_no_results(data: Any) -> bool:
+        """SerpAPI's "no results for this query" answer (a successful, empty search)"""
+        return isinstance(data, dict) and NO_RESULTS_MARKER in str(data.get("error") or "")
+
+    @staticmethod
+    def normalize_query(query: str) -> str:
+        return re.sub(r"\s+", " ", query or "").strip().lower()
+
+    @classmethod
+    def key(cls, params: Dict[str, Any]) -> str:
+        """Stable key: engine + normalized q + remaining params (api_key excluded)"""
+        engine = params.get("engine", "google")
+        query = cls.normalize_query(params.get("q", ""))
+        rest = {
+            k: str(v) for k, v in params.items()
+            if k not in IGNORED_PARAMS and k not in ("engine", "q")
+        }
+        digest = hashlib.sha1(json.dumps(rest, sort_keys=True).encode()).hexdigest()[:12]
+        return f"{engine}:{query}:{digest}"
+
+    async def get_or_fetch(
+        self,
+        params: Dict[str, Any],
+        fetch: Callable[[], Awaitable[Optional[Dict]]]
+    ) -> Optional[Dict]:
+        """
+        Return the memoized response or call `fetch()` once for the key
+
+        Successful responses (a dict without an "error" field) are stored. A
+        no-results answer is stored (for empty_ttl) and returned as an empty
+        result set; transport, quota and other errors are not stored.
+        """
+        key = self.key(params)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+
+        async def load():
+            self.upstream_calls += 1
+            data = await fetch()
+            if self.is_no_results(data):
+                data = {"organic_results": [], "no_results": True}
+                self.cache.set(key, data, ttl=self.empty_ttl)
+                self.empty_stores += 1
+            elif isinstance(data, dict) and data and not data.get("error"):
+                self.cache.set(key, data)
+                self.stores += 1
+            return data
+
+        return await self.flight.do(key, load)
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = self.cache.get_stats()
+        return {
+            "size": stats["size"],
+            "ttl_seconds": self.ttl,
+            "hits": stats["hits"],
+            "misses": stats["misses"],
+            "hit_rate": stats["hit_rate"],
+            "upstream_calls": self.upstream_calls,
+            "coalesced": self.flight.coalesced,
+            "stores": self.stores,
+            "empty_stores": self.empty_stores,
+            "empty_ttl_seconds": self.empty_ttl,
+            "disk": stats["disk"]
+        }
+
+
+# Singleton instance
+serpapi_cache = QueryCache(
+    namespace="serpapi",
+    ttl=int(os.getenv("SERPAPI_CACHE_TTL", "604800")),
+    empty_ttl=int(os.getenv("SERPAPI_EMPTY_CACHE_TTL", "86400"))
+)
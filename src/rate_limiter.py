@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+"""
+Per-host Rate Limiter
+Token bucket adaptativo (AIMD) por host upstream; separa a cortesia com os
+servidores (ritmo de requisições) da lógica de espera das páginas
+"""
+
+import asyncio
+import os
+import random
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional, Tuple, Any, Union
+from urllib.parse import urlparse
+
+# Status que indicam que o upstream pediu para desacelerar
+THROTTLE_STATUSES = (429, 503)
+
+# Maior pausa que o bucket respeita; Retry-After acima disso falha as requisições
+MAX_RETRY_AFTER = float(os.getenv('RATE_LIMIT_MAX_RETRY_AFTER', '60'))
+
+
+class HostThrottled(Exception):
+    """O upstream pediu uma pausa maior que MAX_RETRY_AFTER (cota esgotada)"""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"Host throttled: Retry-After {retry_after:.0f}s exceeds {MAX_RETRY_AFTER:.0f}s")
+        self.retry_after = retry_after
+
+
+@dataclass
+class HostLimit:
+    """Configuração de um host: ritmo inicial, rajada, teto do AIMD, concorrência e jitter"""
+    rate: float
+    burst: int = 1
+    max_rate: Optional[float] = None
+    concurrency: Optional[int] = None
+    jitter: Optional[float] = None
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Retry-After em segundos (aceita delta em segundos ou data HTTP)"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """
+    Token bucket com ajuste AIMD: `rate` tokens/s com capacidade `burst`
+
+    Cada sucesso soma `increase` ao ritmo (até max_rate); cada 429/503
+    multiplica o ritmo por `decrease` (até min_rate) e pausa o host pelo
+    Retry-After informado (até MAX_RETRY_AFTER; acima disso as requisições
+    falham com HostThrottled até o fim da janela pedida).
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        burst: int = 1,
+        jitter: float = 0.0,
+        max_rate: Optional[float] = None,
+        min_rate: Optional[float] = None,
+        increase: Optional[float] = None,
+        decrease: float = 0.5,
+        concurrency: Optional[int] = None
+    ):
+        self.rate = rate
+        self.burst = burst
+        self.jitter = jitter
+        self.max_rate = max_rate or rate
+        self.min_rate = min_rate or rate / 10
+        self.increase = increase if increase is not None else self.max_rate / 50
+        self.decrease = decrease
+        self.concurrency = concurrency
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.quota_until = 0.0
+        self.total_acquired = 0
+        self.total_wait_seconds = 0.0
+        self.total_throttled = 0
+        self.total_rejected = 0
+        self.in_flight = 0
+        self._lock = asyncio.Lock()
+        self._slots = asyncio.Semaphore(concurrency) if concurrency else None
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self):
+        """
+        Aguarda até haver um token disponível
+
+        Raises:
+            HostThrottled: o host pediu uma pausa maior que MAX_RETRY_AFTER
+        """
+        start = time.monotonic()
+
+        while True:
+            # O lock mantém a ordem de chegada entre chamadores do mesmo host
+            async with self._lock:
+                now = time.monotonic()
+
+                if self.quota_until > now:
+                    self.total_rejected += 1
+                    raise HostThrottled(self.quota_until - now)
+
+                if self.blocked_until <= now:
+                    self._refill()
+
+                    if self.tokens < 1:
+                        await asyncio.sleep((1 - self.tokens) / self.rate)
+                        self._refill()
+
+                    if self.jitter:
+                        await asyncio.sleep(random.uniform(0, self.jitter))
+
+                    self.tokens -= 1
+                    self.total_acquired += 1
+                    self.total_wait_seconds += time.monotonic() - start
+                    return
+
+                pause = self.blocked_until - now
+
+            # Pausa pedida pelo upstream (Retry-After), fora do lock
+            await asyncio.sleep(pause)
+
+    @asynccontextmanager
+    async def slot(self):
+        """Token + vaga de concorrência durante a requisição"""
+        if self._slots:
+            await self._slots.acquire()
+        self.in_flight += 1
+        try:
+            await self.acquire()
+            yield self
+        finally:
+            self.in_flight -= 1
+            if self._slots:
+                self._slots.release()
+
+    def on_success(self):
+        """Aumento aditivo"""
+        self.rate = min(self.max_rate, self.rate + self.increase)
+
+    def on_throttle(self, retry_after: Optional[float] = None):
+        """Redução multiplicativa e pausa pelo Retry-After (ou 1/rate), limitada a MAX_RETRY_AFTER"""
+        self.total_throttled += 1
+        self.rate = max(self.min_rate, self.rate * self.decrease)
+        self.tokens = min(self.tokens, 0.0)
+        now = time.monotonic()
+        pause = retry_after if retry_after is not None else 1 / self.rate
+        if pause > MAX_RETRY_AFTER:
+            self.quota_until = max(self.quota_until, now + pause)
+        self.blocked_until = max(self.blocked_until, now + min(pause, MAX_RETRY_AFTER))
+
+    @property
+    def exhausted(self) -> bool:
+        """Se o host está numa janela de Retry-After maior que MAX_RETRY_AFTER"""
+        return self.quota_until > time.monotonic()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'rate_per_second': round(self.rate, 3),
+            'max_rate_per_second': self.max_rate,
+            'burst': self.burst,
+            'concurrency': self.concurrency,
+            'in_flight': self.in_flight,
+            'total_acquired': self.total_acquired,
+            'total_throttled': self.total_throttled,
+            'total_rejected': self.total_rejected,
+            'paused_seconds': round(max(0.0, self.blocked_until - time.monotonic()), 2),
+            'avg_wait_seconds': round(self.total_wait_seconds / max(1, self.total_acquired), 3)
+        }
+
+
+class HostRateLimiter:
+    """Registro de token buckets por host"""
+
+    def __init__(
+        self,
+        default_rate: float = 5.0,
+        default_burst: int = 5,
+        host_limits: Optional[Dict[str, Union[HostLimit, Tuple[float, int]]]] = None,
+        jitter: float = 0.0
+    ):
+        self.default_rate = default_rate
+        self.default_burst = default_burst
+        self.host_limits = {
+            host: limit if isinstance(limit, HostLimit) else HostLimit(*limit)
+            for host, limit in (host_limits or {}).items()
+        }
+        self.jitter = jitter
+        self._buckets: Dict[str, TokenBucket] = {}
+
+    @staticmethod
+    def host_of(url_or_host: str) -> str:
+        if '://' in url_or_host:
+            return urlparse(url_or_host).hostname or url_or_host
+        return url_or_host
+
+    def bucket(self, url_or_host: str) -> TokenBucket:
+        host = self.host_of(url_or_host)
+        if host not in self._buckets:
+            limit = self.host_limits.get(host, HostLimit(self.default_rate, self.default_burst))
+            self._buckets[host] = TokenBucket(
+                limit.rate,
+                limit.burst,
+                jitter=self.jitter if limit.jitter is None else limit.jitter,
+                max_rate=limit.max_rate,
+                concurrency=limit.concurrency
+            )
+        return self._buckets[host]
+
+    async def acquire(self, url_or_host: str):
+        """Aguarda a vez de fazer uma requisição para o host"""
+        await self.bucket(url_or_host).acquire()
+
+    def limit(self, url_or_host: str):
+        """Context manager: token + vaga de concorrência do host"""
+        return self.bucket(url_or_host).slot()
+
+    def record(self, url_or_host: str, status: Optional[int], retry_after: Optional[str] = None) -> bool:
+        """
+        Informa o status da resposta ao bucket do host
+
+        Returns:
+            True se o upstream pediu para desacelerar (429/503) e vale
+            tentar de novo após a pausa
+
+        Raises:
+            HostThrottled: o Retry-After pedido passa de MAX_RETRY_AFTER
+        """
+        bucket = self.bucket(url_or_host)
+        if status in THROTTLE_STATUSES:
+            bucket.on_throttle(parse_retry_after(retry_after))
+            if bucket.exhausted:
+                raise HostThrottled(bucket.quota_until - time.monotonic())
+            return True
+        if status is not None and status < 500:
+            bucket.on_success()
+        return False
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {host: bucket.get_stats() for host, bucket in self._buckets.items()}
+
+
+# Singleton instance (compartilhado por todos os crawlers, pipelines e lotes do processo)
+rate_limiter = HostRateLimiter(
+    host_limits={
+        'patentscope.wipo.int': HostLimit(
+            rate=float(os.getenv('WIPO_RATE_PER_SECOND', '0.5')),
+            burst=int(os.getenv('WIPO_RATE_BURST', '2')),
+            max_rate=float(os.getenv('WIPO_RATE_MAX_PER_SECOND', os.getenv('WIPO_RATE_PER_SECOND', '0.5')))
+        ),
+        'serpapi.com': HostLimit(
+            rate=float(os.getenv('SERPAPI_RATE_PER_SECOND', '5')),
+            burst=5,
+            max_rate=float(os.getenv('SERPAPI_RATE_MAX_PER_SECOND', '10')),
+            concurrency=int(os.getenv('SERPAPI_CONCURRENCY', '8')),
+            jitter=0.0
+        ),
+        # Política PubChem: no máximo 5 requisições/s
+        'pubchem.ncbi.nlm.nih.gov': HostLimit(rate=4, burst=5, max_rate=5, concurrency=5, jitter=0.0),
+        'crawler3-production.up.railway.app': HostLimit(rate=3, burst=3, max_rate=6, concurrency=4, jitter=0.0),
+        'api.fda.gov': HostLimit(rate=3, burst=4, max_rate=4, concurrency=4, jitter=0.0),
+        'clinicaltrials.gov': HostLimit(rate=1, burst=3, max_rate=2, concurrency=3, jitter=0.0)
+    },
+    jitter=float(os.getenv('RATE_LIMIT_JITTER', '0.5'))
+)
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Retry Policy
+Classificação de erros de busca (permanente / transitório / bloqueio),
+backoff com jitter e orçamento de retries por lote
+"""
+
+import random
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import Any, Dict, Optional
+
+from playwright.async_api import TimeoutError as PlaywrightTimeout
+
+
+class ErrorClass(str, Enum):
+    """Classes de falha de uma tentativa de busca"""
+    PERMANENT = "permanent"    # 404 / documento inexistente: não adianta repetir
+    TRANSIENT = "transient"    # timeout, 5xx, página incompleta: repetir com backoff
+    BLOCKED = "blocked"        # 403/429 / desafio anti-bot: rotacionar context e esperar mais
+
+
+# Indícios no conteúdo da página
+BLOCK_MARKERS = (
+    'captcha',
+    'cf-challenge',
+    'incapsula',
+    'access denied',
+    'request unsuccessful',
+    'please enable javascript',
+)
+NOT_FOUND_MARKERS = (
+    'no such document',
+    'document not found',
+    'no results found',
+    'no documents found',
+)
+
+
+class FetchError(Exception):
+    """Falha de tentativa já classificada"""
+
+    def __init__(self, message: str, error_class: ErrorClass, status: Optional[int] = None):
+        super().__init__(message)
+        self.error_class = error_class
+        self.status = status
+
+
+def classify_status(status: int) -> ErrorClass:
+    """Classifica um status HTTP diferente de 200"""
+    if status in (404, 410):
+        return ErrorClass.PERMANENT
+    if status in (401, 403, 429):
+        return ErrorClass.BLOCKED
+    return ErrorClass.TRANSIENT
+
+
+def classify_content(text: str) -> ErrorClass:
+    """Classifica uma página carregada mas sem dados"""
+    lowered = text.lower()
+    if any(marker in lowered for marker in BLOCK_MARKERS):
+        return ErrorClass.BLOCKED
+    if any(marker in lowered for marker in NOT_FOUND_MARKERS):
+        return ErrorClass.PERMANENT
+    return ErrorClass.TRANSIENT
+
+
+@dataclass
+class RetryBudget:
+    """Orçamento de retries compartilhado pelas buscas de um lote"""
+    limit: int
+    used: int = 0
+
+    def consume(self) -> bool:
+        """Reserva um retry; False quando o orçamento acabou"""
+        if self.used >= self.limit:
+            return False
+        self.used += 1
+        return True
+
+    def to_dict(self) -> Dict[str, int]:
+        return {'limit': self.limit, 'used': self.used, 'remaining': max(0, self.limit - self.used)}
+
+
+@dataclass
+class RetryStats:
+    """Contadores de tentativas por classe de erro"""
+    attempts: int = 0
+    successes: int = 0
+    retries: int = 0
+    failures: Dict[str, int] = field(default_factory=lambda: {c.value: 0 for c in ErrorClass})
+
+    def record_failure(self, error_class: ErrorClass):
+        self.failures[error_class.value] += 1
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'attempts': self.attempts,
+            'successes': self.successes,
+            'retries': self.retries,
+            'failures': dict(self.failures)
+        }
+
+
+@dataclass
+class RetryPolicy:
+    """
+    Política de retry por classe de erro
+
+    - PERMANENT: falha imediata
+    - TRANSIENT: backoff exponencial com full jitter
+    - BLOCKED: espera mais longa (o chamador rotaciona os contexts)
+    """
+    max_attempts: int = 5
+    base_delay: float = 1.0
+    max_delay: float = 30.0
+    blocked_delay: float = 10.0
+
+    def classify(self, error: BaseException) -> ErrorClass:
+        if isinstance(error, FetchError):
+            return error.error_class
+        if isinstance(error, PlaywrightTimeout):
+            return ErrorClass.TRANSIENT
+        return classify_content(str(error))
+
+    def should_retry(self, error_class: ErrorClass, attempt: int, budget: Optional[RetryBudget] = None) -> bool:
+        if error_class == ErrorClass.PERMANENT:
+            return False
+        if attempt >= self.max_attempts:
+            return False
+        if budget is not None and not budget.consume():
+            return False
+        return True
+
+    def delay(self, error_class: ErrorClass, attempt: int) -> float:
+        """Espera antes da próxima tentativa (attempt começa em 1)"""
+        ceiling = min(self.max_delay, self.base_delay * (2 ** (attempt - 1)))
+        if error_class == ErrorClass.BLOCKED:
+            return min(self.max_delay, self.blocked_delay + ceiling) + random.uniform(0, 1)
+        return random.uniform(ceiling / 2, ceiling)
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Single-flight
+Coalesce chamadas concorrentes para a mesma chave em uma única execução
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+
+class _Flight:
+    __slots__ = ('task', 'waiters', 'on_done')
+
+    def __init__(self, task: asyncio.Task, on_done: Optional[Callable[[], None]] = None):
+        self.task = task
+        self.waiters = 0
+        self.on_done = on_done
+
+
+class SingleFlight:
+    """
+    Garante no máximo uma execução em andamento por chave
+
+    Chamadores concorrentes com a mesma chave aguardam o mesmo resultado
+    (ou a mesma exceção). A execução só é cancelada quando todos os
+    chamadores que a aguardam forem cancelados.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[str, _Flight] = {}
+        self.executions = 0
+        self.coalesced = 0
+
+    async def do(
+        self,
+        key: str,
+        fn: Callable[[], Awaitable[Any]],
+        on_done: Optional[Callable[[], None]] = None
+    ) -> Any:
+        """
+        Executa fn() para a chave ou se junta à execução em andamento
+
+        on_done (só de quem inicia a execução) roda no mesmo passo em que a
+        chave é liberada, antes de qualquer chamador receber o resultado.
+        """
+        flight = self._inflight.get(key)
+
+        if flight is None:
+            flight = _Flight(asyncio.create_task(fn()), on_done)
+            self._inflight[key] = flight
+            flight.task.add_done_callback(lambda _, k=key, f=flight: self._forget(k, f))
+            self.executions += 1
+        else:
+            self.coalesced += 1
+
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        except asyncio.CancelledError:
+            if flight.waiters == 1 and not flight.task.done():
+                flight.task.cancel()
+            raise
+        finally:
+            flight.waiters -= 1
+
+    def _forget(self, key: str, flight: _Flight):
+        if self._inflight.get(key) is flight:
+            del self._inflight[key]
+        if flight.on_done is not None:
+            flight.on_done()
+
+        # Evita "exception was never retrieved" quando ninguém mais aguarda
+        if not flight.task.cancelled():
+            flight.task.exception()
+
+    def in_flight(self, key: str) -> bool:
+        return key in self._inflight
+
+    def get_stats(self) -> Dict[str, int]:
+        return {
+            'in_flight': len(self._inflight),
+            'executions': self.executions,
+            'coalesced': self.coalesced
+        }
@@ -0,0 +1,418 @@
+#!/usr/bin/env python3
+"""
+Tiered Cache
+LRU em memória (limitado por entradas e bytes) na frente de um store
+SQLite persistente, com expiração por TTL feita por um sweeper em background
+"""
+
+import asyncio
+import json
+import os
+import sqlite3
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class CacheBackend:
+    """Interface comum dos backends de cache"""
+
+    def get(self, key: str) -> Optional[Any]:
+        raise NotImplementedError
+
+    def set(self, key: str, value: Any, ttl: Optional[int] = None):
+        raise NotImplementedError
+
+    def delete(self, key: str) -> bool:
+        raise NotImplementedError
+
+    def clear(self) -> int:
+        raise NotImplementedError
+
+    def sweep(self) -> int:
+        """Remove entradas expiradas; retorna quantas foram removidas"""
+        raise NotImplementedError
+
+    def entries(self, limit: int = 100) -> List[Dict[str, Any]]:
+        """Metadados das entradas mais recentes (key, stored_at, expires_at)"""
+        raise NotImplementedError
+
+    def get_stats(self) -> Dict[str, Any]:
+        raise NotImplementedError
+
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class LRUMemoryCache(CacheBackend):
+    """Cache LRU em memória limitado por número de entradas e tamanho estimado"""
+
+    def __init__(self, ttl: int = 3600, max_entries: int = 1000, max_bytes: int = 64 * 1024 * 1024):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+
+        # key -> (value, stored_at, expires_at, size)
+        self._data: "OrderedDict[str, Tuple[Any, float, float, int]]" = OrderedDict()
+        self._bytes = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        if entry[2] <= time.time():
+            self._remove(key)
+            self.expirations += 1
+            self.misses += 1
+            return None
+
+        self._data.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def set(self, key: str, value: Any, ttl: Optional[int] = None, stored_at: Optional[float] = None,
+            expires_at: Optional[float] = None, size: Optional[int] = None):
+        now = time.time()
+        stored_at = stored_at or now
+        expires_at = expires_at or now + (ttl if ttl is not None else self.ttl)
+        size = size if size is not None else len(json.dumps(value, default=str))
+
+        if key in self._data:
+            self._remove(key)
+
+        # Entrada maior que o tier inteiro não entra
+        if size > self.max_bytes:
+            return
+
+        self._data[key] = (value, stored_at, expires_at, size)
+        self._bytes += size
+
+        while len(self._data) > self.max_entries or self._bytes > self.max_bytes:
+            oldest = next(iter(self._data))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def _remove(self, key: str):
+        entry = self._data.pop(key, None)
+        if entry:
+            self._bytes -= entry[3]
+
+    def delete(self, key: str) -> bool:
+        if key in self._data:
+            self._remove(key)
+            return True
+        return False
+
+    def clear(self) -> int:
+        count = len(self._data)
+        self._data.clear()
+        self._bytes = 0
+        return count
+
+    def sweep(self) -> int:
+        now = time.time()
+        expired = [k for k, e in self._data.items() if e[2] <= now]
+        for key in expired:
+            self._remove(key)
+        self.expirations += len(expired)
+        return len(expired)
+
+    def entries(self, limit: int = 100) -> List[Dict[str, Any]]:
+        items = list(self._data.items())[-limit:]
+        return [
+            {'key': k, 'value': e[0], 'stored_at': e[1], 'expires_at': e[2]}
+            for k, e in reversed(items)
+        ]
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'entries': len(self._data),
+            'bytes': self._bytes,
+            'max_entries': self.max_entries,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'expirations': self.expirations
+        }
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class SQLiteCache(CacheBackend):
+    """Store persistente em SQLite (WAL), particionado por namespace"""
+
+    def __init__(self, path: str, namespace: str, ttl: int = 3600):
+        self.path = path
+        self.namespace = namespace
+        self.ttl = ttl
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS cache (
+                namespace TEXT NOT NULL,
+                key TEXT NOT NULL,
+                value TEXT NOT NULL,
+                stored_at REAL NOT NULL,
+                expires_at REAL NOT NULL,
+                PRIMARY KEY (namespace, key)
+            )
+        """)
+        self._conn.execute('CREATE INDEX IF NOT EXISTS idx_cache_expires ON cache (expires_at)')
+
+        self.hits = 0
+        self.misses = 0
+        self.expirations = 0
+
+    def get_entry(self, key: str) -> Optional[Tuple[Any, float, float, int]]:
+        """Retorna (value, stored_at, expires_at, size) se presente e válido"""
+        row = self._conn.execute(
+            'SELECT value, stored_at, expires_at FROM cache WHERE namespace = ? AND key = ?',
+            (self.namespace, key)
+        ).fetchone()
+
+        if row is None:
+            self.misses += 1
+            return None
+
+        if row[2] <= time.time():
+            self.delete(key)
+            self.expirations += 1
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return json.loads(row[0]), row[1], row[2], len(row[0])
+
+    def get(self, key: str) -> Optional[Any]:
+        entry = self.get_entry(key)
+        return entry[0] if entry else None
+
+    def set(self, key: str, value: Any, ttl: Optional[int] = None, stored_at: Optional[float] = None,
+            expires_at: Optional[float] = None, encoded: Optional[str] = None):
+        now = time.time()
+        self._conn.execute(
+            'INSERT OR REPLACE INTO cache (namespace, key, value, stored_at, expires_at) VALUES (?, ?, ?, ?, ?)',
+            (
+                self.namespace,
+                key,
+                encoded if encoded is not None else json.dumps(value, default=str),
+                stored_at or now,
+                expires_at or now + (ttl if ttl is not None else self.ttl)
+            )
+        )
+
+    def delete(self, key: str) -> bool:
+        cursor = self._conn.execute(
+            'DELETE FROM cache WHERE namespace = ? AND key = ?', (self.namespace, key)
+        )
+        return cursor.rowcount > 0
+
+    def clear(self) -> int:
+        cursor = self._conn.execute('DELETE FROM cache WHERE namespace = ?', (self.namespace,))
+        return cursor.rowcount
+
+    def sweep(self) -> int:
+        cursor = self._conn.execute(
+            'DELETE FROM cache WHERE namespace = ? AND expires_at <= ?', (self.namespace, time.time())
+        )
+        self.expirations += cursor.rowcount
+        return cursor.rowcount
+
+    def entries(self, limit: int = 100) -> List[Dict[str, Any]]:
+        rows = self._conn.execute(
+            'SELECT key, value, stored_at, expires_at FROM cache '
+            'WHERE namespace = ? AND expires_at > ? ORDER BY stored_at DESC LIMIT ?',
+            (self.namespace, time.time(), limit)
+        ).fetchall()
+        return [
+            {'key': r[0], 'value': json.loads(r[1]), 'stored_at': r[2], 'expires_at': r[3]}
+            for r in rows
+        ]
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'entries': len(self),
+            'path': self.path,
+            'hits': self.hits,
+            'misses': self.misses,
+            'expirations': self.expirations
+        }
+
+    def __len__(self) -> int:
+        row = self._conn.execute(
+            'SELECT COUNT(*) FROM cache WHERE namespace = ? AND expires_at > ?',
+            (self.namespace, time.time())
+        ).fetchone()
+        return row[0]
+
+    def close(self):
+        self._conn.close()
+
+
+class TieredCache(CacheBackend):
+    """LRU em memória na frente de um store persistente"""
+
+    def __init__(self, memory: LRUMemoryCache, disk: Optional[SQLiteCache] = None, ttl: int = 3600):
+        self.memory = memory
+        self.disk = disk
+        self.ttl = ttl
+
+        self.hits = 0
+        self.misses = 0
+        self._sweeper: Optional[asyncio.Task] = None
+
+    def get(self, key: str) -> Optional[Any]:
+        value = self.memory.get(key)
+        if value is not None:
+            self.hits += 1
+            return value
+
+        if self.disk is not None:
+            entry = self.disk.get_entry(key)
+            if entry:
+                # Promove para o tier de memória mantendo o TTL original
+                value, stored_at, expires_at, size = entry
+                self.memory.set(key, value, stored_at=stored_at, expires_at=expires_at, size=size)
+                self.hits += 1
+                return value
+
+        self.misses += 1
+        return None
+
+    def set(self, key: str, value: Any, ttl: Optional[int] = None):
+        now = time.time()
+        expires_at = now + (ttl if ttl is not None else self.ttl)
+        encoded = json.dumps(value, default=str)
+
+        self.memory.set(key, value, stored_at=now, expires_at=expires_at, size=len(encoded))
+        if self.disk is not None:
+            self.disk.set(key, value, stored_at=now, expires_at=expires_at, encoded=encoded)
+
+    def delete(self, key: str) -> bool:
+        removed = self.memory.delete(key)
+        if self.disk is not None:
+            removed = self.disk.delete(key) or removed
+        return removed
+
+    def clear(self) -> int:
+        count = len(self)
+        self.memory.clear()
+        if self.disk is not None:
+            self.disk.clear()
+        return count
+
+    def sweep(self) -> int:
+        removed = self.memory.sweep()
+        if self.disk is not None:
+            # O disco contém todas as entradas da memória
+            removed = self.disk.sweep()
+        return removed
+
+    def entries(self, limit: int = 100) -> List[Dict[str, Any]]:
+        if self.disk is not None:
+            return self.disk.entries(limit)
+        return self.memory.entries(limit)
+
+    def warm(self) -> int:
+        """Carrega as entradas mais recentes do disco para a memória"""
+        if self.disk is None:
+            return 0
+
+        entries = self.disk.entries(limit=self.memory.max_entries)
+        for entry in reversed(entries):
+            self.memory.set(
+                entry['key'], entry['value'],
+                stored_at=entry['stored_at'], expires_at=entry['expires_at']
+            )
+        return len(entries)
+
+    async def _sweep_loop(self, interval: int):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                removed = self.sweep()
+                if removed:
+                    logger.info(f"🧹 Cache sweep: {removed} entradas expiradas removidas")
+            except Exception as e:
+                logger.error(f"❌ Erro no sweep do cache: {e}")
+
+    def start_sweeper(self, interval: int = 300):
+        """Inicia a expiração periódica em background"""
+        if self._sweeper is None:
+            self._sweeper = asyncio.create_task(self._sweep_loop(interval))
+
+    async def stop_sweeper(self):
+        if self._sweeper:
+            self._sweeper.cancel()
+            try:
+                await self._sweeper
+            except asyncio.CancelledError:
+                pass
+            self._sweeper = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            'size': len(self),
+            'ttl_seconds': self.ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / total * 100, 2) if total else 0.0,
+            'evictions': self.memory.evictions,
+            'expirations': self.memory.expirations + (self.disk.expirations if self.disk is not None else 0),
+            'memory': self.memory.get_stats(),
+            'disk': self.disk.get_stats() if self.disk is not None else None
+        }
+
+    def __len__(self) -> int:
+        return len(self.disk) if self.disk is not None else len(self.memory)
+
+    def close(self):
+        if self.disk is not None:
+            self.disk.close()
+
+
+def create_cache(namespace: str, ttl: int, max_entries: Optional[int] = None) -> TieredCache:
+    """
+    Cria um cache configurado por variáveis de ambiente
+
+    CACHE_BACKEND: 'tiered' (memória + SQLite, padrão) ou 'memory'
+    CACHE_DB_PATH: arquivo SQLite compartilhado entre namespaces
+    CACHE_MAX_ENTRIES / CACHE_MAX_MB: limites do tier de memória
+    """
+    memory = LRUMemoryCache(
+        ttl=ttl,
+        max_entries=max_entries or int(os.getenv('CACHE_MAX_ENTRIES', '1000')),
+        max_bytes=int(os.getenv('CACHE_MAX_MB', '64')) * 1024 * 1024
+    )
+
+    disk = None
+    if os.getenv('CACHE_BACKEND', 'tiered').lower() == 'tiered':
+        path = os.getenv('CACHE_DB_PATH', 'data/pharmyrus_cache.db')
+        try:
+            disk = SQLiteCache(path, namespace=namespace, ttl=ttl)
+        except Exception as e:
+            logger.error(f"❌ Cache persistente indisponível ({path}), usando apenas memória: {e}")
+
+    return TieredCache(memory, disk, ttl=ttl)
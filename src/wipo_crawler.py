@@ -7,10 +7,16 @@ Pharmyrus - Patent Intelligence Platform
 import asyncio
 import random
 import time
-from typing import Dict, List, Optional, Any
-from playwright.async_api import async_playwright, Browser, Page, TimeoutError as PlaywrightTimeout
+from typing import Dict, List, Optional, Any, Iterable
+from playwright.async_api import async_playwright, Browser, BrowserContext, Page, Route, TimeoutError as PlaywrightTimeout
 import logging
 
+from .rate_limiter import HostRateLimiter, HostThrottled, rate_limiter as default_rate_limiter
+from .retry_policy import (
+    ErrorClass, FetchError, RetryBudget, RetryPolicy, RetryStats,
+    classify_content, classify_status
+)
+
 logger = logging.getLogger(__name__)
 
 
@@ -23,12 +29,126 @@ class WIPOCrawler:
         'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/121.0.0.0 Safari/537.36',
     ]
     
-    def __init__(self, max_retries: int = 5, timeout: int = 60000, headless: bool = True):
+    # Recursos abortados no modo de filtragem (não afetam a extração)
+    BLOCKED_RESOURCE_TYPES = ('image', 'font', 'media')
+    BLOCKED_HOSTS = (
+        'google-analytics.com',
+        'googletagmanager.com',
+        'doubleclick.net',
+        'facebook.net',
+        'hotjar.com',
+        'matomo',
+        'piwik',
+    )
+    
+    # Campos principais em um único round trip CDP. Mantém os mesmos seletores
+    # e fallbacks da versão anterior; `td:has-text("X")+td` é emulado por cellsAfter.
+    EXTRACT_SCRIPT = """
+        () => {
+            const text = (el) => el ? (el.innerText || '').trim() : null;
+            const cellsAfter = (label) => {
+                const needle = label.toLowerCase();
+                const cells = [];
+                for (const td of document.querySelectorAll('td')) {
+                    if ((td.innerText || '').toLowerCase().includes(needle)) {
+                        const next = td.nextElementSibling;
+                        if (next && next.tagName === 'TD') cells.push(next);
+                    }
+                }
+                return cells;
+            };
+            const firstOf = (candidates) => {
+                for (const find of candidates) {
+                    const el = find();
+                    if (el) return text(el);
+                }
+                return null;
+            };
+
+            const record = {
+                titulo: text(document.querySelector('h3.tab_title, .patent-title, h1')),
+                resumo: text(document.querySelector('div.abstract, .patent-abstract, #abstract')),
+                titular: firstOf([
+                    () => document.querySelector('div.applicant'),
+                    () => cellsAfter('Applicant')[0],
+                ]),
+                deposito: firstOf([
+                    () => cellsAfter('Filing Date')[0],
+                    () => cellsAfter('Application Date')[0],
+                ]),
+                inventores: [...document.querySelectorAll('.inventor'), ...cellsAfter('Inventor')].map(text),
+                cpc_ipc: [
+                    ...document.querySelectorAll('.ipc, .cpc'),
+                    ...cellsAfter('IPC'),
+                    ...cellsAfter('CPC'),
+                ].map(text),
+                pdf_href: null,
+            };
+
+            for (const a of document.querySelectorAll('a')) {
+                const href = a.getAttribute('href') || '';
+                if (href.includes('.pdf') || (a.innerText || '').toLowerCase().includes('pdf')) {
+                    record.pdf_href = href || null;
+                    break;
+                }
+            }
+
+            return record;
+        }
+    """
+    
+    # Família em um segundo round trip: o clique na aba National Phase pode
+    # navegar ou falhar sem perder os campos já extraídos
+    NATIONAL_PHASE_SCRIPT = """
+        async (opts) => {
+            const countrySelector = 'table.nationalPhase td:first-child, .country-code';
+            const tab = [...document.querySelectorAll('a, button')]
+                .find((el) => (el.innerText || '').toLowerCase().includes('national phase'));
+            if (tab) {
+                tab.click();
+                const deadline = Date.now() + opts.nationalPhaseTimeout;
+                while (!document.querySelector(countrySelector) && Date.now() < deadline) {
+                    await new Promise((resolve) => setTimeout(resolve, 100));
+                }
+            }
+            return [...document.querySelectorAll(countrySelector)].map((el) => (el.innerText || '').trim());
+        }
+    """
+    
+    def __init__(
+        self,
+        max_retries: int = 5,
+        timeout: int = 60000,
+        headless: bool = True,
+        block_resources: bool = True,
+        blocked_resource_types: Optional[Iterable[str]] = None,
+        scroll_page: bool = False,
+        rate_limiter: Optional[HostRateLimiter] = None,
+        context_max_uses: int = 20,
+        max_idle_contexts: int = 2,
+        retry_policy: Optional[RetryPolicy] = None
+    ):
         self.max_retries = max_retries
+        self.retry_policy = retry_policy or RetryPolicy(max_attempts=max_retries)
+        self.retry_stats = RetryStats()
         self.timeout = timeout
         self.headless = headless
+        self.block_resources = block_resources
+        self.blocked_resource_types = set(blocked_resource_types or self.BLOCKED_RESOURCE_TYPES)
+        self.scroll_page = scroll_page
+        self.rate_limiter = rate_limiter or default_rate_limiter
+        self.context_max_uses = context_max_uses
+        self.max_idle_contexts = max_idle_contexts
         self.browser: Optional[Browser] = None
         self.playwright = None
+        self.uses = 0
+        self.blocked_requests = 0
+        
+        # Pool de contexts aquecidos (init script e rotas já aplicados)
+        self._idle_contexts: List[BrowserContext] = []
+        self._context_uses: Dict[BrowserContext, int] = {}
+        self.contexts_created = 0
+        self.contexts_rotated = 0
         
     async def __aenter__(self):
         await self.initialize()
@@ -56,14 +176,47 @@ class WIPOCrawler:
         logger.info("✅ Browser inicializado")
         
     async def close(self):
-        """Fecha o browser"""
+        """Fecha os contexts e o browser"""
+        for context in list(self._context_uses):
+            try:
+                await context.close()
+            except:
+                pass
+        self._idle_contexts = []
+        self._context_uses = {}
+        
         if self.browser:
             await self.browser.close()
         if self.playwright:
             await self.playwright.stop()
+        self.browser = None
+        self.playwright = None
             
-    async def _create_stealth_page(self) -> Page:
-        """Cria página com configurações stealth"""
+    @staticmethod
+    def normalize_wo(wo_number: str) -> str:
+        """Normaliza número WO (ex: 'wo 2018/162793' -> 'WO2018162793')"""
+        wo_clean = wo_number.strip().upper().replace('WO', '').replace(' ', '').replace('/', '')
+        return f"WO{wo_clean}"
+        
+    def is_healthy(self) -> bool:
+        """Verifica se o browser continua conectado"""
+        return self.browser is not None and self.browser.is_connected()
+        
+    def get_stats(self) -> Dict[str, Any]:
+        """Estatísticas do crawler"""
+        return {
+            'uses': self.uses,
+            'healthy': self.is_healthy(),
+            'open_contexts': len(self._context_uses),
+            'idle_contexts': len(self._idle_contexts),
+            'contexts_created': self.contexts_created,
+            'contexts_rotated': self.contexts_rotated,
+            'blocked_requests': self.blocked_requests,
+            'retries': self.retry_stats.to_dict()
+        }
+            
+    async def _new_context(self) -> BrowserContext:
+        """Cria context com configurações stealth"""
         context = await self.browser.new_context(
             user_agent=random.choice(self.USER_AGENTS),
             viewport={'width': 1920, 'height': 1080},
@@ -77,25 +230,72 @@ class WIPOCrawler:
             window.chrome = { runtime: {} };
         """)
         
+        if self.block_resources:
+            await context.route('**/*', self._filter_route)
+        
+        self._context_uses[context] = 0
+        self.contexts_created += 1
+        return context
+    
+    async def _create_stealth_page(self) -> Page:
+        """Cria página num context reaproveitado (ou novo, se não houver ocioso)"""
+        context = self._idle_contexts.pop() if self._idle_contexts else await self._new_context()
         return await context.new_page()
     
-    async def _wait_for_load(self, page: Page, selectors: List[str], timeout: int = 30000):
-        """Espera inteligente por elementos"""
-        start = time.time()
+    async def _release_page(self, page: Page, discard: bool = False):
+        """
+        Fecha a página e devolve o context ao pool
         
-        while time.time() - start < timeout / 1000:
-            for selector in selectors:
-                try:
-                    await page.wait_for_selector(selector, timeout=2000, state='visible')
-                    return True
-                except PlaywrightTimeout:
-                    continue
-            await asyncio.sleep(1)
+        O context é descartado (rotacionado) após falha, ao atingir
+        context_max_uses ou quando já há max_idle_contexts ociosos.
+        """
+        context = page.context
+        try:
+            await page.close()
+        except:
+            pass
+            
+        uses = self._context_uses.get(context, 0) + 1
+        if discard or uses >= self.context_max_uses or len(self._idle_contexts) >= self.max_idle_contexts:
+            self._context_uses.pop(context, None)
+            self.contexts_rotated += 1
+            try:
+                await context.close()
+            except:
+                pass
+        else:
+            self._context_uses[context] = uses
+            self._idle_contexts.append(context)
+    
+    async def _filter_route(self, route: Route):
+        """Aborta imagens, fontes, mídia e trackers"""
+        request = route.request
         
-        return False
+        if request.resource_type in self.blocked_resource_types or any(
+            host in request.url for host in self.BLOCKED_HOSTS
+        ):
+            self.blocked_requests += 1
+            await route.abort()
+        else:
+            await route.continue_()
+    
+    async def _wait_for_load(self, page: Page, selectors: List[str], timeout: int = 30000):
+        """Espera pelo primeiro elemento chave visível"""
+        try:
+            await page.wait_for_selector(', '.join(selectors), timeout=timeout, state='visible')
+            return True
+        except PlaywrightTimeout:
+            return False
+    
+    async def _wait_for_idle(self, page: Page, timeout: int = 5000):
+        """Espera a rede ficar ociosa (XHRs da página concluídos), sem falhar"""
+        try:
+            await page.wait_for_load_state('networkidle', timeout=timeout)
+        except PlaywrightTimeout:
+            pass
     
     async def _extract_data(self, page: Page, wo_number: str) -> Dict[str, Any]:
-        """Extrai dados da patente"""
+        """Extrai dados da patente (um único page.evaluate)"""
         data = {
             'fonte': 'WIPO',
             'pais': 'WO',
@@ -116,65 +316,38 @@ class WIPOCrawler:
         }
         
         try:
-            # Título
-            title_elem = await page.query_selector('h3.tab_title, .patent-title, h1')
-            if title_elem:
-                data['titulo'] = (await title_elem.inner_text()).strip()
-                
-            # Resumo
-            abstract_elem = await page.query_selector('div.abstract, .patent-abstract, #abstract')
-            if abstract_elem:
-                data['resumo'] = (await abstract_elem.inner_text()).strip()
-                
-            # Titular
-            for selector in ['div.applicant', 'td:has-text("Applicant")+td']:
-                try:
-                    elem = await page.query_selector(selector)
-                    if elem:
-                        data['titular'] = (await elem.inner_text()).strip()
-                        break
-                except:
-                    continue
-                    
+            raw = await page.evaluate(self.EXTRACT_SCRIPT)
+            
+            data['titulo'] = raw.get('titulo') or None
+            data['resumo'] = raw.get('resumo') or None
+            data['titular'] = raw.get('titular') or None
+            data['datas']['deposito'] = raw.get('deposito') or None
+            
             # Inventores
-            inventor_elems = await page.query_selector_all('.inventor, td:has-text("Inventor")+td')
-            for elem in inventor_elems:
-                inv = (await elem.inner_text()).strip()
+            for inv in raw.get('inventores', []):
                 if inv and inv not in data['inventores']:
                     data['inventores'].append(inv)
                     
-            # Datas
-            for selector in ['td:has-text("Filing Date")+td', 'td:has-text("Application Date")+td']:
-                try:
-                    elem = await page.query_selector(selector)
-                    if elem:
-                        data['datas']['deposito'] = (await elem.inner_text()).strip()
-                        break
-                except:
-                    continue
-                    
             # CPC/IPC
-            ipc_elems = await page.query_selector_all('.ipc, .cpc, td:has-text("IPC")+td, td:has-text("CPC")+td')
-            for elem in ipc_elems:
-                ipc_text = (await elem.inner_text()).strip()
+            for ipc_text in raw.get('cpc_ipc', []):
                 if ipc_text:
                     codes = [c.strip() for c in ipc_text.replace(';', ',').split(',')]
                     data['cpc_ipc'].extend(codes)
             data['cpc_ipc'] = list(set(data['cpc_ipc']))
             
-            # Família - clica na aba National Phase
-            try:
-                national_tab = await page.query_selector('a:has-text("National Phase"), button:has-text("National Phase")')
-                if national_tab:
-                    await national_tab.click()
-                    await asyncio.sleep(2)
-            except:
-                pass
-                
-            # Extrai países
-            country_elems = await page.query_selector_all('table.nationalPhase td:first-child, .country-code')
-            for elem in country_elems:
-                country = (await elem.inner_text()).strip()
+            # Link PDF
+            href = raw.get('pdf_href')
+            if href:
+                data['documentos']['pdf_link'] = href if href.startswith('http') else f"https://patentscope.wipo.int{href}"
+                    
+        except Exception as e:
+            logger.error(f"❌ Erro na extração: {e}")
+        
+        try:
+            paises = await page.evaluate(self.NATIONAL_PHASE_SCRIPT, {'nationalPhaseTimeout': 5000})
+            
+            # Família
+            for country in paises:
                 if country and len(country) == 2 and country not in data['paises_familia']:
                     data['paises_familia'].append(country)
                     
@@ -183,116 +356,152 @@ class WIPOCrawler:
                 if country not in data['worldwide_applications']:
                     data['worldwide_applications'][country] = []
                     
-            # Link PDF
-            pdf_link = await page.query_selector('a[href*=".pdf"], a:has-text("PDF")')
-            if pdf_link:
-                href = await pdf_link.get_attribute('href')
-                if href:
-                    data['documentos']['pdf_link'] = href if href.startswith('http') else f"https://patentscope.wipo.int{href}"
-                    
         except Exception as e:
-            logger.error(f"❌ Erro na extração: {e}")
+            logger.warning(f"⚠️ Família (National Phase) indisponível: {e}")
             
         return data
     
-    async def fetch_patent(self, wo_number: str, retry_count: int = 0) -> Dict[str, Any]:
+    async def _rotate_idle_contexts(self):
+        """Descarta todos os contexts ociosos (fingerprint possivelmente bloqueado)"""
+        while self._idle_contexts:
+            context = self._idle_contexts.pop()
+            self._context_uses.pop(context, None)
+            self.contexts_rotated += 1
+            try:
+                await context.close()
+            except:
+                pass
+    
+    async def _attempt_fetch(self, url: str, wo_number: str) -> Dict[str, Any]:
         """
-        Busca dados de uma patente WO
+        Uma tentativa de busca
         
-        Args:
-            wo_number: Número WO (ex: WO2018162793)
-            retry_count: Contador de tentativas
-            
-        Returns:
-            Dicionário com dados da patente
+        Raises:
+            FetchError: falha já classificada (status HTTP ou página sem dados)
         """
-        start_time = time.time()
-        wo_clean = wo_number.replace('WO', '').replace(' ', '').replace('/', '')
-        url = f"https://patentscope.wipo.int/search/en/detail.jsf?docId=WO{wo_clean}"
-        
-        logger.info(f"🔍 Tentativa {retry_count + 1}/{self.max_retries} para {wo_number}")
+        # Ritmo de cortesia por host (compartilhado entre crawlers)
+        try:
+            await self.rate_limiter.acquire(url)
+        except HostThrottled as e:
+            raise FetchError(f"Status HTTP: 429 ({e})", ErrorClass.BLOCKED, 429)
         
-        page = None
+        page = await self._create_stealth_page()
+        failed = True
         
         try:
-            page = await self._create_stealth_page()
-            await asyncio.sleep(random.uniform(1, 3))
-            
             response = await page.goto(url, wait_until='domcontentloaded', timeout=self.timeout)
             
-            if not response or response.status != 200:
-                raise Exception(f"Status HTTP: {response.status if response else 'No response'}")
+            if not response:
+                raise FetchError("Status HTTP: No response", ErrorClass.TRANSIENT)
+            # 429/503 desaceleram o ritmo do host para todos os crawlers
+            try:
+                self.rate_limiter.record(url, response.status, response.headers.get('retry-after'))
+            except HostThrottled as e:
+                raise FetchError(f"Status HTTP: {response.status} ({e})", ErrorClass.BLOCKED, response.status)
+            if response.status != 200:
+                raise FetchError(f"Status HTTP: {response.status}", classify_status(response.status), response.status)
                 
             logger.info(f"✅ Página carregada (status {response.status})")
             
             # Espera elementos chave
             key_selectors = ['h3.tab_title', '.patent-title', 'div.abstract', 'h1']
             await self._wait_for_load(page, key_selectors, timeout=20000)
+            await self._wait_for_idle(page)
             
-            await asyncio.sleep(random.uniform(2, 4))
-            
-            # Scroll
-            await page.evaluate('window.scrollTo(0, document.body.scrollHeight)')
-            await asyncio.sleep(1)
-            await page.evaluate('window.scrollTo(0, 0)')
-            await asyncio.sleep(1)
+            # Scroll (só necessário para conteúdo lazy-loaded)
+            if self.scroll_page:
+                await page.evaluate('window.scrollTo(0, document.body.scrollHeight)')
+                await self._wait_for_idle(page, timeout=3000)
+                await page.evaluate('window.scrollTo(0, 0)')
             
             # Extrai dados
             data = await self._extract_data(page, wo_number)
-            data['duracao_segundos'] = round(time.time() - start_time, 2)
             
             if not data['titulo'] and not data['resumo'] and not data['titular']:
-                raise Exception("Nenhum dado essencial extraído")
-                
-            logger.info(f"✅ Sucesso! Duração: {data['duracao_segundos']}s")
+                # Página vazia: documento inexistente, desafio anti-bot ou carga incompleta
+                try:
+                    body = await page.inner_text('body', timeout=2000)
+                except Exception:
+                    body = ''
+                raise FetchError("Nenhum dado essencial extraído", classify_content(body[:20000]))
+            
+            failed = False
             return data
+        finally:
+            # Context de uma tentativa com falha não volta para o pool
+            await self._release_page(page, discard=failed)
+    
+    async def fetch_patent(self, wo_number: str, budget: Optional[RetryBudget] = None) -> Dict[str, Any]:
+        """
+        Busca dados de uma patente WO
+        
+        Args:
+            wo_number: Número WO (ex: WO2018162793)
+            budget: Orçamento de retries compartilhado pelo lote (opcional)
             
-        except Exception as e:
-            logger.error(f"❌ Erro: {e}")
+        Returns:
+            Dicionário com dados da patente
+        """
+        start_time = time.time()
+        wo_clean = wo_number.replace('WO', '').replace(' ', '').replace('/', '')
+        url = f"https://patentscope.wipo.int/search/en/detail.jsf?docId=WO{wo_clean}"
+        
+        attempt = 0
+        while True:
+            attempt += 1
+            self.retry_stats.attempts += 1
+            logger.info(f"🔍 Tentativa {attempt}/{self.retry_policy.max_attempts} para {wo_number}")
             
-            if retry_count < self.max_retries - 1:
-                wait_time = (2 ** retry_count) + random.uniform(0, 1)
+            try:
+                data = await self._attempt_fetch(url, wo_number)
+            except Exception as e:
+                error_class = self.retry_policy.classify(e)
+                self.retry_stats.record_failure(error_class)
+                logger.error(f"❌ Erro ({error_class.value}): {e}")
+                
+                if error_class == ErrorClass.BLOCKED:
+                    await self._rotate_idle_contexts()
+                
+                if not self.retry_policy.should_retry(error_class, attempt, budget):
+                    logger.error(f"❌ Falha após {attempt} tentativa(s) ({error_class.value})")
+                    return {
+                        'fonte': 'WIPO',
+                        'pais': 'WO',
+                        'publicacao': wo_number,
+                        'erro': str(e),
+                        'erro_classe': error_class.value,
+                        'status': 'FALHA',
+                        'tentativas': attempt,
+                        'duracao_segundos': round(time.time() - start_time, 2),
+                        'documentos': {'patentscope_link': url},
+                        'worldwide_applications': {}
+                    }
+                
+                self.retry_stats.retries += 1
+                wait_time = self.retry_policy.delay(error_class, attempt)
                 logger.info(f"⏳ Retry em {wait_time:.1f}s...")
                 await asyncio.sleep(wait_time)
-                
-                if page:
-                    try:
-                        await page.close()
-                    except:
-                        pass
-                        
-                return await self.fetch_patent(wo_number, retry_count + 1)
-            else:
-                logger.error(f"❌ Falha após {self.max_retries} tentativas")
-                return {
-                    'fonte': 'WIPO',
-                    'pais': 'WO',
-                    'publicacao': wo_number,
-                    'erro': str(e),
-                    'status': 'FALHA',
-                    'duracao_segundos': round(time.time() - start_time, 2),
-                    'documentos': {'patentscope_link': url},
-                    'worldwide_applications': {}
-                }
-        finally:
-            if page:
-                try:
-                    await page.close()
-                except:
-                    pass
+                continue
+            
+            self.retry_stats.successes += 1
+            data['tentativas'] = attempt
+            data['duracao_segundos'] = round(time.time() - start_time, 2)
+            logger.info(f"✅ Sucesso! Duração: {data['duracao_segundos']}s")
+            return data
     
-    async def fetch_multiple_patents(self, wo_numbers: List[str]) -> List[Dict[str, Any]]:
-        """Busca múltiplas patentes"""
+    async def fetch_multiple_patents(
+        self,
+        wo_numbers: List[str],
+        budget: Optional[RetryBudget] = None
+    ) -> List[Dict[str, Any]]:
+        """Busca múltiplas patentes (budget: orçamento de retries do lote)"""
         results = []
         
         for i, wo in enumerate(wo_numbers, 1):
             logger.info(f"\n📍 Patente {i}/{len(wo_numbers)}: {wo}")
             
-            result = await self.fetch_patent(wo)
+            # Ritmo entre patentes fica a cargo do rate limiter por host
+            result = await self.fetch_patent(wo, budget=budget)
             results.append(result)
-            
-            if i < len(wo_numbers):
-                delay = random.uniform(3, 6)
-                await asyncio.sleep(delay)
                 
         return results
@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+"""
+WIPO HTTP Fast Path
+Busca a página de detalhe do Patentscope via HTTP simples e extrai o mesmo
+registro de WIPOCrawler._extract_data a partir do HTML renderizado no servidor.
+Retorna None quando faltam campos obrigatórios ou a resposta parece um desafio
+anti-bot, para que o chamador escale para o Playwright. 404/410 retornam direto
+o registro de falha permanente (sem browser).
+"""
+
+import random
+import re
+import time
+from html.parser import HTMLParser
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Union
+import logging
+
+from .http_session import http_session
+from .rate_limiter import HostRateLimiter, rate_limiter as default_rate_limiter
+from .retry_policy import BLOCK_MARKERS, ErrorClass, classify_status
+from .wipo_crawler import WIPOCrawler
+
+logger = logging.getLogger(__name__)
+
+
+class _Node:
+    """Elemento mínimo da árvore HTML"""
+
+    __slots__ = ('tag', 'attrs', 'children', 'parent')
+
+    def __init__(self, tag: str, attrs: Dict[str, str], parent: Optional['_Node'] = None):
+        self.tag = tag
+        self.attrs = attrs
+        self.children: List[Union['_Node', str]] = []
+        self.parent = parent
+
+    @property
+    def classes(self) -> List[str]:
+        return (self.attrs.get('class') or '').split()
+
+    def elements(self) -> List['_Node']:
+        return [c for c in self.children if isinstance(c, _Node)]
+
+    def iter(self) -> Iterator['_Node']:
+        """Percorre os descendentes em ordem de documento"""
+        for child in self.children:
+            if isinstance(child, _Node):
+                yield child
+                yield from child.iter()
+
+    def text(self) -> str:
+        parts = []
+        stack: List[Union['_Node', str]] = [self]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, str):
+                parts.append(node)
+            elif node.tag not in ('script', 'style'):
+                stack.extend(reversed(node.children))
+        return re.sub(r'\s+', ' ', ' '.join(parts)).strip()
+
+    def next_element(self) -> Optional['_Node']:
+        if not self.parent:
+            return None
+        siblings = self.parent.elements()
+        index = siblings.index(self)
+        return siblings[index + 1] if index + 1 < len(siblings) else None
+
+
+class _DOMBuilder(HTMLParser):
+    """Constrói uma árvore _Node tolerante a HTML malformado"""
+
+    VOID_TAGS = {'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta', 'source', 'track', 'wbr'}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.root = _Node('document', {})
+        self._stack = [self.root]
+
+    def handle_starttag(self, tag, attrs):
+        node = _Node(tag, {k: v or '' for k, v in attrs}, self._stack[-1])
+        self._stack[-1].children.append(node)
+        if tag not in self.VOID_TAGS:
+            self._stack.append(node)
+
+    def handle_startendtag(self, tag, attrs):
+        node = _Node(tag, {k: v or '' for k, v in attrs}, self._stack[-1])
+        self._stack[-1].children.append(node)
+
+    def handle_endtag(self, tag):
+        for i in range(len(self._stack) - 1, 0, -1):
+            if self._stack[i].tag == tag:
+                del self._stack[i:]
+                break
+
+    def handle_data(self, data):
+        if data.strip():
+            self._stack[-1].children.append(data)
+
+
+def _match(tag: Optional[str] = None, cls: Optional[str] = None, id_: Optional[str] = None) -> Callable[[_Node], bool]:
+    def predicate(node: _Node) -> bool:
+        return (
+            (tag is None or node.tag == tag)
+            and (cls is None or cls in node.classes)
+            and (id_ is None or node.attrs.get('id') == id_)
+        )
+    return predicate
+
+
+class WIPOHttpFetcher:
+    """Fetcher HTTP + parser HTML para páginas de detalhe do Patentscope"""
+
+    BASE_URL = "https://patentscope.wipo.int/search/en/detail.jsf?docId={wo}"
+
+    # Indícios de desafio anti-bot / página de bloqueio
+    CHALLENGE_MARKERS = BLOCK_MARKERS
+
+    def __init__(
+        self,
+        required_fields: Iterable[str] = ('titulo', 'titular', 'paises_familia'),
+        timeout: int = 20,
+        rate_limiter: Optional[HostRateLimiter] = None
+    ):
+        self.required_fields = tuple(required_fields)
+        self.timeout = timeout
+        self.rate_limiter = rate_limiter or default_rate_limiter
+
+        self.attempts = 0
+        self.hits = 0
+        self.not_found = 0
+        self.escalations: Dict[str, int] = {}
+
+    def _escalate(self, wo_number: str, reason: str) -> None:
+        self.escalations[reason] = self.escalations.get(reason, 0) + 1
+        logger.info(f"↗️ Fast path HTTP insuficiente para {wo_number} ({reason}), usando browser")
+        return None
+
+    def _not_found(self, wo_number: str, url: str, status: int, start_time: float) -> Dict[str, Any]:
+        """Registro de falha permanente (mesmo formato do crawler) para o cache negativo"""
+        self.not_found += 1
+        logger.info(f"🚫 {wo_number} não existe no Patentscope (HTTP {status})")
+        return {
+            'fonte': 'WIPO',
+            'pais': 'WO',
+            'publicacao': wo_number,
+            'erro': f"HTTP {status}",
+            'erro_classe': ErrorClass.PERMANENT.value,
+            'status': 'FALHA',
+            'tentativas': 1,
+            'duracao_segundos': round(time.time() - start_time, 2),
+            'documentos': {'patentscope_link': url},
+            'worldwide_applications': {},
+            'metodo': 'http'
+        }
+
+    async def fetch_patent(self, wo_number: str) -> Optional[Dict[str, Any]]:
+        """
+        Tenta montar o registro via HTTP
+
+        Returns:
+            Registro no formato de WIPOCrawler._extract_data, registro de falha
+            permanente (404/410), ou None para escalar ao browser
+        """
+        start_time = time.time()
+        wo = WIPOCrawler.normalize_wo(wo_number)
+        url = self.BASE_URL.format(wo=wo)
+        self.attempts += 1
+
+        try:
+            await self.rate_limiter.acquire(url)
+
+            headers = {
+                'User-Agent': random.choice(WIPOCrawler.USER_AGENTS),
+                'Accept': 'text/html,application/xhtml+xml',
+                'Accept-Language': 'en-US,en;q=0.9'
+            }
+            async with http_session.get().get(url, headers=headers, timeout=self.timeout) as resp:
+                self.rate_limiter.record(url, resp.status, resp.headers.get('Retry-After'))
+                if resp.status != 200:
+                    if classify_status(resp.status) == ErrorClass.PERMANENT:
+                        return self._not_found(wo_number, url, resp.status, start_time)
+                    return self._escalate(wo_number, f"http_{resp.status}")
+                html = await resp.text()
+        except Exception as e:
+            return self._escalate(wo_number, type(e).__name__)
+
+        lowered = html[:20000].lower()
+        if any(marker in lowered for marker in self.CHALLENGE_MARKERS):
+            return self._escalate(wo_number, 'bot_challenge')
+
+        data = self.parse(html, wo_number)
+
+        missing = [f for f in self.required_fields if not data.get(f)]
+        if missing:
+            return self._escalate(wo_number, f"missing_{missing[0]}")
+
+        data['duracao_segundos'] = round(time.time() - start_time, 2)
+        data['metodo'] = 'http'
+        self.hits += 1
+        logger.info(f"⚡ Fast path HTTP: {wo_number} ({data['duracao_segundos']}s)")
+        return data
+
+    def parse(self, html: str, wo_number: str) -> Dict[str, Any]:
+        """Extrai o registro usando os mesmos seletores/fallbacks do crawler"""
+        builder = _DOMBuilder()
+        builder.feed(html)
+        root = builder.root
+
+        def first(*predicates: Callable[[_Node], bool]) -> Optional[_Node]:
+            for node in root.iter():
+                if any(p(node) for p in predicates):
+                    return node
+            return None
+
+        def all_of(*predicates: Callable[[_Node], bool]) -> List[_Node]:
+            return [node for node in root.iter() if any(p(node) for p in predicates)]
+
+        def cells_after(label: str) -> List[_Node]:
+            needle = label.lower()
+            cells = []
+            for td in all_of(_match('td')):
+                if needle in td.text().lower():
+                    nxt = td.next_element()
+                    if nxt is not None and nxt.tag == 'td':
+                        cells.append(nxt)
+            return cells
+
+        def text_of(node: Optional[_Node]) -> Optional[str]:
+            return node.text() or None if node is not None else None
+
+        data = {
+            'fonte': 'WIPO',
+            'pais': 'WO',
+            'publicacao': wo_number,
+            'pedido': None,
+            'titulo': None,
+            'titular': None,
+            'datas': {'deposito': None, 'publicacao': None, 'prioridade': None},
+            'inventores': [],
+            'cpc_ipc': [],
+            'resumo': None,
+            'paises_familia': [],
+            'documentos': {
+                'pdf_link': None,
+                'patentscope_link': f"https://patentscope.wipo.int/search/en/detail.jsf?docId={wo_number}"
+            },
+            'worldwide_applications': {}
+        }
+
+        data['titulo'] = text_of(first(_match('h3', 'tab_title'), _match(cls='patent-title'), _match('h1')))
+        data['resumo'] = text_of(first(_match('div', 'abstract'), _match(cls='patent-abstract'), _match(id_='abstract')))
+
+        applicant = first(_match('div', 'applicant'))
+        if applicant is None:
+            applicant = next(iter(cells_after('Applicant')), None)
+        data['titular'] = text_of(applicant)
+
+        for node in all_of(_match(cls='inventor')) + cells_after('Inventor'):
+            inv = node.text()
+            if inv and inv not in data['inventores']:
+                data['inventores'].append(inv)
+
+        for label in ('Filing Date', 'Application Date'):
+            cells = cells_after(label)
+            if cells:
+                data['datas']['deposito'] = text_of(cells[0])
+                break
+
+        ipc_nodes = all_of(_match(cls='ipc'), _match(cls='cpc')) + cells_after('IPC') + cells_after('CPC')
+        for node in ipc_nodes:
+            ipc_text = node.text()
+            if ipc_text:
+                data['cpc_ipc'].extend(c.strip() for c in ipc_text.replace(';', ',').split(','))
+        data['cpc_ipc'] = list(set(data['cpc_ipc']))
+
+        # Família (quando a tabela National Phase vem renderizada no HTML)
+        country_nodes = []
+        for table in all_of(_match('table', 'nationalPhase')):
+            for row in (n for n in table.iter() if n.tag == 'tr'):
+                cells = [c for c in row.elements() if c.tag == 'td']
+                if cells:
+                    country_nodes.append(cells[0])
+        country_nodes += all_of(_match(cls='country-code'))
+
+        for node in country_nodes:
+            country = node.text()
+            if country and len(country) == 2 and country not in data['paises_familia']:
+                data['paises_familia'].append(country)
+                data['worldwide_applications'][country] = []
+
+        for a in all_of(_match('a')):
+            href = a.attrs.get('href', '')
+            if '.pdf' in href or 'pdf' in a.text().lower():
+                if href:
+                    data['documentos']['pdf_link'] = href if href.startswith('http') else f"https://patentscope.wipo.int{href}"
+                break
+
+        return data
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Taxa de acerto do fast path"""
+        return {
+            'attempts': self.attempts,
+            'hits': self.hits,
+            'hit_ratio': round(self.hits / self.attempts * 100, 2) if self.attempts else 0.0,
+            'not_found': self.not_found,
+            'escalations': dict(self.escalations)
+        }
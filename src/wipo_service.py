@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+WIPO Service
+Acesso compartilhado ao Patentscope (pool de browsers + cache) usado
+pelos endpoints WIPO e pela Layer 3 do pipeline
+"""
+
+import asyncio
+from typing import Dict, Any, Optional
+import logging
+import os
+
+from .wipo_crawler import WIPOCrawler
+from .crawler_pool import WIPOCrawlerPool
+from .negative_cache import NegativeCache
+from .retry_policy import RetryBudget
+from .single_flight import SingleFlight
+from .tiered_cache import create_cache
+from .wipo_http import WIPOHttpFetcher
+
+logger = logging.getLogger(__name__)
+
+
+class WIPOService:
+    """Pool de browsers e cache de patentes compartilhados pelo processo"""
+
+    def __init__(
+        self,
+        pool_size: int = 2,
+        pool_max_size: Optional[int] = None,
+        max_uses_per_crawler: int = 50,
+        cache_ttl: int = 3600,
+        cache_sweep_interval: int = 300,
+        crawler_options: Optional[Dict[str, Any]] = None,
+        http_fetcher: Optional[WIPOHttpFetcher] = None,
+        negative_ttls: Optional[Dict[str, int]] = None
+    ):
+        self.pool_size = pool_size
+        self.pool_max_size = pool_max_size or pool_size
+        self.max_uses_per_crawler = max_uses_per_crawler
+        self.cache_ttl = cache_ttl
+        self.cache_sweep_interval = cache_sweep_interval
+        self.crawler_options = crawler_options or {}
+        self.http_fetcher = http_fetcher
+
+        self.pool: Optional[WIPOCrawlerPool] = None
+        self.cache = create_cache('wipo', ttl=cache_ttl)
+        
+        # Falhas conhecidas (inexistente / bloqueado / transitório) com TTL por classe
+        self.negative_cache = NegativeCache(ttls=negative_ttls)
+        
+        # Coalesce o caminho cache -> crawler -> cache por WO normalizado
+        self.flight = SingleFlight()
+        
+        # Coalesce buscas no crawler; compartilhado pelo pool global e pelos pools de lote
+        self.fetch_flight = SingleFlight()
+
+        # Limita crawlers avulsos quando o pool não está disponível
+        self._fallback_semaphore = asyncio.Semaphore(pool_size)
+
+    async def start(self):
+        """Aquece o cache e inicializa o pool global de browsers"""
+        warmed = self.cache.warm()
+        logger.info(f"💾 Cache aquecido com {warmed} entradas do disco")
+        self.cache.start_sweeper(self.cache_sweep_interval)
+        self.negative_cache.cache.warm()
+        self.negative_cache.cache.start_sweeper(self.cache_sweep_interval)
+
+        pool = WIPOCrawlerPool(
+            pool_size=self.pool_size,
+            max_size=self.pool_max_size,
+            max_uses_per_crawler=self.max_uses_per_crawler,
+            flight=self.fetch_flight,
+            crawler_options=self.crawler_options,
+            http_fetcher=self.http_fetcher,
+            negative_cache=self.negative_cache
+        )
+
+        try:
+            await pool.initialize()
+            self.pool = pool
+        except Exception as e:
+            logger.error(f"❌ Falha ao iniciar pool de browsers, usando crawlers avulsos: {e}")
+            await pool.close()
+
+    async def close(self):
+        """Fecha o pool global e o cache"""
+        if self.pool:
+            await self.pool.close()
+            self.pool = None
+
+        await self.cache.stop_sweeper()
+        self.cache.close()
+        await self.negative_cache.cache.stop_sweeper()
+        self.negative_cache.cache.close()
+
+    # Cache
+    @staticmethod
+    def cache_key(wo: str) -> str:
+        return f"wipo_{WIPOCrawler.normalize_wo(wo)[2:]}"
+
+    def get_cached(self, wo: str) -> Optional[Dict]:
+        result = self.cache.get(self.cache_key(wo))
+        if result:
+            logger.info(f"✅ Cache HIT: {wo}")
+        return result
+
+    def set_cached(self, wo: str, result: Dict):
+        self.cache.set(self.cache_key(wo), result)
+
+    # Busca
+    async def fetch_patent(self, wo: str, budget: Optional[RetryBudget] = None) -> Dict[str, Any]:
+        """Busca via pool global; cai para um crawler avulso se o pool não subiu"""
+        if self.pool:
+            return await self.pool.fetch_patent(wo, budget)
+
+        key = WIPOCrawler.normalize_wo(wo)
+        return dict(await self.fetch_flight.do(key, lambda: self._fallback_fetch(wo, budget)))
+
+    async def _fallback_fetch(self, wo: str, budget: Optional[RetryBudget] = None) -> Dict[str, Any]:
+        if self.http_fetcher:
+            data = await self.http_fetcher.fetch_patent(wo)
+            if data and data.get('erro_classe'):
+                self.negative_cache.record(wo, data)
+            if data:
+                return data
+
+        async with self._fallback_semaphore:
+            async with WIPOCrawler(**self.crawler_options) as crawler:
+                result = await crawler.fetch_patent(wo, budget=budget)
+
+        self.negative_cache.record(wo, result)
+        return result
+
+    async def get_patent(self, wo: str, use_cache: bool = True) -> Dict[str, Any]:
+        """
+        Busca uma patente consultando o cache antes do crawler
+
+        Args:
+            wo: Número WO normalizado (ex: WO2018162793)
+            use_cache: Consultar e alimentar o cache
+
+        Returns:
+            Dicionário com dados da patente (cópia, seguro para modificar)
+        """
+        if not use_cache:
+            return dict(await self.fetch_patent(wo))
+
+        cached = self.get_cached(wo)
+        if cached:
+            return cached.copy()
+
+        known_failure = self.negative_cache.get(wo)
+        if known_failure:
+            return known_failure
+
+        result = await self.flight.do(self.cache_key(wo), lambda: self._load(wo))
+        return result.copy()
+
+    async def _load(self, wo: str) -> Dict[str, Any]:
+        """Busca e alimenta o cache (executado uma vez por WO em andamento)"""
+        cached = self.get_cached(wo)
+        if cached:
+            return cached
+
+        result = await self.fetch_patent(wo)
+
+        if result.get('titulo'):
+            self.set_cached(wo, result)
+
+        return result
+
+    @staticmethod
+    def filter_countries(result: Dict[str, Any], country: Optional[str]) -> Dict[str, Any]:
+        """Filtra os países da família (ex: BR_US_JP)"""
+        if country and result.get('worldwide_applications'):
+            countries = [c.strip().upper() for c in country.split('_')]
+            result['worldwide_applications'] = {
+                k: v for k, v in result['worldwide_applications'].items()
+                if k.upper() in countries
+            }
+            result['paises_familia'] = [p for p in result.get('paises_familia', []) if p.upper() in countries]
+            result['filter_applied'] = country
+        return result
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Estatísticas do pool e do cache"""
+        return {
+            'pool_active': self.pool is not None,
+            'pool': self.pool.get_stats() if self.pool else None,
+            'cache': self.cache.get_stats(),
+            'negative_cache': self.negative_cache.get_stats(),
+            'single_flight': self.flight.get_stats(),
+            'fetch_single_flight': self.fetch_flight.get_stats(),
+            'http_fast_path': self.http_fetcher.get_stats() if self.http_fetcher else None
+        }
+
+
+# Singleton instance
+wipo_service = WIPOService(
+    pool_size=int(os.getenv('WIPO_POOL_SIZE', '2')),
+    pool_max_size=int(os.getenv('WIPO_POOL_MAX_SIZE', '6')),
+    max_uses_per_crawler=int(os.getenv('WIPO_CRAWLER_MAX_USES', '50')),
+    cache_ttl=int(os.getenv('CACHE_TTL', '3600')),
+    cache_sweep_interval=int(os.getenv('CACHE_SWEEP_INTERVAL', '300')),
+    crawler_options={
+        'block_resources': os.getenv('WIPO_BLOCK_RESOURCES', 'true').lower() == 'true',
+        'scroll_page': os.getenv('WIPO_SCROLL_PAGE', 'false').lower() == 'true'
+    },
+    http_fetcher=WIPOHttpFetcher(
+        required_fields=os.getenv('WIPO_FAST_PATH_REQUIRED', 'titulo,titular,paises_familia').split(',')
+    ) if os.getenv('WIPO_HTTP_FAST_PATH', 'true').lower() == 'true' else None,
+    negative_ttls={
+        'permanent': int(os.getenv('NEGATIVE_CACHE_TTL_PERMANENT', '86400')),
+        'blocked': int(os.getenv('NEGATIVE_CACHE_TTL_BLOCKED', '900')),
+        'transient': int(os.getenv('NEGATIVE_CACHE_TTL_TRANSIENT', '300'))
+    }
+)
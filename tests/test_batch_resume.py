@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Testes de retomada de lotes (shutdown no meio do processamento + restart)
+"""
+
+import sys
+import os
+import asyncio
+import tempfile
+
+# Adiciona src ao path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.batch_service import BatchService, BatchStatus
+from src.batch_store import BatchStore
+
+
+class FakePipeline:
+    """Pipeline falso: 'lenta' demora, as demais terminam na hora"""
+
+    def __init__(self, slow: float = 0.0):
+        self.slow = slow
+        self.calls = []
+
+    async def execute_full_pipeline(self, molecule, country_filter=None, limit=10):
+        self.calls.append(molecule)
+        if molecule.startswith('lenta'):
+            await asyncio.sleep(self.slow)
+        return {'molecule': molecule}
+
+
+def _make_service(path: str, pipeline: FakePipeline) -> BatchService:
+    service = BatchService(max_concurrent=2, store=BatchStore(path), reuse_window=0)
+    service.pipeline = pipeline
+    return service
+
+
+async def _shutdown_mid_batch(path: str) -> str:
+    service = _make_service(path, FakePipeline(slow=60))
+    batch_id = service.create_batch(['rapida', 'lenta1', 'lenta2'])
+    task = asyncio.create_task(service.process_batch(batch_id))
+
+    batch = service.jobs[batch_id]
+    while batch.jobs['rapida'].status != BatchStatus.COMPLETED:
+        await asyncio.sleep(0.01)
+
+    await service.close()
+    await asyncio.wait_for(task, timeout=5)
+    return batch_id
+
+
+async def _shutdown_with_queue(path: str) -> str:
+    service = _make_service(path, FakePipeline(slow=60))
+    molecules = ['rapida'] + [f'lenta{i}' for i in range(1, 6)]
+    batch_id = service.create_batch(molecules)
+    task = asyncio.create_task(service.process_batch(batch_id))
+
+    # Os 2 workers ficam presos nas moléculas lentas; o resto continua na fila
+    batch = service.jobs[batch_id]
+    while batch.status_counts[BatchStatus.PROCESSING] < service.max_concurrent:
+        await asyncio.sleep(0.01)
+    assert service.queued() > 0
+
+    await service.close()
+    await asyncio.wait_for(task, timeout=5)
+    assert service.queued() == 0
+    return batch_id
+
+
+async def _resume(path: str, batch_id: str):
+    pipeline = FakePipeline()
+    service = _make_service(path, pipeline)
+
+    assert service.jobs[batch_id].status == BatchStatus.PROCESSING
+    assert service.resume_unfinished() == [batch_id]
+    await asyncio.gather(*service._resumed.values())
+
+    status = service.get_batch_status(batch_id)
+    results = service.get_batch_results(batch_id)['results']
+    await service.close()
+    return status, results, pipeline.calls
+
+
+def test_shutdown_keeps_batch_unfinished():
+    """close() no meio do lote não marca o lote como concluído"""
+    print("\n🧪 Teste 1: Shutdown no meio do lote")
+    print("="*50)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'batches.db')
+        batch_id = asyncio.run(_shutdown_mid_batch(path))
+
+        store = BatchStore(path)
+        record = next(b for b in store.load_batches() if b['batch_id'] == batch_id)
+        statuses = {job['molecule']: job['status'] for job in record['jobs']}
+        store.close()
+
+        assert record['status'] == BatchStatus.PROCESSING.value
+        assert record['completed_at'] is None
+        assert statuses == {'rapida': 'completed', 'lenta1': 'pending', 'lenta2': 'pending'}
+
+        print(f"✅ Lote: {record['status']}, moléculas: {statuses}")
+
+
+def test_resume_after_shutdown():
+    """Após o restart, só as moléculas sem resultado rodam de novo"""
+    print("\n🧪 Teste 2: Retomada após restart")
+    print("="*50)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'batches.db')
+        batch_id = asyncio.run(_shutdown_mid_batch(path))
+        status, results, calls = asyncio.run(_resume(path, batch_id))
+
+        assert status['status'] == BatchStatus.COMPLETED
+        assert status['completed_count'] == 3
+        assert sorted(calls) == ['lenta1', 'lenta2']
+        assert sorted(results) == ['lenta1', 'lenta2', 'rapida']
+
+        print(f"✅ Lote: {status['status'].value}, reexecutadas: {sorted(calls)}")
+
+
+def test_shutdown_with_queued_molecules():
+    """close() com moléculas ainda na fila não deixa process_batch esperando"""
+    print("\n🧪 Teste 3: Shutdown com fila pendente")
+    print("="*50)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'batches.db')
+        batch_id = asyncio.run(_shutdown_with_queue(path))
+
+        store = BatchStore(path)
+        record = next(b for b in store.load_batches() if b['batch_id'] == batch_id)
+        statuses = {job['molecule']: job['status'] for job in record['jobs']}
+        store.close()
+
+        assert record['status'] == BatchStatus.PROCESSING.value
+        assert statuses['rapida'] == 'completed'
+        assert all(statuses[f'lenta{i}'] == 'pending' for i in range(1, 6))
+
+        status, results, calls = asyncio.run(_resume(path, batch_id))
+        assert status['status'] == BatchStatus.COMPLETED
+        assert status['completed_count'] == 6
+        assert sorted(calls) == [f'lenta{i}' for i in range(1, 6)]
+        assert len(results) == 6
+
+        print(f"✅ Lote retomado: {status['completed_count']}/{status['total_molecules']}")
+
+
+def run_tests():
+    """Executa todos os testes"""
+    print("\n" + "="*50)
+    print("PHARMYRUS BATCH RESUME - TESTES")
+    print("="*50)
+
+    try:
+        test_shutdown_keeps_batch_unfinished()
+        test_resume_after_shutdown()
+        test_shutdown_with_queued_molecules()
+
+        print("\n" + "="*50)
+        print("✅ TODOS OS TESTES PASSARAM!")
+        print("="*50 + "\n")
+
+        return 0
+
+    except Exception as e:
+        print(f"\n❌ ERRO: {e}\n")
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(run_tests())
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Testes do cache em camadas (LRU em memória + SQLite)
+"""
+
+import sys
+import os
+import time
+import tempfile
+
+# Adiciona src ao path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.tiered_cache import LRUMemoryCache, SQLiteCache, TieredCache
+
+
+def _make_cache(path: str, ttl: int = 60, max_entries: int = 2) -> TieredCache:
+    memory = LRUMemoryCache(ttl=ttl, max_entries=max_entries)
+    disk = SQLiteCache(path, namespace='test', ttl=ttl)
+    return TieredCache(memory, disk, ttl=ttl)
+
+
+def test_lru_eviction():
+    """LRU descarta a entrada menos usada e o disco continua servindo"""
+    print("\n🧪 Teste 1: Eviction LRU")
+    print("="*50)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = _make_cache(os.path.join(tmp, 'cache.db'))
+
+        cache.set('a', {'titulo': 'A'})
+        cache.set('b', {'titulo': 'B'})
+        cache.set('c', {'titulo': 'C'})
+
+        assert len(cache.memory) == 2
+        assert cache.memory.evictions == 1
+        assert cache.get('a') == {'titulo': 'A'}
+
+        print(f"✅ Stats: {cache.get_stats()['evictions']} evictions")
+        cache.close()
+
+
+def test_warm_restart():
+    """Entradas persistidas voltam para a memória após restart"""
+    print("\n🧪 Teste 2: Cache quente após restart")
+    print("="*50)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'cache.db')
+
+        cache = _make_cache(path)
+        cache.set('WO2018162793', {'titulo': 'Darolutamide'})
+        cache.close()
+
+        restarted = _make_cache(path)
+        assert restarted.warm() == 1
+        assert restarted.memory.get('WO2018162793') == {'titulo': 'Darolutamide'}
+
+        print("✅ Cache aquecido a partir do disco")
+        restarted.close()
+
+
+def test_ttl_sweep():
+    """Sweep remove entradas expiradas dos dois tiers"""
+    print("\n🧪 Teste 3: Expiração por TTL")
+    print("="*50)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = _make_cache(os.path.join(tmp, 'cache.db'), ttl=1)
+        cache.set('a', {'titulo': 'A'})
+        cache.set('b', {'titulo': 'B'}, ttl=60)
+
+        time.sleep(1.1)
+
+        assert cache.sweep() == 1
+        assert cache.get('a') is None
+        assert cache.get('b') == {'titulo': 'B'}
+
+        print(f"✅ Restantes: {len(cache)}")
+        cache.close()
+
+
+def run_tests():
+    """Executa todos os testes"""
+    print("\n" + "="*50)
+    print("PHARMYRUS CACHE - TESTES")
+    print("="*50)
+
+    try:
+        test_lru_eviction()
+        test_warm_restart()
+        test_ttl_sweep()
+
+        print("\n" + "="*50)
+        print("✅ TODOS OS TESTES PASSARAM!")
+        print("="*50 + "\n")
+
+        return 0
+
+    except Exception as e:
+        print(f"\n❌ ERRO: {e}\n")
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(run_tests())
@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""
+Testes do rate limiter por host (AIMD, Retry-After, concorrência) com relógio falso
+"""
+
+import sys
+import os
+import asyncio
+import types
+
+# Adiciona src ao path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src import rate_limiter as rl
+from src.rate_limiter import HostRateLimiter, HostThrottled, TokenBucket
+
+_real_sleep = asyncio.sleep
+
+
+class FakeClock:
+    """Relógio manual: asyncio.sleep só termina quando o teste avança o tempo"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float):
+        self.now += seconds
+
+    async def sleep(self, delay: float):
+        target = self.now + delay
+        while self.now < target:
+            await _real_sleep(0)
+
+
+def _with_clock(test):
+    """Roda o teste assíncrono com time/asyncio.sleep do rate limiter no relógio falso"""
+    def wrapper():
+        clock = FakeClock()
+        original_time, original_asyncio = rl.time, rl.asyncio
+        rl.time = types.SimpleNamespace(monotonic=clock.monotonic)
+        rl.asyncio = types.SimpleNamespace(Lock=asyncio.Lock, Semaphore=asyncio.Semaphore, sleep=clock.sleep)
+        try:
+            asyncio.run(test(clock))
+        finally:
+            rl.time, rl.asyncio = original_time, original_asyncio
+    wrapper.__name__ = test.__name__
+    wrapper.__doc__ = test.__doc__
+    return wrapper
+
+
+async def _settle():
+    """Deixa as tasks prontas rodarem sem avançar o relógio"""
+    for _ in range(20):
+        await _real_sleep(0)
+
+
+@_with_clock
+async def _throttle_halves_rate(clock):
+    limiter = HostRateLimiter(host_limits={'api.fda.gov': rl.HostLimit(rate=4, burst=4, max_rate=8)}, jitter=0.0)
+    bucket = limiter.bucket('https://api.fda.gov/drug/ndc.json')
+
+    assert limiter.record('https://api.fda.gov/x', 429) is True
+    assert bucket.rate == 2
+    assert limiter.record('https://api.fda.gov/x', 503) is True
+    assert bucket.rate == 1
+    assert bucket.total_throttled == 2
+
+    # Piso em min_rate (rate inicial / 10)
+    for _ in range(10):
+        limiter.record('https://api.fda.gov/x', 429)
+    assert bucket.rate == bucket.min_rate == 0.4
+
+    # Sem Retry-After a pausa é 1/rate
+    assert bucket.blocked_until == clock.now + 1 / bucket.rate
+    print(f"✅ Ritmo após throttles: {bucket.rate}/s")
+
+
+@_with_clock
+async def _success_recovers_additively(clock):
+    bucket = TokenBucket(rate=2, burst=2, max_rate=4, increase=0.5)
+
+    bucket.on_throttle()
+    assert bucket.rate == 1
+    for expected in (1.5, 2.0, 2.5, 3.0, 3.5, 4.0, 4.0):
+        bucket.on_success()
+        assert bucket.rate == expected
+
+    # 4xx que não são throttle também contam como sucesso; 5xx não
+    limiter = HostRateLimiter(default_rate=2, default_burst=2, jitter=0.0)
+    limiter.bucket('serpapi.com').rate = 1
+    limiter.record('serpapi.com', 404)
+    limiter.record('serpapi.com', 500)
+    assert limiter.bucket('serpapi.com').rate == 1 + limiter.bucket('serpapi.com').increase
+    print(f"✅ Ritmo recuperado até max_rate: {bucket.rate}/s")
+
+
+@_with_clock
+async def _retry_after_cutoff(clock):
+    limiter = HostRateLimiter(default_rate=10, default_burst=10, jitter=0.0)
+    bucket = limiter.bucket('clinicaltrials.gov')
+
+    # Dentro do limite: pausa exata, requisição espera e segue
+    assert limiter.record('clinicaltrials.gov', 429, '30') is True
+    assert bucket.blocked_until == clock.now + 30
+    waiter = asyncio.create_task(bucket.acquire())
+    await _settle()
+    assert not waiter.done()
+    clock.advance(30)
+    await _settle()
+    assert waiter.done() and waiter.exception() is None
+
+    # Acima do limite: pausa limitada e requisições falham até o fim da janela
+    try:
+        limiter.record('clinicaltrials.gov', 429, str(rl.MAX_RETRY_AFTER * 2))
+        assert False, "HostThrottled esperado"
+    except HostThrottled as e:
+        assert e.retry_after == rl.MAX_RETRY_AFTER * 2
+    assert bucket.blocked_until <= clock.now + rl.MAX_RETRY_AFTER
+
+    try:
+        await bucket.acquire()
+        assert False, "HostThrottled esperado"
+    except HostThrottled:
+        pass
+    assert bucket.total_rejected == 1
+
+    clock.advance(rl.MAX_RETRY_AFTER * 2 + 1)
+    await bucket.acquire()
+    print(f"✅ Retry-After acima de {rl.MAX_RETRY_AFTER:.0f}s rejeitado")
+
+
+@_with_clock
+async def _pause_does_not_block_other_hosts(clock):
+    limiter = HostRateLimiter(default_rate=10, default_burst=10, jitter=0.0)
+    limiter.record('https://patentscope.wipo.int/a', 429, '30')
+
+    paused = asyncio.create_task(limiter.acquire('https://patentscope.wipo.int/b'))
+    await _settle()
+
+    # O host pausado não segura o lock durante a pausa
+    assert not limiter.bucket('patentscope.wipo.int')._lock.locked()
+
+    # Outros hosts seguem sem o relógio avançar
+    await asyncio.wait_for(limiter.acquire('https://serpapi.com/search.json'), timeout=1)
+    await asyncio.wait_for(limiter.acquire('https://api.fda.gov/drug/ndc.json'), timeout=1)
+    assert not paused.done()
+
+    clock.advance(30)
+    await asyncio.wait_for(paused, timeout=1)
+    print("✅ Pausa do Patentscope não bloqueou SerpAPI/FDA")
+
+
+@_with_clock
+async def _slot_concurrency(clock):
+    limiter = HostRateLimiter(
+        host_limits={'pubchem.ncbi.nlm.nih.gov': rl.HostLimit(rate=100, burst=100, concurrency=2)},
+        jitter=0.0
+    )
+    url = 'https://pubchem.ncbi.nlm.nih.gov/rest/pug'
+    release = asyncio.Event()
+    peak = []
+
+    async def request():
+        async with limiter.limit(url) as bucket:
+            peak.append(bucket.in_flight)
+            await release.wait()
+
+    tasks = [asyncio.create_task(request()) for _ in range(3)]
+    await _settle()
+    assert limiter.bucket(url).in_flight == 2
+    assert len(peak) == 2
+
+    release.set()
+    await asyncio.gather(*tasks)
+    assert max(peak) == 2
+    assert limiter.bucket(url).in_flight == 0
+    print(f"✅ Concorrência máxima: {max(peak)}")
+
+
+def test_throttle_halves_rate():
+    """429/503 reduzem o ritmo pela metade até min_rate"""
+    print("\n🧪 Teste 1: Redução multiplicativa")
+    print("="*50)
+    _throttle_halves_rate()
+
+
+def test_success_recovers_additively():
+    """Sucessos aumentam o ritmo aditivamente até max_rate"""
+    print("\n🧪 Teste 2: Aumento aditivo")
+    print("="*50)
+    _success_recovers_additively()
+
+
+def test_retry_after_cutoff():
+    """Retry-After até MAX_RETRY_AFTER pausa; acima disso falha com HostThrottled"""
+    print("\n🧪 Teste 3: Limite do Retry-After")
+    print("="*50)
+    _retry_after_cutoff()
+
+
+def test_pause_does_not_block_other_hosts():
+    """A pausa de um host não atrasa requisições para outros hosts"""
+    print("\n🧪 Teste 4: Isolamento entre hosts")
+    print("="*50)
+    _pause_does_not_block_other_hosts()
+
+
+def test_slot_concurrency():
+    """slot() limita as requisições simultâneas por host"""
+    print("\n🧪 Teste 5: Concorrência por host")
+    print("="*50)
+    _slot_concurrency()
+
+
+def run_tests():
+    """Executa todos os testes"""
+    print("\n" + "="*50)
+    print("PHARMYRUS RATE LIMITER - TESTES")
+    print("="*50)
+
+    try:
+        test_throttle_halves_rate()
+        test_success_recovers_additively()
+        test_retry_after_cutoff()
+        test_pause_does_not_block_other_hosts()
+        test_slot_concurrency()
+
+        print("\n" + "="*50)
+        print("✅ TODOS OS TESTES PASSARAM!")
+        print("="*50 + "\n")
+
+        return 0
+
+    except Exception as e:
+        print(f"\n❌ ERRO: {e}\n")
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(run_tests())
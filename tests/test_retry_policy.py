@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Testes da política de retry (classificação de falhas + orçamento)
+"""
+
+import sys
+import os
+
+# Adiciona src ao path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from playwright.async_api import TimeoutError as PlaywrightTimeout
+
+from src.retry_policy import (
+    ErrorClass, FetchError, RetryBudget, RetryPolicy, classify_content, classify_status
+)
+
+STATUS_CASES = [
+    (404, ErrorClass.PERMANENT),
+    (410, ErrorClass.PERMANENT),
+    (401, ErrorClass.BLOCKED),
+    (403, ErrorClass.BLOCKED),
+    (429, ErrorClass.BLOCKED),
+    (500, ErrorClass.TRANSIENT),
+    (502, ErrorClass.TRANSIENT),
+    (503, ErrorClass.TRANSIENT),
+    (504, ErrorClass.TRANSIENT),
+    (408, ErrorClass.TRANSIENT),
+]
+
+CONTENT_CASES = [
+    ('Please complete the CAPTCHA to continue', ErrorClass.BLOCKED),
+    ('<div id="cf-challenge-running"></div>', ErrorClass.BLOCKED),
+    ('Request unsuccessful. Incapsula incident ID: 1234', ErrorClass.BLOCKED),
+    ('Access Denied', ErrorClass.BLOCKED),
+    ('Please enable JavaScript to view the page content', ErrorClass.BLOCKED),
+    ('No such document: WO2099999999', ErrorClass.PERMANENT),
+    ('Document not found', ErrorClass.PERMANENT),
+    ('No results found for this query', ErrorClass.PERMANENT),
+    ('Dados não encontrados (título ausente)', ErrorClass.TRANSIENT),
+    ('', ErrorClass.TRANSIENT),
+]
+
+EXCEPTION_CASES = [
+    (FetchError("Status HTTP: 404", ErrorClass.PERMANENT, 404), ErrorClass.PERMANENT),
+    (FetchError("Status HTTP: 429", ErrorClass.BLOCKED, 429), ErrorClass.BLOCKED),
+    (PlaywrightTimeout("Timeout 60000ms exceeded"), ErrorClass.TRANSIENT),
+    (RuntimeError("net::ERR_CONNECTION_RESET"), ErrorClass.TRANSIENT),
+    (RuntimeError("Access denied by upstream"), ErrorClass.BLOCKED),
+]
+
+
+def test_classify_status():
+    """404/410 permanentes, 401/403/429 bloqueio, demais transitórios"""
+    print("\n🧪 Teste 1: Classificação por status HTTP")
+    print("="*50)
+
+    for status, expected in STATUS_CASES:
+        assert classify_status(status) == expected, (status, classify_status(status))
+        print(f"✅ HTTP {status}: {expected.value}")
+
+
+def test_classify_content():
+    """Texto anti-bot vira bloqueio, documento inexistente vira permanente"""
+    print("\n🧪 Teste 2: Classificação por conteúdo")
+    print("="*50)
+
+    for text, expected in CONTENT_CASES:
+        assert classify_content(text) == expected, (text, classify_content(text))
+        print(f"✅ {text[:40]!r}: {expected.value}")
+
+
+def test_classify_exceptions():
+    """Timeouts são transitórios; FetchError mantém a classe já atribuída"""
+    print("\n🧪 Teste 3: Classificação de exceções")
+    print("="*50)
+
+    policy = RetryPolicy()
+    for error, expected in EXCEPTION_CASES:
+        assert policy.classify(error) == expected, (error, policy.classify(error))
+        print(f"✅ {type(error).__name__}: {expected.value}")
+
+
+def test_should_retry():
+    """Permanentes não repetem; tentativas limitadas por max_attempts"""
+    print("\n🧪 Teste 4: Decisão de retry")
+    print("="*50)
+
+    policy = RetryPolicy(max_attempts=3)
+
+    assert not policy.should_retry(ErrorClass.PERMANENT, 1)
+    assert policy.should_retry(ErrorClass.TRANSIENT, 1)
+    assert policy.should_retry(ErrorClass.BLOCKED, 2)
+    assert not policy.should_retry(ErrorClass.TRANSIENT, 3)
+
+    for attempt in range(1, 6):
+        assert 0 <= policy.delay(ErrorClass.TRANSIENT, attempt) <= policy.max_delay
+        assert policy.delay(ErrorClass.BLOCKED, attempt) >= min(policy.max_delay, policy.blocked_delay)
+
+    print("✅ Decisões e esperas dentro dos limites")
+
+
+def test_budget_depletion():
+    """O orçamento do lote se esgota e bloqueia novos retries"""
+    print("\n🧪 Teste 5: Orçamento de retries")
+    print("="*50)
+
+    policy = RetryPolicy(max_attempts=10)
+    budget = RetryBudget(limit=2)
+
+    assert policy.should_retry(ErrorClass.TRANSIENT, 1, budget)
+    assert policy.should_retry(ErrorClass.BLOCKED, 1, budget)
+    assert not policy.should_retry(ErrorClass.TRANSIENT, 1, budget)
+    assert budget.to_dict() == {'limit': 2, 'used': 2, 'remaining': 0}
+
+    # Falhas permanentes não consomem orçamento
+    budget = RetryBudget(limit=1)
+    assert not policy.should_retry(ErrorClass.PERMANENT, 1, budget)
+    assert budget.used == 0
+
+    print(f"✅ Orçamento: {RetryBudget(limit=2, used=2).to_dict()}")
+
+
+def run_tests():
+    """Executa todos os testes"""
+    print("\n" + "="*50)
+    print("PHARMYRUS RETRY POLICY - TESTES")
+    print("="*50)
+
+    try:
+        test_classify_status()
+        test_classify_content()
+        test_classify_exceptions()
+        test_should_retry()
+        test_budget_depletion()
+
+        print("\n" + "="*50)
+        print("✅ TODOS OS TESTES PASSARAM!")
+        print("="*50 + "\n")
+
+        return 0
+
+    except Exception as e:
+        print(f"\n❌ ERRO: {e}\n")
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(run_tests())
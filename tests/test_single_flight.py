@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Testes do single-flight (coalescência de chamadas concorrentes)
+"""
+
+import sys
+import os
+import asyncio
+
+# Adiciona src ao path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.single_flight import SingleFlight
+
+
+async def _coalescing():
+    flight = SingleFlight()
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return {'publicacao': 'WO2018162793'}
+
+    results = await asyncio.gather(*[flight.do('wo', fetch) for _ in range(5)])
+    return flight, calls, results
+
+
+async def _last_waiter_cancels():
+    flight = SingleFlight()
+    started = asyncio.Event()
+    cancelled = asyncio.Event()
+
+    async def fetch():
+        started.set()
+        try:
+            await asyncio.sleep(60)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    first = asyncio.create_task(flight.do('wo', fetch))
+    second = asyncio.create_task(flight.do('wo', fetch))
+    await started.wait()
+
+    # Um chamador sai: a execução continua para o outro
+    first.cancel()
+    await asyncio.gather(first, return_exceptions=True)
+    await asyncio.sleep(0)
+    survived = not cancelled.is_set() and flight.in_flight('wo')
+
+    # O último chamador sai: a execução é cancelada
+    second.cancel()
+    await asyncio.gather(second, return_exceptions=True)
+    await asyncio.wait_for(cancelled.wait(), timeout=1)
+    await asyncio.sleep(0)
+    return survived, flight.in_flight('wo')
+
+
+async def _on_done_before_waiters():
+    flight = SingleFlight()
+    events = []
+
+    async def fetch():
+        await asyncio.sleep(0.01)
+        return 'ok'
+
+    async def caller(name):
+        result = await flight.do('wo', fetch, on_done=lambda: events.append(('on_done', flight.in_flight('wo'))))
+        events.append((name, result))
+
+    await asyncio.gather(caller('a'), caller('b'))
+    return events
+
+
+def test_coalescing():
+    """Chamadores concorrentes da mesma chave compartilham uma execução"""
+    print("\n🧪 Teste 1: Coalescência")
+    print("="*50)
+
+    flight, calls, results = asyncio.run(_coalescing())
+
+    assert len(calls) == 1
+    assert all(r == {'publicacao': 'WO2018162793'} for r in results)
+    assert flight.get_stats() == {'in_flight': 0, 'executions': 1, 'coalesced': 4}
+
+    print(f"✅ Stats: {flight.get_stats()}")
+
+
+def test_last_waiter_cancellation():
+    """A execução só é cancelada quando o último chamador é cancelado"""
+    print("\n🧪 Teste 2: Cancelamento pelo último chamador")
+    print("="*50)
+
+    survived, still_in_flight = asyncio.run(_last_waiter_cancels())
+
+    assert survived
+    assert not still_in_flight
+
+    print("✅ Execução sobreviveu ao primeiro cancelamento e parou no último")
+
+
+def test_on_done_ordering():
+    """on_done roda ao liberar a chave, antes de os chamadores receberem o resultado"""
+    print("\n🧪 Teste 3: Ordem do on_done")
+    print("="*50)
+
+    events = asyncio.run(_on_done_before_waiters())
+
+    assert events[0] == ('on_done', False)
+    assert sorted(events[1:]) == [('a', 'ok'), ('b', 'ok')]
+    assert len(events) == 3
+
+    print(f"✅ Eventos: {events}")
+
+
+def run_tests():
+    """Executa todos os testes"""
+    print("\n" + "="*50)
+    print("PHARMYRUS SINGLE-FLIGHT - TESTES")
+    print("="*50)
+
+    try:
+        test_coalescing()
+        test_last_waiter_cancellation()
+        test_on_done_ordering()
+
+        print("\n" + "="*50)
+        print("✅ TODOS OS TESTES PASSARAM!")
+        print("="*50 + "\n")
+
+        return 0
+
+    except Exception as e:
+        print(f"\n❌ ERRO: {e}\n")
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(run_tests())
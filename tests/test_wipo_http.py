@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+Testes do fast path HTTP do Patentscope (parser HTML + escalonamento)
+"""
+
+import sys
+import os
+import asyncio
+
+# Adiciona src ao path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src import wipo_http
+from src.rate_limiter import HostRateLimiter
+from src.wipo_crawler import WIPOCrawler
+from src.wipo_http import WIPOHttpFetcher
+
+FIXTURE = os.path.join(os.path.dirname(__file__), 'fixtures', 'patentscope_WO2018162793.html')
+WO = 'WO2018162793'
+
+
+def _load_fixture() -> str:
+    with open(FIXTURE, encoding='utf-8') as f:
+        return f.read()
+
+
+class FakeResponse:
+    def __init__(self, status: int, html: str = ''):
+        self.status = status
+        self.headers = {}
+        self._html = html
+
+    async def text(self):
+        return self._html
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+class FakeSession:
+    def __init__(self, status: int, html: str = ''):
+        self.response = FakeResponse(status, html)
+
+    def get(self, url, **kwargs):
+        return self.response
+
+
+class FakePage:
+    """Página sem conteúdo: só o formato do registro do crawler interessa"""
+
+    async def evaluate(self, script, *args):
+        return [] if script is WIPOCrawler.NATIONAL_PHASE_SCRIPT else {}
+
+
+def _fetch(status: int, html: str = '', **kwargs):
+    """fetch_patent contra uma sessão HTTP falsa"""
+    session = FakeSession(status, html)
+    fetcher = WIPOHttpFetcher(rate_limiter=HostRateLimiter(default_rate=1000, default_burst=1000), **kwargs)
+    wipo_http.http_session.get = lambda: session
+    try:
+        return fetcher, asyncio.run(fetcher.fetch_patent(WO))
+    finally:
+        del wipo_http.http_session.get
+
+
+def test_parse_fixture():
+    """Parser extrai o registro completo de uma página de detalhe salva"""
+    print("\n🧪 Teste 1: Parser em página salva")
+    print("="*50)
+
+    data = WIPOHttpFetcher().parse(_load_fixture(), WO)
+
+    assert data['titulo'] == '1. WO2018162793 - NOVEL USE OF ANDROGEN RECEPTOR ANTAGONIST'
+    assert data['titular'] == 'ORION CORPORATION [FI]/[FI]'
+    assert data['datas']['deposito'] == '08.03.2018'
+    assert data['inventores'] == ['MOILANEN, Anu-Maarit', 'KARJALAINEN, Oskari']
+    assert sorted(data['cpc_ipc']) == ['A61K 31/4155', 'A61P 35/00']
+    assert data['paises_familia'] == ['BR', 'US', 'JP', 'EP']
+    assert data['worldwide_applications'] == {'BR': [], 'US': [], 'JP': [], 'EP': []}
+    assert data['resumo'].endswith('castration-resistant prostate cancer & related conditions.')
+    assert data['documentos']['pdf_link'] == 'https://patentscope.wipo.int/search/en/WO2018162793.pdf'
+
+    print(f"✅ Título: {data['titulo'][:50]}...")
+    print(f"✅ Família: {data['paises_familia']}")
+
+
+def test_record_shape_matches_crawler():
+    """Mesmo formato de registro que WIPOCrawler._extract_data"""
+    print("\n🧪 Teste 2: Formato igual ao do crawler")
+    print("="*50)
+
+    crawler = WIPOCrawler.__new__(WIPOCrawler)
+    browser_record = asyncio.run(crawler._extract_data(FakePage(), WO))
+    http_record = WIPOHttpFetcher().parse(_load_fixture(), WO)
+
+    assert set(http_record) == set(browser_record)
+    assert set(http_record['datas']) == set(browser_record['datas'])
+    assert set(http_record['documentos']) == set(browser_record['documentos'])
+
+    _, result = _fetch(200, _load_fixture())
+    assert result['metodo'] == 'http'
+    assert set(result) == set(browser_record) | {'duracao_segundos', 'metodo'}
+
+    print(f"✅ Campos: {sorted(http_record)}")
+
+
+def test_required_fields_escalation():
+    """Campos obrigatórios (WIPO_FAST_PATH_REQUIRED) ausentes escalam para o browser"""
+    print("\n🧪 Teste 3: Escalonamento por campo obrigatório")
+    print("="*50)
+
+    html = _load_fixture().replace('class="nationalPhase"', 'class="other"')
+
+    fetcher, result = _fetch(200, html)
+    assert result is None
+    assert fetcher.escalations == {'missing_paises_familia': 1}
+
+    fetcher, result = _fetch(200, html, required_fields=('titulo', 'titular'))
+    assert result is not None and result['paises_familia'] == []
+    assert fetcher.get_stats()['hits'] == 1
+
+    print(f"✅ Escalonamentos: {fetcher.escalations or 'nenhum'} com titulo,titular")
+
+
+def test_challenge_escalation():
+    """Página de desafio anti-bot escala para o browser"""
+    print("\n🧪 Teste 4: Desafio anti-bot")
+    print("="*50)
+
+    html = '<html><body><h1>Request unsuccessful. Incapsula incident ID: 123</h1></body></html>'
+    fetcher, result = _fetch(200, html)
+
+    assert result is None
+    assert fetcher.escalations == {'bot_challenge': 1}
+
+    fetcher, result = _fetch(503)
+    assert result is None
+    assert fetcher.escalations == {'http_503': 1}
+
+    print("✅ Desafio e 503 escalados")
+
+
+def test_permanent_failure():
+    """404/410 retornam o registro de falha permanente sem escalar"""
+    print("\n🧪 Teste 5: Falha permanente")
+    print("="*50)
+
+    for status in (404, 410):
+        fetcher, result = _fetch(status)
+
+        assert result['status'] == 'FALHA'
+        assert result['erro'] == f"HTTP {status}"
+        assert result['erro_classe'] == 'permanent'
+        assert result['publicacao'] == WO
+        assert result['metodo'] == 'http'
+        assert fetcher.escalations == {}
+        assert fetcher.get_stats()['not_found'] == 1
+
+        print(f"✅ HTTP {status}: {result['erro_classe']}")
+
+
+def run_tests():
+    """Executa todos os testes"""
+    print("\n" + "="*50)
+    print("PHARMYRUS WIPO HTTP - TESTES")
+    print("="*50)
+
+    try:
+        test_parse_fixture()
+        test_record_shape_matches_crawler()
+        test_required_fields_escalation()
+        test_challenge_escalation()
+        test_permanent_failure()
+
+        print("\n" + "="*50)
+        print("✅ TODOS OS TESTES PASSARAM!")
+        print("="*50 + "\n")
+
+        return 0
+
+    except Exception as e:
+        print(f"\n❌ ERRO: {e}\n")
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(run_tests())